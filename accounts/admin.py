@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from .forms import CustomUserCreationForm, CustomUserChangeForm
-from .models import Address, User
+from .models import Address, RevokedToken, User
 
 class AddressInline(admin.TabularInline):
     model = Address
@@ -14,7 +14,6 @@ class CustomUserAdmin(UserAdmin):
     fieldsets = (
         (None, {'fields': ('username', 'password')}),
         ('Personal info', {'fields': ('fullname', 'email', 'phonenumber', 'profile_image')}),
-        ('OTP Information', {'fields': ('otp', 'otp_expiry')}),
         ('Permissions', {'fields': ('is_active', 'is_staff', 'is_superuser', 'groups', 'user_permissions', 'is_verified')}),
         ('Important dates', {'fields': ('last_login', 'date_joined')}),
     )
@@ -46,4 +45,12 @@ class AddressAdmin(admin.ModelAdmin):
     )
     list_filter = ('address_type', 'is_default', 'country', 'state')
     search_fields = ('user__username', 'user__email', 'address_line1', 'city', 'postal_code')
-    ordering = ('user', 'is_default', 'id')
\ No newline at end of file
+    ordering = ('user', 'is_default', 'id')
+
+
+@admin.register(RevokedToken)
+class RevokedTokenAdmin(admin.ModelAdmin):
+    list_display = ('jti', 'user', 'revoked_at', 'expires_at')
+    search_fields = ('jti', 'user__username', 'user__email')
+    raw_id_fields = ('user',)
+    ordering = ('-revoked_at',)
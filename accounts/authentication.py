@@ -0,0 +1,125 @@
+"""
+JWT authentication without a users query per request.
+
+`CachedJWTAuthentication` resolves the token's user from a principal cached in
+a per-process LRU (AUTH_USER_LOCAL_CACHE_TTL, a few seconds) in front of the
+shared cache (AUTH_USER_CACHE_TTL), and only reads the users table on a miss.
+When the configured cache is itself per-process (no REDIS_URL), it is skipped:
+an invalidation could not reach the other workers, so only the short-lived
+local entry is kept.
+The principal holds the user's columns except the password hash, plus a token
+version derived from it. Tokens issued at login carry that version, so they
+stop authenticating once the password changes.
+
+Saving or deleting a User drops its entry (see accounts.models); changes made
+with queryset.update() are picked up when the entry expires.
+"""
+import hashlib
+import hmac
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router, transaction
+from django.utils.translation import gettext_lazy as _
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from core.utils.local_cache import LocalLRUCache, is_process_local
+
+CACHE_PREFIX = "auth:user:"
+TOKEN_VERSION_CLAIM = "tv"
+TOKEN_VERSION_KEY = "_token_version"
+
+local_cache = LocalLRUCache(
+    maxsize=getattr(settings, "AUTH_USER_LOCAL_CACHE_SIZE", 10000),
+    ttl=getattr(settings, "AUTH_USER_LOCAL_CACHE_TTL", 5),
+)
+
+
+def cache_key(user_id):
+    return f"{CACHE_PREFIX}{user_id}"
+
+
+def get_cache_ttl():
+    return getattr(settings, "AUTH_USER_CACHE_TTL", 60)
+
+
+def token_version(password_hash):
+    """Short HMAC of the password hash: changes whenever the password does."""
+    return hmac.new(settings.SECRET_KEY.encode(), (password_hash or "").encode(), hashlib.sha256).hexdigest()[:16]
+
+
+@lru_cache(maxsize=None)
+def principal_fields():
+    return tuple(f.attname for f in get_user_model()._meta.concrete_fields if f.attname != "password")
+
+
+def load_principal(user_id):
+    """The cached principal dict for `user_id`, or None if there is no such user."""
+    key = cache_key(user_id)
+    principal = local_cache.get(key)
+    if principal is not None:
+        return principal
+
+    shared = not is_process_local()
+    principal = cache.get(key) if shared else None
+    if principal is None:
+        fields = principal_fields()
+        row = (
+            get_user_model().objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+            .values_list(*fields, "password").first()
+        )
+        if row is None:
+            return None
+        principal = dict(zip(fields, row[:-1]))
+        principal[TOKEN_VERSION_KEY] = token_version(row[-1])
+        if shared:
+            cache.set(key, principal, get_cache_ttl())
+    local_cache.set(key, principal)
+    return principal
+
+
+def invalidate_user(user_id):
+    """Drop the cached principal now and again after commit (a reader may re-cache pre-commit values)."""
+    key = cache_key(user_id)
+
+    def delete():
+        local_cache.delete(key)
+        cache.delete(key)
+
+    delete()
+    transaction.on_commit(delete)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        principal = load_principal(user_id)
+        if principal is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        values = {name: value for name, value in principal.items() if name != TOKEN_VERSION_KEY}
+        # the password column stays deferred and is only read if something asks for it
+        user = self.user_model.from_db(router.db_for_read(self.user_model), list(values), list(values.values()))
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        version = validated_token.get(TOKEN_VERSION_CLAIM)
+        if version is not None and version != principal[TOKEN_VERSION_KEY]:
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
+
+
+class CachedJWTScheme(SimpleJWTScheme):
+    """Documents CachedJWTAuthentication like simplejwt's own class in the OpenAPI schema."""
+    target_class = CachedJWTAuthentication
@@ -0,0 +1,36 @@
+"""
+Password verification for the login path.
+
+Checks a password and, when it was hashed by anything other than the
+preferred hasher (PASSWORD_HASHERS[0]) or with outdated parameters, stores
+it re-hashed so later logins verify faster. Unknown accounts still pay for
+one hash, so response times don't reveal which accounts exist.
+
+Hashing runs on the request thread: the API is served by sync DRF views, so
+a pool would only move the wait to another thread.
+"""
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+
+
+def must_rehash(encoded):
+    """True when `encoded` was made by a hasher (or with parameters) other than the preferred one."""
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False
+    preferred = get_hasher("default")
+    return hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+def verify_password(user, raw_password):
+    """Check `raw_password` for `user`, upgrading the stored hash if needed."""
+    if user is None:
+        make_password(raw_password)
+        return False
+    if not check_password(raw_password, user.password):
+        return False
+    if must_rehash(user.password):
+        # transparent upgrade to the preferred hasher
+        user.password = make_password(raw_password)
+        user.save(update_fields=["password"])
+    return True
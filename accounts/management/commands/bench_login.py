@@ -0,0 +1,78 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils.module_loading import import_string
+
+from accounts.models import User
+from accounts.serializers import CustomTokenObtainPairSerializer
+
+PREFIX = "bench-login-"
+PASSWORD = "bench-Password-1"
+
+
+class Command(BaseCommand):
+    help = "Measure password verification cost and end-to-end login throughput (logins/sec per core)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--logins", type=int, default=500)
+        parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+
+    def handle(self, *args, **options):
+        # the preferred hasher and the one existing hashes are upgraded from
+        for path in settings.PASSWORD_HASHERS[:2]:
+            self.bench_hasher(path)
+
+        User.objects.filter(username__startswith=PREFIX).delete()
+        encoded = make_password(PASSWORD)
+        User.objects.bulk_create([
+            User(username=f"{PREFIX}{i}", email=f"{PREFIX}{i}@example.com", password=encoded, is_verified=True)
+            for i in range(options["users"])
+        ])
+        try:
+            self.bench_logins(options["users"], options["logins"], max(1, options["threads"]))
+        finally:
+            User.objects.filter(username__startswith=PREFIX).delete()
+
+    def bench_hasher(self, path, rounds=5):
+        hasher = import_string(path)()
+        encoded = hasher.encode(PASSWORD, hasher.salt())
+        started = time.perf_counter()
+        for _ in range(rounds):
+            check_password(PASSWORD, encoded)
+        elapsed = (time.perf_counter() - started) / rounds
+        self.stdout.write(f"verify {hasher.algorithm:<24} {elapsed * 1000:8.1f} ms")
+
+    def bench_logins(self, users, logins, threads):
+        def run(count, offset):
+            try:
+                for i in range(count):
+                    serializer = CustomTokenObtainPairSerializer(
+                        data={"username": f"{PREFIX}{(offset + i) % users}", "password": PASSWORD}
+                    )
+                    serializer.is_valid(raise_exception=True)
+            finally:
+                if threads > 1:
+                    connections.close_all()
+
+        shares = [logins // threads + (1 if i < logins % threads else 0) for i in range(threads)]
+        started = time.perf_counter()
+        if threads == 1:
+            run(logins, 0)
+        else:
+            with ThreadPoolExecutor(threads) as executor:
+                for future in [executor.submit(run, share, sum(shares[:i])) for i, share in enumerate(shares)]:
+                    future.result()
+        elapsed = time.perf_counter() - started
+
+        rate = logins / elapsed if elapsed else 0
+        cores = min(threads, os.cpu_count() or 1)
+        self.stdout.write(
+            f"{logins} logins with {threads} thread(s) in {elapsed:.2f}s: "
+            f"{rate:.1f} logins/s, {rate / cores:.1f} logins/s per core"
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from accounts.otp import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Delete expired email verification codes in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        total = purge_expired(batch_size=options["batch_size"])
+        self.stdout.write(f"Deleted {total} expired verification code(s).")
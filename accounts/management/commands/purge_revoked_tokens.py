@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from accounts.revocation import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Delete blacklist entries for refresh tokens that have expired anyway."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        total = purge_expired(batch_size=options["batch_size"])
+        self.stdout.write(f"Deleted {total} expired revoked token(s).")
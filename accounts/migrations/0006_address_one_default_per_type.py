@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:21
+
+from django.db import migrations, models
+
+
+def keep_latest_default(apps, schema_editor):
+    """Unset all but the most recently updated default address of each user and type."""
+    Address = apps.get_model('accounts', 'Address')
+    defaults = (
+        Address.objects.using(schema_editor.connection.alias).filter(is_default=True)
+        .order_by('user_id', 'address_type', '-updated_at', '-id')
+        .values_list('pk', 'user_id', 'address_type')
+    )
+    seen, stale = set(), []
+    for pk, user_id, address_type in defaults.iterator(chunk_size=10000):
+        if (user_id, address_type) in seen:
+            stale.append(pk)
+        else:
+            seen.add((user_id, address_type))
+    for start in range(0, len(stale), 1000):
+        Address.objects.using(schema_editor.connection.alias).filter(
+            pk__in=stale[start:start + 1000],
+        ).update(is_default=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_address'),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_latest_default, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='address',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_default', True)), fields=('user', 'address_type'), name='accounts_address_one_default_per_type'),
+        ),
+    ]
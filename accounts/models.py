@@ -1,9 +1,10 @@
 from django.conf import settings
 from django.db import models
+from django.db.models.functions import Lower
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 from django.utils import timezone
-import random
-import string
 
 class CustomUserManager(BaseUserManager):
     def create_user(self, username, email, password=None, **extra_fields):
@@ -28,6 +29,26 @@ class CustomUserManager(BaseUserManager):
             raise ValueError('Superuser must have is_superuser=True.')
         return self.create_user(username, email, password, **extra_fields)
 
+    def get_for_login(self, identifier):
+        """
+        Resolve a login name case-insensitively: one lookup on the Lower(username)
+        or Lower(email) index, then the other (email first when it looks like one).
+        If case variants of the name exist, only an exact match is accepted.
+        """
+        value = (identifier or '').strip()
+        if not value:
+            return None
+        fields = ('email', 'username') if '@' in value else ('username', 'email')
+        for field in fields:
+            matches = list(
+                self.alias(normalized=Lower(field)).filter(normalized=value.lower()).order_by('pk')[:10]
+            )
+            if len(matches) == 1:
+                return matches[0]
+            if matches:
+                return next((user for user in matches if getattr(user, field) == value), None)
+        return None
+
 
 class User(AbstractBaseUser, PermissionsMixin):
     username = models.CharField(max_length=150, unique=True)
@@ -35,8 +56,6 @@ class User(AbstractBaseUser, PermissionsMixin):
     fullname = models.CharField(max_length=255, blank=True, null=True)
     phonenumber = models.CharField(max_length=20, blank=True, null=True)
     profile_image = models.ImageField(upload_to='profile_images/', blank=True, null=True)
-    otp = models.CharField(max_length=6, blank=True, null=True)
-    otp_expiry = models.DateTimeField(blank=True, null=True)
     is_verified = models.BooleanField(default=False)
     is_staff = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
@@ -49,24 +68,71 @@ class User(AbstractBaseUser, PermissionsMixin):
     EMAIL_FIELD = 'email'
     REQUIRED_FIELDS = ['email', 'fullname']
 
-    def generate_otp(self):
-        self.otp = ''.join(random.choices(string.digits, k=6))
-        self.otp_expiry = timezone.now() + timezone.timedelta(minutes=5)
-        self.save()
+    class Meta:
+        indexes = [
+            # case-insensitive login lookups (CustomUserManager.get_for_login)
+            models.Index(Lower('username'), name='accounts_user_username_ci'),
+            models.Index(Lower('email'), name='accounts_user_email_ci'),
+        ]
+
+    def generate_otp(self, *, min_interval=None):
+        """
+        Issue a new verification code and return it (see accounts.otp). Only the
+        code's hash is stored, in OneTimePassword, so the users row is not written.
+        """
+        from .otp import issue_otp
+        return issue_otp(self, min_interval=min_interval)
 
     def verify_otp(self, otp):
-        if self.otp == otp and self.otp_expiry > timezone.now():
-            self.is_verified = True
-            self.otp = None
-            self.otp_expiry = None
-            self.save()
-            return True
-        return False
-    
+        from .otp import verify_otp
+        return verify_otp(self, otp)
+
     def __str__(self):
         return self.username
 
 
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_principal(sender, instance, **kwargs):
+    """Drop the user from the authentication cache (accounts.authentication)."""
+    from .authentication import invalidate_user
+    invalidate_user(instance.pk)
+
+
+class OneTimePassword(models.Model):
+    """
+    Pending email verification code: one row per user, replaced on every issue
+    and deleted once used. Expired rows are removed by `manage.py purge_otps`.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    code_hash = models.CharField(max_length=64)  # HMAC-SHA256 of user id + code
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=['expires_at'])]
+
+    def __str__(self):
+        return f"OTP for user {self.user_id} (expires {self.expires_at})"
+
+
+class RevokedToken(models.Model):
+    """
+    Blacklisted refresh token (rotated or logged out), kept until the token
+    expires. Looked up through a Bloom filter first, see accounts.revocation.
+    """
+    jti = models.CharField(max_length=255, unique=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    revoked_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=['expires_at'])]
+
+    def __str__(self):
+        return self.jti
+
+
 ADDRESS_TYPE = [
     ('billing', 'Billing'),
     ('shipping', 'Shipping'),
@@ -96,12 +162,30 @@ class Address(models.Model):
         indexes = [
             models.Index(fields=['user', 'address_type']),
         ]
+        constraints = [
+            # at most one default per user and type (a partial index where supported)
+            models.UniqueConstraint(
+                fields=['user', 'address_type'],
+                condition=models.Q(is_default=True),
+                name='accounts_address_one_default_per_type',
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         if self.is_default:
-            # Unset default for all other addresses of the same user and type
-            Address.objects.filter(user=self.user, address_type=self.address_type).exclude(id=self.id).update(is_default=False)
+            # Unset the current default of the same user and type (one UPDATE, before this row takes over)
+            Address.objects.filter(
+                user_id=self.user_id, address_type=self.address_type, is_default=True,
+            ).exclude(id=self.id).update(is_default=False)
         super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"{self.user.username} - {self.address_type} - {self.address_line1}"
\ No newline at end of file
+        return f"{self.user.username} - {self.address_type} - {self.address_line1}"
+
+
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=Address)
+def invalidate_cached_profile(sender, instance, **kwargs):
+    """Drop the cached /api/auth/user/ payload (accounts.profile)."""
+    from .profile import invalidate_profile
+    invalidate_profile(instance.user_id if sender is Address else instance.pk)
@@ -0,0 +1,92 @@
+"""
+Email verification codes.
+
+Codes live in the narrow OneTimePassword table rather than on the users row,
+so issuing and checking them never rewrites users. Only an HMAC of the code is
+stored; each code expires after OTP_TTL and is burnt after OTP_MAX_ATTEMPTS
+wrong guesses. The users row is written once, with update_fields, when a code
+is accepted.
+"""
+import hashlib
+import hmac
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OneTimePassword
+
+OTP_LENGTH = 6
+
+
+def get_ttl():
+    return getattr(settings, "OTP_TTL", timedelta(minutes=5))
+
+
+def get_max_attempts():
+    return getattr(settings, "OTP_MAX_ATTEMPTS", 5)
+
+
+def get_resend_interval():
+    """A new code is not issued (or mailed) while the current one is younger than this."""
+    return getattr(settings, "OTP_RESEND_INTERVAL", timedelta(minutes=1))
+
+
+def hash_code(user_id, code):
+    message = f"{user_id}:{code}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def issue_otp(user, *, min_interval=None):
+    """
+    Store a fresh code for `user`, replacing any previous one, and return it.
+    With `min_interval`, returns None instead when a live code was issued more
+    recently than that.
+    """
+    now = timezone.now()
+    if min_interval is not None and OneTimePassword.objects.filter(
+        user=user, created_at__gt=now - min_interval, expires_at__gt=now,
+    ).exists():
+        return None
+
+    code = f"{secrets.randbelow(10 ** OTP_LENGTH):0{OTP_LENGTH}d}"
+    OneTimePassword.objects.bulk_create(
+        [OneTimePassword(user=user, code_hash=hash_code(user.pk, code), created_at=now, expires_at=now + get_ttl())],
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=["code_hash", "attempts", "created_at", "expires_at"],
+    )
+    return code
+
+
+def verify_otp(user, code):
+    """Check `code` for `user`; on success consume it and mark the user verified."""
+    now = timezone.now()
+    with transaction.atomic():
+        record = OneTimePassword.objects.select_for_update().filter(user=user).first()
+        if record is None or record.expires_at <= now or record.attempts >= get_max_attempts():
+            return False
+        if not hmac.compare_digest(record.code_hash, hash_code(user.pk, str(code))):
+            OneTimePassword.objects.filter(pk=record.pk).update(attempts=F("attempts") + 1)
+            return False
+        record.delete()
+        user.is_verified = True
+        user.save(update_fields=["is_verified"])
+    return True
+
+
+def purge_expired(*, batch_size=5000):
+    """Delete expired codes in batches. Returns the number deleted."""
+    now = timezone.now()
+    total = 0
+    while True:
+        pks = list(
+            OneTimePassword.objects.filter(expires_at__lte=now)
+            .order_by("expires_at").values_list("pk", flat=True)[:batch_size]
+        )
+        if not pks:
+            return total
+        total += OneTimePassword.objects.filter(pk__in=pks).delete()[0]
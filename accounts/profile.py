@@ -0,0 +1,55 @@
+"""
+Cached `/api/auth/user/` payload.
+
+The serialized profile (user plus addresses, built from one prefetch) is cached
+per user together with an ETag of its content, so repeat polls are answered
+from the cache, or with 304 Not Modified when the client sends the ETag back.
+Saving or deleting the User or any of its addresses drops the entry (receivers
+in accounts.models); queryset.update() calls are covered by the save that
+follows them in AddressSerializer and Address.save.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+
+CACHE_PREFIX = "auth:profile:"
+
+
+def cache_key(user_id):
+    return f"{CACHE_PREFIX}{user_id}"
+
+
+def get_cache_ttl():
+    return getattr(settings, "AUTH_PROFILE_CACHE_TTL", 300)
+
+
+def build_profile(user):
+    """Serialize `user` with its addresses loaded by a single query. Returns (data, etag)."""
+    from .serializers import UserSerializer
+
+    prefetch_related_objects([user], "addresses")
+    data = UserSerializer(user).data
+    digest = hashlib.sha1(json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True).encode()).hexdigest()
+    # weak: the response envelope (request id, timestamp) differs between equal profiles
+    return data, f'W/"{digest}"'
+
+
+def get_profile(user):
+    """(data, etag) for `user`, from the cache when possible."""
+    key = cache_key(user.pk)
+    cached = cache.get(key)
+    if cached is None:
+        cached = build_profile(user)
+        cache.set(key, cached, get_cache_ttl())
+    return cached
+
+
+def invalidate_profile(user_id):
+    key = cache_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
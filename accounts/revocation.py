@@ -0,0 +1,162 @@
+"""
+Refresh-token blacklist.
+
+Revoked refresh tokens (rotated, or logged out) are stored by jti in
+RevokedToken until they would have expired anyway; `manage.py
+purge_revoked_tokens` removes them after that. Lookups rarely touch the table:
+each process keeps a Bloom filter of all unexpired jtis, so a jti not in it is
+not revoked and costs no query at all. The filter is rebuilt every
+AUTH_REVOCATION_FILTER_REFRESH seconds, and every AUTH_REVOCATION_FILTER_SYNC
+seconds it picks up rows added since (by other workers) with one indexed query.
+
+A Bloom hit (a revoked token, or a rare false positive) is answered by the
+shared cache, where every revocation is also kept for two rebuild intervals,
+or else confirmed against the table's unique jti index.
+
+A token revoked by another worker can pass the filter until the next sync (or,
+if its INSERT committed behind a later one, until the next rebuild).
+Reusing a rotated refresh token is still refused in that window, because the
+INSERT that revokes it on rotation doubles as the reuse check.
+
+Revoking all of a user's tokens at once (password change) needs no rows: tokens
+carry a version derived from the password hash, see accounts.authentication.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from core.utils.local_cache import is_process_local
+
+from .bloom import BloomFilter
+from .models import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "auth:revoked:"
+
+
+def cache_key(jti):
+    return f"{CACHE_PREFIX}{jti}"
+
+
+def get_refresh_interval():
+    return getattr(settings, "AUTH_REVOCATION_FILTER_REFRESH", 300)
+
+
+def get_sync_interval():
+    return getattr(settings, "AUTH_REVOCATION_FILTER_SYNC", 5)
+
+
+def get_error_rate():
+    return getattr(settings, "AUTH_REVOCATION_FILTER_ERROR_RATE", 0.001)
+
+
+class RevocationFilter:
+    """Per-process Bloom filter of revoked jtis, rebuilt from the table when stale and synced in between."""
+
+    def __init__(self):
+        self._bloom = None
+        self._built_at = 0.0
+        self._synced_at = 0.0
+        self._last_pk = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        now = time.monotonic()
+        if self._bloom is None or now - self._built_at > get_refresh_interval():
+            # the first build blocks; later ones are done by one thread while the rest use the old filter
+            if self._lock.acquire(blocking=self._bloom is None):
+                try:
+                    if self._bloom is None or time.monotonic() - self._built_at > get_refresh_interval():
+                        self.rebuild()
+                finally:
+                    self._lock.release()
+        elif now - self._synced_at > get_sync_interval() and self._lock.acquire(blocking=False):
+            try:
+                self.sync()
+            finally:
+                self._lock.release()
+        return self._bloom
+
+    def rebuild(self):
+        unexpired = Q(expires_at__gt=timezone.now())
+        stats = RevokedToken.objects.aggregate(count=Count("pk", filter=unexpired), last_pk=Max("pk"))
+        last_pk = stats["last_pk"] or 0
+        # headroom for tokens revoked until the next rebuild
+        bloom = BloomFilter(max(stats["count"] * 2, 1024), get_error_rate())
+        revoked = RevokedToken.objects.filter(unexpired, pk__lte=last_pk)
+        bloom.update(revoked.values_list("jti", flat=True).iterator(chunk_size=10000))
+        self._bloom, self._last_pk = bloom, last_pk
+        self._built_at = self._synced_at = time.monotonic()
+
+    def sync(self):
+        """Add the rows inserted since the last rebuild or sync (one primary key range query, usually empty)."""
+        for pk, jti in RevokedToken.objects.filter(pk__gt=self._last_pk).order_by("pk").values_list("pk", "jti"):
+            self._bloom.add(jti)
+            self._last_pk = pk
+        self._synced_at = time.monotonic()
+
+    def add(self, jti):
+        if self._bloom is not None:
+            self._bloom.add(jti)
+
+    def reset(self):
+        self._bloom = None
+        self._built_at = 0.0
+
+
+revocation_filter = RevocationFilter()
+
+
+def is_revoked(jti):
+    if jti not in revocation_filter.get():
+        return False
+    if not is_process_local():
+        try:
+            if cache.get(cache_key(jti)):
+                return True
+        except Exception:
+            logger.warning("Revocation cache unavailable, checking the table", exc_info=True)
+    # an older revocation, or a false positive
+    return RevokedToken.objects.filter(jti=jti).exists()
+
+
+def revoke(token):
+    """
+    Blacklist a refresh token until its expiry. Returns False if it already was
+    (e.g. the same token refreshed twice concurrently).
+    """
+    jti = token[api_settings.JTI_CLAIM]
+    expires_at = datetime.fromtimestamp(token["exp"], tz=dt_timezone.utc)
+    try:
+        with transaction.atomic():
+            RevokedToken.objects.create(
+                jti=jti, user_id=token.get(api_settings.USER_ID_CLAIM), expires_at=expires_at,
+            )
+    except IntegrityError:
+        return False
+    cache.set(cache_key(jti), True, get_refresh_interval() * 2)
+    revocation_filter.add(jti)
+    return True
+
+
+def purge_expired(*, batch_size=5000):
+    """Delete revocations of tokens that have expired. Returns the number deleted."""
+    now = timezone.now()
+    total = 0
+    while True:
+        pks = list(
+            RevokedToken.objects.filter(expires_at__lte=now)
+            .order_by("expires_at").values_list("pk", flat=True)[:batch_size]
+        )
+        if not pks:
+            return total
+        total += RevokedToken.objects.filter(pk__in=pks).delete()[0]
@@ -1,14 +1,22 @@
-from django.db.models import Q
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
+from django.db import transaction
 from django.utils import timezone
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from django.utils.encoding import smart_str, force_str, smart_bytes, DjangoUnicodeDecodeError
 from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer, TokenVerifySerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken, UntypedToken
 from rest_framework.exceptions import AuthenticationFailed
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+from core.mail import queue_mail
+from accounts.authentication import TOKEN_VERSION_CLAIM, TOKEN_VERSION_KEY, load_principal, token_version
+from accounts.revocation import is_revoked, revoke
+from accounts.hashing import verify_password
+from accounts.otp import get_resend_interval, get_ttl
+from accounts.profile import invalidate_profile
 from django.conf import settings
 from django.contrib.sites.models import Site
 from accounts.models import Address
@@ -50,49 +58,126 @@ class AddressSerializer(serializers.ModelSerializer):
             'created_at',
             'updated_at',
         )
-        read_only_fields = ('id', 'created_at', 'updated_at')
-        # list_serializer_class = AddressBatchSerializer
+        read_only_fields = ('id', 'user', 'created_at', 'updated_at')
+        list_serializer_class = AddressBatchSerializer
 
-    def validate(self, attrs):
-        user = self.context['request'].user
-        address_type = attrs.get('address_type', getattr(self.instance, 'address_type', 'shipping'))
-        is_default = attrs.get('is_default', getattr(self.instance, 'is_default', False))
-
-        if is_default:
-            qs = Address.objects.filter(user=user, address_type=address_type, is_default=True)
-            if self.instance:
-                qs = qs.exclude(id=self.instance.id)
-            if qs.exists():
-                raise serializers.ValidationError(
-                    f"A default {address_type} address already exists for this user."
-                )
-        return attrs
+    # Setting is_default switches the default: Address.save clears the previous one.
 
     def create(self, validated_data):
-        user = self.context['request'].user
-        address_type = validated_data.get('address_type', 'shipping')
-        is_default = validated_data.get('is_default', False)
-
-        if is_default:
-            # Unset previous defaults automatically
-            Address.objects.filter(user=user, address_type=address_type, is_default=True).update(is_default=False)
-
-        return Address.objects.create(user=user, **validated_data)
+        validated_data.setdefault('user', self.context['request'].user)
+        return Address.objects.create(**validated_data)
 
     def update(self, instance, validated_data):
-        user = instance.user
-        address_type = validated_data.get('address_type', instance.address_type)
-        is_default = validated_data.get('is_default', instance.is_default)
-
-        if is_default:
-            # Unset previous defaults automatically
-            Address.objects.filter(user=user, address_type=address_type).exclude(id=instance.id).update(is_default=False)
-
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
         return instance
 
+
+class AddressBulkSerializer(serializers.Serializer):
+    """
+    Batch changes to the current user's address book:
+
+        {"create": [{...}, ...], "update": [{"id": 1, ...}, ...], "delete": [2, 3]}
+
+    Every row is validated in memory before anything is written. Saving then runs
+    one DELETE, one UPDATE per address type receiving a new default, one bulk
+    UPDATE and one bulk INSERT, in a single transaction.
+    """
+    create = AddressSerializer(many=True, required=False)
+    update = serializers.ListField(child=serializers.DictField(), required=False)
+    delete = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+    def validate(self, attrs):
+        user = self.context['request'].user
+        updates = attrs.get('update', [])
+        delete_ids = set(attrs.get('delete', []))
+
+        try:
+            update_ids = [int(item['id']) for item in updates]
+        except (KeyError, TypeError, ValueError):
+            raise serializers.ValidationError({"update": "Every address to update needs an integer id."})
+        if len(set(update_ids)) != len(update_ids):
+            raise serializers.ValidationError({"update": "An address can only be updated once per request."})
+        if delete_ids & set(update_ids):
+            raise serializers.ValidationError({"delete": "An address cannot be updated and deleted in the same request."})
+
+        owned = Address.objects.filter(user=user).in_bulk(set(update_ids) | delete_ids)
+        unknown = sorted((set(update_ids) | delete_ids) - owned.keys())
+        if unknown:
+            raise serializers.ValidationError({"id": f"Unknown address id(s): {', '.join(map(str, unknown))}"})
+
+        errors, validated_updates = {}, []
+        for index, (pk, item) in enumerate(zip(update_ids, updates)):
+            serializer = AddressSerializer(owned[pk], data=item, partial=True, context=self.context)
+            if serializer.is_valid():
+                validated_updates.append((owned[pk], serializer.validated_data))
+            else:
+                errors[index] = serializer.errors
+        if errors:
+            raise serializers.ValidationError({"update": errors})
+
+        # address type -> pk of the row becoming its default (None for a new row)
+        new_defaults = {}
+        claims = [
+            (item.get('address_type', 'shipping'), None)
+            for item in attrs.get('create', []) if item.get('is_default')
+        ] + [
+            (changes.get('address_type', instance.address_type), instance.pk)
+            for instance, changes in validated_updates
+            if changes.get('is_default') or (
+                changes.get('is_default', instance.is_default)
+                and changes.get('address_type', instance.address_type) != instance.address_type
+            )
+        ]
+        for address_type, pk in claims:
+            if address_type in new_defaults:
+                raise serializers.ValidationError(
+                    f"Multiple default addresses for {address_type} in the same request."
+                )
+            new_defaults[address_type] = pk
+
+        attrs['update'] = validated_updates
+        attrs['new_defaults'] = new_defaults
+        return attrs
+
+    def save(self):
+        user = self.context['request'].user
+        data = self.validated_data
+        now = timezone.now()
+
+        with transaction.atomic():
+            if data.get('delete'):
+                Address.objects.filter(user=user, pk__in=data['delete']).delete()
+
+            updated, fields = [], {'updated_at'}
+            for instance, changes in data['update']:
+                for attr, value in changes.items():
+                    setattr(instance, attr, value)
+                instance.updated_at = now
+                fields.update(changes)
+                updated.append(instance)
+
+            for address_type, keep_pk in data['new_defaults'].items():
+                Address.objects.filter(
+                    user=user, address_type=address_type, is_default=True,
+                ).exclude(pk=keep_pk).update(is_default=False)
+                for instance in updated:
+                    if instance.address_type == address_type and instance.pk != keep_pk:
+                        instance.is_default = False
+                fields.add('is_default')
+
+            if updated:
+                Address.objects.bulk_update(updated, sorted(fields))
+            created = Address.objects.bulk_create(
+                [Address(user=user, **item) for item in data.get('create', [])]
+            )
+
+        # bulk writes send no post_save
+        invalidate_profile(user.pk)
+        return updated + created
+
+
 class AdminUserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -117,17 +202,20 @@ class UserSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ('is_verified',)
 
-    def get_default_shipping_address(self, obj):
-        address = obj.addresses.filter(address_type='shipping', is_default=True).first()
+    def _default_address(self, obj, address_type):
+        # picked from obj.addresses.all() so a prefetch (accounts.profile) serves all three fields
+        address = next(
+            (a for a in obj.addresses.all() if a.address_type == address_type and a.is_default), None
+        )
         if address:
             return AddressSerializer(address).data
         return None
 
+    def get_default_shipping_address(self, obj):
+        return self._default_address(obj, 'shipping')
+
     def get_default_billing_address(self, obj):
-        address = obj.addresses.filter(address_type='billing', is_default=True).first()
-        if address:
-            return AddressSerializer(address).data
-        return None
+        return self._default_address(obj, 'billing')
 
     def create(self, validated_data):
         addresses_data = validated_data.pop('addresses', [])
@@ -195,23 +283,26 @@ class RegisterSerializer(serializers.ModelSerializer):
             phonenumber=validated_data.get('phonenumber'),
             password=validated_data['password']
         )
-        user.generate_otp()
         return user
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        # lets CachedJWTAuthentication reject tokens issued before a password change
+        token = super().get_token(user)
+        token[TOKEN_VERSION_CLAIM] = token_version(user.password)
+        return token
+
     def validate(self, attrs):
         username_or_email = attrs.get("username")
         password = attrs.get("password")
 
-        # Try email OR username in one query
-        try:
-            user = User.objects.get(Q(username=username_or_email) | Q(email=username_or_email))
-        except User.DoesNotExist:
-            user = None
+        # Username or email, case-insensitively (indexed lookups)
+        user = User.objects.get_for_login(username_or_email)
 
-        # Invalid credentials
-        if user is None or not user.check_password(password):
+        # Invalid credentials (upgrading the stored hash when it is outdated)
+        if not verify_password(user, password):
             raise AuthenticationFailed({
                 "code": "invalid_credentials",
                 "message": "Invalid credentials, try again"
@@ -224,24 +315,17 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
                 "message": "Account is inactive. Please contact support."
             })
 
-        # Account not verified → send OTP + error
+        # Account not verified → send OTP + error (unless one was sent moments ago)
         if not user.is_verified:
-            user.generate_otp()
             try:
-                current_site = Site.objects.get_current()
-                mail_subject = "Verify your account."
-                message = render_to_string("accounts/otp_email.html", {
-                    "user": user,
-                    "domain": current_site.domain,
-                    "otp": user.otp,
-                })
-                send_mail(
-                    mail_subject,
-                    message,
-                    settings.EMAIL_HOST_USER,
-                    [user.email],
-                    fail_silently=True 
-                )
+                otp = user.generate_otp(min_interval=get_resend_interval())
+                if otp is not None:
+                    current_site = Site.objects.get_current()
+                    queue_mail("Verify your account.", user.email, template="accounts/otp_email.html", context={
+                        "user": {"username": user.username},
+                        "domain": current_site.domain,
+                        "otp": otp,
+                    }, expires_in=get_ttl())
             except Exception as e:
                 # Log error (don’t block login response)
                 pass
@@ -251,9 +335,12 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
                 "message": "Your account is not verified. Please check your email for OTP."
             })
 
-        # Proceed with default JWT validation
-        attrs[self.username_field] = user.username
-        data = super().validate(attrs)
+        # Issue the JWT pair directly; super().validate() would authenticate() and hash the password again
+        self.user = user
+        refresh = self.get_token(user)
+        data = {"refresh": str(refresh), "access": str(refresh.access_token)}
+        if api_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, user)
 
         # Extend response payload
         data["username"] = user.username
@@ -263,6 +350,63 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         return data
 
 
+class BlacklistTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    simplejwt's refresh with our blacklist (accounts.revocation): revoked tokens are
+    rejected, and with BLACKLIST_AFTER_ROTATION the used token is revoked. The user
+    is checked against the cached principal instead of a users query.
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        if is_revoked(refresh[api_settings.JTI_CLAIM]):
+            raise InvalidToken("Token is blacklisted")
+
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        if user_id:
+            principal = load_principal(user_id)
+            if principal is None or not principal["is_active"]:
+                raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+            version = refresh.payload.get(TOKEN_VERSION_CLAIM)
+            if version is not None and version != principal[TOKEN_VERSION_KEY]:
+                raise InvalidToken("The user's password has been changed.")
+
+        data = {"access": str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            # the INSERT doubles as the reuse check when the same token is refreshed twice at once
+            if api_settings.BLACKLIST_AFTER_ROTATION and not revoke(refresh):
+                raise InvalidToken("Token is blacklisted")
+
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+
+            data["refresh"] = str(refresh)
+
+        return data
+
+
+class BlacklistTokenVerifySerializer(TokenVerifySerializer):
+    def validate(self, attrs):
+        token = UntypedToken(attrs["token"])
+        jti = token.get(api_settings.JTI_CLAIM)
+        if jti and token.get(api_settings.TOKEN_TYPE_CLAIM) == "refresh" and is_revoked(jti):
+            raise serializers.ValidationError("Token is blacklisted")
+        return {}
+
+
+class LogoutSerializer(serializers.Serializer):
+    refresh = serializers.CharField(required=True, write_only=True)
+
+    def validate(self, attrs):
+        try:
+            attrs['token'] = RefreshToken(attrs['refresh'])
+        except TokenError as e:
+            raise serializers.ValidationError({"refresh": [str(e)]})
+        return attrs
+
+
 class OTPVerificationSerializer(serializers.Serializer):
     email = serializers.EmailField(required=True)
     otp = serializers.CharField(required=True, max_length=6)
@@ -279,6 +423,7 @@ class OTPVerificationSerializer(serializers.Serializer):
         if not user.verify_otp(otp):
             raise serializers.ValidationError({"otp": "Invalid or expired OTP."}) # Here I'm providing a more specific error message based on the field.
 
+        attrs['user'] = user
         return attrs
 
 
@@ -0,0 +1,293 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.utils.rate_limit import RateLimit
+from . import revocation
+from .authentication import TOKEN_VERSION_CLAIM, cache_key, invalidate_user, load_principal, local_cache
+from .models import Address, RevokedToken, User
+from .revocation import is_revoked, revocation_filter, revoke
+from .serializers import CustomTokenObtainPairSerializer
+
+
+class AccountsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("ann", "ann@example.com", "Old-Password-1", is_verified=True)
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        revocation_filter.reset()
+        self.client = APIClient()
+
+    def authenticate(self, user=None):
+        token = CustomTokenObtainPairSerializer.get_token(user or self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+
+class CachedPrincipalTests(AccountsTestCase):
+    def test_saving_a_user_drops_the_cached_principal(self):
+        self.assertIsNone(load_principal(self.user.pk)["fullname"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).update(fullname="Ann Smith")
+            self.assertIsNone(load_principal(self.user.pk)["fullname"])  # update() alone is not seen
+            User.objects.get(pk=self.user.pk).save()
+
+        self.assertEqual(load_principal(self.user.pk)["fullname"], "Ann Smith")
+
+    def test_process_local_cache_holds_no_principals(self):
+        load_principal(self.user.pk)
+
+        # other workers could not see an invalidation there: only the short local LRU is used
+        self.assertIsNone(cache.get(cache_key(self.user.pk)))
+        self.assertIsNotNone(local_cache.get(cache_key(self.user.pk)))
+
+    @mock.patch("accounts.authentication.is_process_local", return_value=False)
+    def test_shared_cache_entry_is_invalidated(self, _):
+        load_principal(self.user.pk)
+        self.assertIsNotNone(cache.get(cache_key(self.user.pk)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_user(self.user.pk)
+
+        self.assertIsNone(cache.get(cache_key(self.user.pk)))
+        self.assertIsNone(local_cache.get(cache_key(self.user.pk)))
+
+    def test_password_change_rejects_earlier_tokens(self):
+        self.authenticate()
+        self.assertEqual(self.client.get("/api/auth/user/").status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password("New-Password-2")
+            self.user.save()
+
+        self.assertEqual(self.client.get("/api/auth/user/").status_code, 401)
+        self.authenticate(User.objects.get(pk=self.user.pk))
+        self.assertEqual(self.client.get("/api/auth/user/").status_code, 200)
+
+    def test_password_change_keeps_fields_the_principal_has_not_seen(self):
+        self.authenticate()
+        self.assertEqual(self.client.get("/api/auth/user/").status_code, 200)  # caches the principal
+        User.objects.filter(pk=self.user.pk).update(fullname="Ann Smith", is_staff=True)
+
+        response = self.client.post("/api/auth/change-password/", {
+            "old_password": "Old-Password-1", "new_password": "New-Password-2", "confirm_new_password": "New-Password-2",
+        }, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual((user.fullname, user.is_staff), ("Ann Smith", True))
+        self.assertTrue(user.check_password("New-Password-2"))
+
+
+class RevocationTests(AccountsTestCase):
+    def refresh_token(self):
+        return CustomTokenObtainPairSerializer.get_token(self.user)
+
+    def revoke_elsewhere(self, jti):
+        """A revocation by another worker: in the table, but not in this process's filter."""
+        RevokedToken.objects.create(jti=jti, user=self.user, expires_at=timezone.now() + timedelta(days=1))
+
+    def test_rotated_refresh_token_cannot_be_reused(self):
+        refresh = str(self.refresh_token())
+
+        response = self.client.post("/api/auth/token/refresh/", {"refresh": refresh}, format="json")
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post("/api/auth/token/refresh/", {"refresh": refresh}, format="json")
+        self.assertEqual(response.status_code, 401)
+
+    def test_revoke(self):
+        token = self.refresh_token()
+        self.assertFalse(is_revoked(token["jti"]))
+
+        self.assertTrue(revoke(token))
+        self.assertFalse(revoke(token))
+        self.assertTrue(is_revoked(token["jti"]))
+
+    def test_filter_miss_needs_no_query(self):
+        jti = self.refresh_token()["jti"]
+        self.assertFalse(is_revoked(jti))  # builds the filter
+
+        with self.assertNumQueries(0):
+            self.assertFalse(is_revoked(jti))
+
+    def test_revocations_elsewhere_are_picked_up_by_the_sync(self):
+        jti = self.refresh_token()["jti"]
+        self.assertFalse(is_revoked(jti))
+
+        self.revoke_elsewhere(jti)
+        self.assertFalse(is_revoked(jti))  # until the next sync
+
+        with override_settings(AUTH_REVOCATION_FILTER_SYNC=0):
+            self.assertTrue(is_revoked(jti))
+
+    def test_rotated_token_revoked_elsewhere_is_refused_before_the_sync(self):
+        refresh = self.refresh_token()
+        self.assertFalse(is_revoked(refresh["jti"]))
+        self.revoke_elsewhere(refresh["jti"])
+
+        response = self.client.post("/api/auth/token/refresh/", {"refresh": str(refresh)}, format="json")
+        self.assertEqual(response.status_code, 401)
+
+    @mock.patch("accounts.revocation.is_process_local", return_value=False)
+    def test_shared_cache_answers_filter_hits(self, _):
+        token = self.refresh_token()
+        self.assertFalse(is_revoked(token["jti"]))
+        self.assertTrue(revoke(token))
+
+        with self.assertNumQueries(0):
+            self.assertTrue(is_revoked(token["jti"]))
+
+    @mock.patch("accounts.revocation.is_process_local", return_value=False)
+    def test_cache_errors_fall_back_to_the_table(self, _):
+        token = self.refresh_token()
+        self.assertTrue(revoke(token))
+
+        with mock.patch.object(revocation.cache, "get", side_effect=ConnectionError):
+            self.assertTrue(is_revoked(token["jti"]))
+
+
+class LoginRateLimitTests(AccountsTestCase):
+    def login(self, password, username="ann"):
+        return self.client.post("/api/auth/login/", {"username": username, "password": password}, format="json")
+
+    def test_failed_logins_are_limited_per_account(self):
+        for _ in range(5):
+            self.assertEqual(self.login("wrong").status_code, 400)
+
+        response = self.login("Old-Password-1")
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 0)
+        self.assertEqual(self.login("wrong", username="bob").status_code, 400)
+
+    def test_successful_login_resets_the_account_limit(self):
+        for _ in range(4):
+            self.login("wrong")
+        self.assertEqual(self.login("Old-Password-1").status_code, 200)
+
+        for _ in range(5):
+            self.assertEqual(self.login("wrong").status_code, 400)
+
+    def test_token_route_is_the_login_path(self):
+        for _ in range(5):
+            self.client.post("/api/auth/token/", {"username": "ANN", "password": "wrong"}, format="json")
+        self.assertEqual(self.login("Old-Password-1").status_code, 429)
+
+        cache.clear()
+        response = self.client.post("/api/auth/token/", {"username": "ANN", "password": "Old-Password-1"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(TOKEN_VERSION_CLAIM, AccessToken(response.json()["data"]["access"]).payload)
+
+    @override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.PBKDF2PasswordHasher",
+                                         "django.contrib.auth.hashers.MD5PasswordHasher"])
+    def test_outdated_hashes_are_upgraded_on_login(self):
+        User.objects.filter(pk=self.user.pk).update(password=make_password("Old-Password-1", hasher="md5"))
+
+        self.assertEqual(self.login("Old-Password-1").status_code, 200)
+        self.assertTrue(User.objects.get(pk=self.user.pk).password.startswith("pbkdf2_sha256$"))
+
+    def test_concurrent_requests_cannot_exceed_the_limit(self):
+        limit = RateLimit("test", limit=5, period=60)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: limit.consume("key")[0], range(40)))
+        self.assertEqual(results.count(True), 5)
+
+    def test_window_slides(self):
+        limit = RateLimit("test", limit=4, period=60)
+        with mock.patch("core.utils.rate_limit.time.time", return_value=6000.0):  # start of a window
+            self.assertEqual([limit.consume("key")[0] for _ in range(5)], [True] * 4 + [False])
+        with mock.patch("core.utils.rate_limit.time.time", return_value=6090.0):
+            # half of the previous window's 4 still counts: 2 more fit
+            self.assertEqual([limit.consume("key")[0] for _ in range(3)], [True, True, False])
+            allowed, retry_after = limit.consume("key")
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(retry_after, 15.0)
+
+
+def address(user, **fields):
+    fields = {"address_line1": "1 Main St", "city": "Pune", "state": "MH", "postal_code": "411001", **fields}
+    return Address.objects.create(user=user, **fields)
+
+
+class ProfileTests(AccountsTestCase):
+    def test_unchanged_profile_is_not_sent_again(self):
+        self.authenticate()
+        response = self.client.get("/api/auth/user/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+        etag = response["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/auth/user/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_address_changes_change_the_etag(self):
+        self.authenticate()
+        etag = self.client.get("/api/auth/user/")["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            shipping = address(self.user, is_default=True)
+
+        response = self.client.get("/api/auth/user/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["data"]["default_shipping_address"]["id"], shipping.pk)
+
+
+class AddressDefaultTests(AccountsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.authenticate()
+        self.home = address(self.user, is_default=True)
+        self.office = address(self.user, address_line1="2 Office Rd")
+
+    def defaults(self, address_type="shipping"):
+        return list(Address.objects.filter(user=self.user, address_type=address_type, is_default=True)
+                    .values_list("pk", flat=True))
+
+    def batch(self, payload):
+        return self.client.post("/api/auth/user/addresses/batch/", payload, format="json")
+
+    def test_database_allows_one_default_per_type(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Address.objects.filter(pk=self.office.pk).update(is_default=True)
+
+        address(self.user, address_type="billing", is_default=True)  # other types are independent
+        self.assertEqual(self.defaults(), [self.home.pk])
+
+    def test_saving_a_new_default_switches_it(self):
+        response = self.client.patch(f"/api/auth/user/addresses/{self.office.pk}/", {"is_default": True}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.defaults(), [self.office.pk])
+
+    def test_batch_switches_the_default(self):
+        response = self.batch({
+            "update": [{"id": self.office.pk, "is_default": True}],
+            "create": [{"address_line1": "3 New St", "city": "Pune", "state": "MH", "postal_code": "411002",
+                        "address_type": "billing", "is_default": True}],
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.defaults(), [self.office.pk])
+        self.assertEqual(len(self.defaults("billing")), 1)
+
+    def test_batch_with_two_defaults_for_a_type_is_rejected(self):
+        new = {"address_line1": "3 New St", "city": "Pune", "state": "MH", "postal_code": "411002", "is_default": True}
+
+        response = self.batch({"update": [{"id": self.office.pk, "is_default": True}], "create": [new]})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.defaults(), [self.home.pk])
+        self.assertEqual(Address.objects.filter(user=self.user).count(), 2)
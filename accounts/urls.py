@@ -1,7 +1,7 @@
 from django.urls import path
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView, TokenVerifyView
+from rest_framework_simplejwt.views import TokenRefreshView, TokenVerifyView
 from .views import (
-    AddressDetailView, AddressListCreateView, RegisterView, OTPVerificationView, LoginView, ChangePasswordView,
+    AddressBatchView, AddressDetailView, AddressListCreateView, RegisterView, OTPVerificationView, LoginView, LogoutView, ChangePasswordView,
     RequestPasswordResetEmailView, PasswordResetConfirmView, ResendOTPView, UserDetailView
 )
 
@@ -10,15 +10,18 @@ urlpatterns = [
     path('verify-otp/', OTPVerificationView.as_view(), name='verify_otp'),
     path('resend-otp/', ResendOTPView.as_view(), name='resend_otp'),
     path('login/', LoginView.as_view(), name='login'),
+    path('logout/', LogoutView.as_view(), name='logout'),
     path('change-password/', ChangePasswordView.as_view(), name='change_password'),
     path('request-reset-email/', RequestPasswordResetEmailView.as_view(), name='request_reset_email'),
     path('password-reset-confirm/<uidb64>/<token>/', PasswordResetConfirmView.as_view(), name='password_reset_confirm'),
     path('user/', UserDetailView.as_view(), name='user_detail'),
     
     path('user/addresses/', AddressListCreateView.as_view(), name='user_addresses'),
+    path('user/addresses/batch/', AddressBatchView.as_view(), name='user_address_batch'),
     path('user/addresses/<int:pk>/', AddressDetailView.as_view(), name='user_address_detail'),
 
-    path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    # same login path (limits, token version claim) as login/
+    path('token/', LoginView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('token/verify/', TokenVerifyView.as_view(), name='token_verify'),
 
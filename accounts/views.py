@@ -1,22 +1,29 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+import math
 import uuid
 from rest_framework import generics, permissions, status
 
 from accounts.models import Address
 from .serializers import (
-    AddressSerializer, UserSerializer, RegisterSerializer, CustomTokenObtainPairSerializer, OTPVerificationSerializer,
-    ChangePasswordSerializer, ResetPasswordEmailSerializer, ResetPasswordConfirmSerializer, ResendOTPSerializer
+    AddressSerializer, AddressBulkSerializer, RegisterSerializer, CustomTokenObtainPairSerializer, OTPVerificationSerializer,
+    ChangePasswordSerializer, ResetPasswordEmailSerializer, ResetPasswordConfirmSerializer, ResendOTPSerializer,
+    LogoutSerializer
 )
 from django.contrib.auth import get_user_model
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+from core.mail import queue_mail
+from core.utils.rate_limit import RateLimit
+from core.utils.response_utils import build_envelope
+from accounts.otp import get_resend_interval, get_ttl
+from accounts.profile import get_profile
+from accounts.revocation import revoke
 from django.conf import settings
 from django.contrib.sites.shortcuts import get_current_site
-from django.utils.http import urlsafe_base64_encode
+from django.http import HttpResponseNotModified
+from django.utils.http import parse_etags, urlsafe_base64_encode
 from django.utils.encoding import smart_bytes
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 
@@ -48,19 +55,15 @@ def get_standard_response(
     if request_id is None:
         request_id = str(uuid.uuid4())
 
-    return Response({
-        "success": success,
-        "status": status_code,
-        "message": message,
-        "special_code": special_code,
-        "data": data,
-        "errors": errors,
-        "meta": {
-            "request_id": request_id,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
-            "pagination": pagination
-        }
-    }, status=status_code)        
+    meta = {
+        "request_id": request_id,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "pagination": pagination
+    }
+    return Response(
+        build_envelope(success, message, special_code, data, errors, meta, status=status_code),
+        status=status_code,
+    )
 
 
 class RegisterView(generics.CreateAPIView):
@@ -71,22 +74,15 @@ class RegisterView(generics.CreateAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
+        otp = user.generate_otp()
 
-        # Send OTP email
+        # Queue OTP email (sent by the task worker)
         current_site = get_current_site(request)
-        mail_subject = 'Activate your account.'
-        message = render_to_string('accounts/otp_email.html', {
-            'user': user,
+        queue_mail('Activate your account.', user.email, template='accounts/otp_email.html', context={
+            'user': {'username': user.username},
             'domain': current_site.domain,
-            'otp': user.otp,
-        })
-        send_mail(
-            mail_subject,
-            message,
-            settings.EMAIL_HOST_USER,
-            [user.email],
-            fail_silently=False
-        )
+            'otp': otp,
+        }, expires_in=get_ttl())
 
         headers = self.get_success_headers(serializer.data)
         return get_standard_response(
@@ -106,23 +102,45 @@ class OTPVerificationView(APIView):
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        email = serializer.validated_data['email']
-        user = User.objects.get(email=email)
+        user = serializer.validated_data['user']
+        data, _ = get_profile(user)
 
         return get_standard_response(
             success=True,
-            data=UserSerializer(user).data,
+            data=data,
             message="Account verified successfully.",
             special_code="account_verified_successful",
             status_code=status.HTTP_200_OK
         )
 
 
+def _login_limit(setting, default, prefix):
+    limit, period = getattr(settings, setting, default)
+    return RateLimit(prefix, limit=limit, period=period)
+
+
 class LoginView(TokenObtainPairView):
     permission_classes = (AllowAny,)
     serializer_class = CustomTokenObtainPairSerializer
 
+    account_limit = _login_limit('LOGIN_RATE_LIMIT_PER_ACCOUNT', (5, 60), 'login-account')
+    ip_limit = _login_limit('LOGIN_RATE_LIMIT_PER_IP', (30, 60), 'login-ip')
+
     def post(self, request, *args, **kwargs):
+        account = str(request.data.get('username') or '').strip().lower()
+        for limit, key in ((self.account_limit, account), (self.ip_limit, request.META.get('REMOTE_ADDR', ''))):
+            allowed, retry_after = limit.consume(key)
+            if not allowed:
+                response = get_standard_response(
+                    success=False,
+                    message="Too many login attempts. Please try again later.",
+                    special_code="too_many_login_attempts",
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    errors={"detail": ["Too many login attempts. Please try again later."]},
+                )
+                response['Retry-After'] = str(math.ceil(retry_after))
+                return response
+
         serializer = self.get_serializer(data=request.data)
         try:
             serializer.is_valid(raise_exception=True)
@@ -148,6 +166,7 @@ class LoginView(TokenObtainPairView):
                 errors=errors,
             )
         
+        self.account_limit.reset(account)
         return get_standard_response(
             success=True,
             data=serializer.validated_data,
@@ -157,6 +176,25 @@ class LoginView(TokenObtainPairView):
         )
 
 
+class LogoutView(APIView):
+    """Blacklist the given refresh token; access tokens simply run out (ACCESS_TOKEN_LIFETIME)."""
+    permission_classes = (AllowAny,)
+    serializer_class = LogoutSerializer
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        revoke(serializer.validated_data['token'])
+
+        return get_standard_response(
+            success=True,
+            message="Logged out successfully.",
+            special_code="logout_successful",
+            status_code=status.HTTP_200_OK,
+            data=None,
+        )
+
+
 class ChangePasswordView(APIView):
     permission_classes = (IsAuthenticated,)
     serializer_class = ChangePasswordSerializer
@@ -180,7 +218,8 @@ class ChangePasswordView(APIView):
             )
         
         user.set_password(new_password)
-        user.save()
+        # request.user is built from the cached principal, which may lag the row: write only the password
+        user.save(update_fields=['password'])
 
         return get_standard_response(
             success=True,
@@ -209,21 +248,13 @@ class RequestPasswordResetEmailView(APIView):
             relative_link = f"/reset-password-confirm/{uidb64}/{token}/"  # Frontend URL
             absurl = f"http://{current_site.domain}{relative_link}"
 
-            mail_subject = 'Reset your password.'
-            message = render_to_string('accounts/password_reset_email.html', {
-                'user': user,
+            queue_mail('Reset your password.', user.email, template='accounts/password_reset_email.html', context={
+                'user': {'username': user.username},
                 'domain': current_site.domain,
                 'uid': uidb64,
                 'token': token,
                 'absurl': absurl,
-            })
-            send_mail(
-                mail_subject, 
-                message, 
-                settings.EMAIL_HOST_USER, 
-                [user.email], 
-                fail_silently=False
-            )
+            }, expires_in=timedelta(seconds=settings.PASSWORD_RESET_TIMEOUT))
         
         return get_standard_response(
             success=True,
@@ -238,8 +269,12 @@ class PasswordResetConfirmView(APIView):
     permission_classes = (AllowAny,)
     serializer_class = ResetPasswordConfirmSerializer
 
-    def post(self, request):
-        serializer = self.serializer_class(data=request.data)
+    def post(self, request, uidb64=None, token=None):
+        # the link's uidb64/token, unless the client sends them in the body
+        data = request.data.copy()
+        data.setdefault('uidb64', uidb64)
+        data.setdefault('token', token)
+        serializer = self.serializer_class(data=data)
         serializer.is_valid(raise_exception=True)
 
         return get_standard_response(
@@ -262,22 +297,22 @@ class ResendOTPView(APIView):
         email = serializer.validated_data['email']
         user = User.objects.get(email=email)  # User existence already checked in serializer
         
-        user.generate_otp()
+        otp = user.generate_otp(min_interval=get_resend_interval())
+        if otp is None:
+            return get_standard_response(
+                success=False,
+                message="An OTP was sent moments ago. Please wait before requesting another.",
+                special_code="otp_recently_sent",
+                errors={"email": ["An OTP was sent moments ago. Please wait before requesting another."]},
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            )
 
         current_site = get_current_site(request)
-        mail_subject = 'Verify your account.'
-        message = render_to_string('accounts/otp_email.html', {
-            'user': user,
+        queue_mail('Verify your account.', user.email, template='accounts/otp_email.html', context={
+            'user': {'username': user.username},
             'domain': current_site.domain,
-            'otp': user.otp,
-        })
-        send_mail(
-            mail_subject, 
-            message, 
-            settings.EMAIL_HOST_USER, 
-            [user.email], 
-            fail_silently=False
-        )
+            'otp': otp,
+        }, expires_in=get_ttl())
 
         return get_standard_response(
             success=True,
@@ -292,13 +327,21 @@ class UserDetailView(APIView):
     permission_classes = (IsAuthenticated,)
 
     def get(self, request):
-        serializer = UserSerializer(request.user)
-        return get_standard_response(
-            success=True,
-            message="User data fetched successfully.",
-            status_code=status.HTTP_200_OK,
-            data=serializer.data,
-        )
+        data, etag = get_profile(request.user)
+        # weak comparison, as If-None-Match requires
+        client_etags = [tag.removeprefix('W/') for tag in parse_etags(request.headers.get('If-None-Match', ''))]
+        if '*' in client_etags or etag.removeprefix('W/') in client_etags:
+            response = HttpResponseNotModified()
+        else:
+            response = get_standard_response(
+                success=True,
+                message="User data fetched successfully.",
+                status_code=status.HTTP_200_OK,
+                data=data,
+            )
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
 
 
 class AddressListCreateView(generics.ListCreateAPIView):
@@ -316,4 +359,23 @@ class AddressDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Address.objects.filter(user=self.request.user)
\ No newline at end of file
+        return Address.objects.filter(user=self.request.user)
+
+
+class AddressBatchView(APIView):
+    """Create, update and delete many addresses in one request (see AddressBulkSerializer)."""
+    permission_classes = [IsAuthenticated]
+    serializer_class = AddressBulkSerializer
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        return get_standard_response(
+            success=True,
+            message="Addresses updated successfully.",
+            special_code="addresses_updated",
+            status_code=status.HTTP_200_OK,
+            data=AddressSerializer(Address.objects.filter(user=request.user), many=True).data,
+        )
@@ -4,6 +4,7 @@ from django.dispatch import receiver
 from django.db.models.signals import post_save, post_delete
 from django.db.models import Sum
 from core.utils.common import TimeStampedModel
+from inventory.models import ReservationHold
 
 
 class Cart(TimeStampedModel):
@@ -98,3 +99,14 @@ def update_cart_total(sender, instance, **kwargs):
     """
     if instance.cart_id:
         instance.cart.recalc_total()
+
+
+@receiver([post_save, post_delete], sender=CartItem)
+def extend_cart_reservations(sender, instance, **kwargs):
+    """
+    Cart activity keeps the cart's stock reservations (holds owned by
+    "cart:<id>") alive; abandoned carts let them expire and the sweeper hands
+    the stock back.
+    """
+    if instance.cart_id:
+        ReservationHold.extend(f"cart:{instance.cart_id}")
@@ -6,7 +6,7 @@ from .serializers import CartSerializer, CartItemSerializer, PriceSnapshotSerial
 
 
 class CartViewSet(viewsets.ModelViewSet):
-    queryset = Cart.objects.all().select_related("user").prefetch_related("items")
+    queryset = Cart.objects.all().select_related("user").prefetch_related("items__price_snapshot")
     serializer_class = CartSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -23,8 +23,8 @@ class CartViewSet(viewsets.ModelViewSet):
         """
         user = self.request.user
         if user.is_staff:
-            return Cart.objects.all()
-        return Cart.objects.filter(user=user)
+            return self.queryset
+        return self.queryset.filter(user=user)
 
     @action(detail=True, methods=["post"], url_path="checkout")
     def checkout(self, request, pk=None):
@@ -61,8 +61,8 @@ class CartItemViewSet(viewsets.ModelViewSet):
         """
         user = self.request.user
         if user.is_staff:
-            return CartItem.objects.all()
-        return CartItem.objects.filter(cart__user=user)
+            return self.queryset
+        return self.queryset.filter(cart__user=user)
 
 
 class PriceSnapshotViewSet(viewsets.ModelViewSet):
@@ -1,4 +1,7 @@
+from django.db.models import Q
 from rest_framework import serializers
+
+from core.serializers import CompiledSerializer, Nested
 from .models import (
     Category, Brand, Product, ProductAttribute, ProductAttributeValue,
     ProductVariant, ProductImage
@@ -58,3 +61,16 @@ class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         exclude = ('deleted_at',)
+
+
+class CompiledCategorySerializer(CompiledSerializer):
+    serializer_class = CategorySerializer
+    nested = {"children": Nested("self", source="children", filter=Q(is_active=True))}
+
+
+class CompiledProductSerializer(CompiledSerializer):
+    """ProductSerializer output from values() rows, for the product list."""
+    serializer_class = ProductSerializer
+    nested = {"categories": Nested(CompiledCategorySerializer)}
+    # Product.total_stock, from the variants already serialized
+    computed = {"total_stock": lambda item: sum(variant["stock_quantity"] for variant in item["variants"])}
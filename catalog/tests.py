@@ -1,3 +1,60 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.test import RequestFactory, TestCase
+from rest_framework.renderers import JSONRenderer
+
+from .models import Brand, Category, Product, ProductImage, ProductVariant
+from .serializers import CategorySerializer, CompiledCategorySerializer, CompiledProductSerializer, ProductSerializer
+
+
+class CompiledProductSerializerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        brand = Brand.objects.create(name="Acme", logo="brands/acme.png")
+        root = Category.objects.create(name="Root")
+        child = Category.objects.create(name="Child", parent=root)
+        Category.objects.create(name="Grandchild", parent=child)
+        Category.objects.create(name="Hidden", parent=root, is_active=False)
+        other = Category.objects.create(name="Other", is_active=False)
+
+        for i in range(3):
+            product = Product.objects.create(
+                sku=f"P{i}", name=f"Product {i}", price=Decimal("19.90"),
+                discount_price=Decimal("15") if i else None, brand=brand if i != 1 else None,
+                metadata={"tags": ["a", i]},
+            )
+            product.categories.set([root, other] if i == 0 else [child])
+            for j in range(i):
+                ProductVariant.objects.create(
+                    product=product, sku=f"V{i}-{j}", name=f"Variant {j}", price=Decimal("9.5"),
+                    attributes={"size": "M"}, weight_kg=Decimal("1.25"), stock_quantity=j + 3,
+                )
+            ProductImage.objects.create(product=product, image=f"products/{i}.jpg", is_primary=True)
+        Product.objects.create(sku="P-empty", name="Empty", price=Decimal("1.00"))
+
+    def assertSameOutput(self, queryset, context):
+        expected = ProductSerializer(queryset, many=True, context=context).data
+        actual = CompiledProductSerializer(context=context).serialize(queryset)
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+
+    def test_matches_product_serializer(self):
+        self.assertSameOutput(Product.objects.order_by("-created_at"), {})
+
+    def test_matches_with_absolute_file_urls(self):
+        request = RequestFactory().get("/api/catalog/products/")
+        self.assertSameOutput(Product.objects.order_by("sku"), {"request": request})
+
+    def test_queries_do_not_grow_with_rows(self):
+        serializer = CompiledProductSerializer()
+        # products, categories, one per level below them (root > child > grandchild > none), brands,
+        # variants, images
+        with self.assertNumQueries(8):
+            serializer.serialize(Product.objects.all())
+        with self.assertNumQueries(0):
+            self.assertEqual(serializer.serialize(Product.objects.none()), [])
+
+    def test_category_list_matches_category_serializer(self):
+        queryset = Category.objects.filter(is_active=True, deleted_at__isnull=True).order_by("pk")
+        expected = CategorySerializer(queryset, many=True).data
+        actual = CompiledCategorySerializer().serialize(queryset)
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
@@ -12,7 +12,7 @@ from .models import (
 from .serializers import (
     CategorySerializer, BrandSerializer, ProductSerializer,
     ProductAttributeSerializer, ProductAttributeValueSerializer,
-    ProductVariantSerializer, ProductImageSerializer
+    ProductVariantSerializer, ProductImageSerializer, CompiledCategorySerializer, CompiledProductSerializer
 )
 from core.utils.response_utils import api_response
 
@@ -57,6 +57,12 @@ class CategoryViewSet(BaseViewSet):
     search_fields = ['name']
     filterset_fields = ['is_active', 'is_featured']
 
+    def list(self, request, *args, **kwargs):
+        # children come one query per tree level instead of one per category
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = CompiledCategorySerializer(context=self.get_serializer_context())
+        return api_response(data=serializer.serialize(queryset))
+
 
 class BrandViewSet(BaseViewSet):
     queryset = Brand.objects.filter(is_active=True, deleted_at__isnull=True)
@@ -67,7 +73,7 @@ class BrandViewSet(BaseViewSet):
 
 
 class ProductAttributeViewSet(BaseViewSet):
-    queryset = ProductAttribute.objects.filter(is_active=True)
+    queryset = ProductAttribute.objects.filter(is_active=True).prefetch_related('values')
     serializer_class = ProductAttributeSerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ['name']
@@ -99,19 +105,24 @@ class ProductViewSet(BaseViewSet):
 
     filter_backends = [filters.SearchFilter, DjangoFilterBackend, filters.OrderingFilter]
     filterset_class = ProductFilter
-    search_fields = ['name', 'sku', 'brand__name', 'category__name']
+    search_fields = ['name', 'sku', 'brand__name', 'categories__name']
     # filterset_fields = ['is_listed', 'is_featured', 'brand', 'categories']
     ordering_fields = ["price", "name", "created_at"]
     ordering = ['-created_at']
 
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = CompiledProductSerializer(context=self.get_serializer_context())
+        return api_response(data=serializer.serialize(queryset))
+
     @action(detail=True, methods=['get'])
-    def variants(self, request, pk=None):
+    def variants(self, request, slug=None):
         product = self.get_object()
         serializer = ProductVariantSerializer(product.variants.all(), many=True)
         return api_response(data=serializer.data)
 
     @action(detail=True, methods=['get'])
-    def images(self, request, pk=None):
+    def images(self, request, slug=None):
         product = self.get_object()
         serializer = ProductImageSerializer(product.images.all(), many=True)
         return api_response(data=serializer.data)
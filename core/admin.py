@@ -0,0 +1,47 @@
+from django.contrib import admin
+
+from .models import IdempotencyKey, OutboxEvent, OutgoingEmail, Task
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ("id", "key", "scope", "status", "response_status", "created_at", "expires_at")
+    search_fields = ("key", "scope")
+    list_filter = ("status",)
+    readonly_fields = ("key", "scope", "fingerprint", "status", "response_status", "response_body", "created_at",
+                       "heartbeat_at", "expires_at")
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ("id", "topic", "aggregate_type", "aggregate_id", "attempts", "failed", "created_at", "processed_at")
+    search_fields = ("topic", "aggregate_id")
+    list_filter = ("topic", "failed")
+    readonly_fields = ("topic", "aggregate_type", "aggregate_id", "payload", "created_at", "available_at",
+                       "attempts", "last_error", "processed_at", "failed")
+    actions = ["retry_events"]
+
+    @admin.action(description="Retry selected events")
+    def retry_events(self, request, queryset):
+        from django.utils import timezone
+        count = queryset.update(processed_at=None, failed=False, attempts=0, available_at=timezone.now())
+        self.message_user(request, f"Queued {count} event(s) for redelivery.")
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "status", "attempts", "run_at", "started_at", "finished_at")
+    search_fields = ("name",)
+    list_filter = ("status", "name")
+    readonly_fields = ("name", "args", "kwargs", "attempts", "last_error", "created_at", "started_at", "heartbeat_at",
+                       "finished_at")
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ("id", "subject", "status", "attempts", "created_at", "sent_at")
+    search_fields = ("subject", "to")
+    list_filter = ("status", "template")
+    readonly_fields = ("to", "from_email", "subject", "template", "attempts",
+                       "last_error", "created_at", "expires_at", "sent_at")
+    exclude = ("context", "body")  # may hold OTPs / reset links until sent
@@ -0,0 +1,397 @@
+"""
+Synthetic data for performance work, scaled from seed/products_seed.json.
+
+Every seed product is a template: generated products take its category,
+brand pool, name pattern and price band, with variants (sizes, colours,
+volumes, depending on the category) stocked in a few warehouses each. Users
+get an address, some of them an open cart, and orders spread over the last
+year are placed by random users for random variants.
+
+Rows are written with bulk_create in batches, so model save() methods and
+signals do not run; what they would maintain (slugs, line totals, cart
+totals, VariantAvailability and ProductVariant.stock_quantity, opening-stock
+ledger rows) is written directly. Each section draws from its own random
+stream seeded with `seed`, so the same options produce the same data
+(timestamps aside), and changing the number of orders leaves the catalog
+unchanged. Generated rows are recognisable by their prefix (GEN- skus,
+order references and warehouse codes, gen- usernames and slugs); generating
+into a database that already holds them is refused.
+"""
+import json
+import random
+import time
+from array import array
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from accounts.models import Address, User
+from cart.models import Cart, CartItem, PriceSnapshot
+from catalog.models import (
+    Brand, Category, Product, ProductAttribute, ProductAttributeValue, ProductImage, ProductVariant,
+)
+from inventory.models import Inventory, InventoryTransaction, VariantAvailability, Warehouse, WarehouseRegion
+from orders.models import Order, OrderItem
+
+PASSWORD = "Dataset-Password-1"  # every generated user's password
+SEED_FILE = Path(settings.BASE_DIR) / "seed" / "products_seed.json"
+
+AUDIENCES = ("Men", "Women", "Kids")
+STYLES = ("Classic", "Premium", "Everyday", "Signature", "Urban", "Heritage", "Sport", "Limited Edition")
+COLOURS = ("Black", "Brown", "Navy", "Olive", "Maroon", "Grey", "White", "Royal Blue", "Tan", "Beige")
+OPTIONS = {
+    # attribute -> values a variant of a product in that category picks from
+    "belts": ("size", ("28", "30", "32", "34", "36", "38")),
+    "clothes": ("size", ("XS", "S", "M", "L", "XL", "XXL")),
+    "shoes": ("size", ("6", "7", "8", "9", "10", "11")),
+    "watches": ("strap", ("Leather", "Steel", "Silicone", "Mesh")),
+    "perfumes": ("volume", ("30ml", "50ml", "100ml", "150ml")),
+}
+CITIES = (
+    ("Mumbai", "Maharashtra", "400001"), ("Pune", "Maharashtra", "411001"), ("Delhi", "Delhi", "110001"),
+    ("Bengaluru", "Karnataka", "560001"), ("Chennai", "Tamil Nadu", "600001"), ("Hyderabad", "Telangana", "500001"),
+    ("Kolkata", "West Bengal", "700001"), ("Ahmedabad", "Gujarat", "380001"), ("Jaipur", "Rajasthan", "302001"),
+    ("Lucknow", "Uttar Pradesh", "226001"), ("Kochi", "Kerala", "682001"), ("Indore", "Madhya Pradesh", "452001"),
+)
+FIRST_NAMES = ("Aarav", "Vivaan", "Aditya", "Ananya", "Diya", "Isha", "Kabir", "Meera", "Rohan", "Saanvi",
+               "Arjun", "Priya", "Nikhil", "Kavya", "Rahul", "Sneha", "Vikram", "Pooja", "Karan", "Riya")
+LAST_NAMES = ("Sharma", "Patel", "Iyer", "Reddy", "Khan", "Gupta", "Nair", "Singh", "Das", "Mehta",
+              "Joshi", "Kulkarni", "Bose", "Menon", "Chopra")
+# (status, weight) of historical orders
+ORDER_STATUSES = (("delivered", 55), ("shipped", 8), ("processing", 5), ("confirmed", 7), ("pending", 10),
+                  ("cancelled", 10), ("returned", 3), ("refunded", 2))
+CART_SHARE = 10  # one user in CART_SHARE has an open cart
+
+
+def parse_count(value):
+    """argparse type for counts written as 500, 500k, 2.5M or 1_000_000."""
+    text = str(value).strip().lower().replace("_", "")
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    if scale != 1:
+        text = text[:-1]
+    try:
+        count = int(float(text) * scale)
+    except ValueError:
+        raise ValueError(f"not a count: {value!r}")
+    if count < 0:
+        raise ValueError(f"not a count: {value!r}")
+    return count
+
+
+def load_templates(path=SEED_FILE):
+    with open(path, encoding="utf-8") as seed_file:
+        templates = json.load(seed_file)
+    for template in templates:
+        base, _, _ = template["name"].partition(" - ")
+        template["base_name"] = base
+        template["option"] = OPTIONS.get(template["category"], ("colour", COLOURS))
+    return templates
+
+
+def money(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+class DatasetGenerator:
+    def __init__(self, *, products, variants_per_product, warehouses, users, orders, seed=0, batch_size=5000,
+                 log=None):
+        self.products = products
+        self.variants_per_product = max(1, variants_per_product)
+        self.warehouses = max(1, warehouses)
+        self.users = users
+        self.orders = orders if users else 0
+        self.seed = seed
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.templates = load_templates()
+        self.now = timezone.now()
+
+        # kept between sections: ids only, in compact arrays
+        self.warehouse_ids = []
+        self.variant_ids = array("q")
+        self.variant_cents = array("q")
+        self.user_ids = array("q")
+        self.address_ids = array("q")
+
+    def rng(self, section):
+        return random.Random(f"{self.seed}:{section}")
+
+    @staticmethod
+    def exists():
+        return Product.all_objects.filter(sku__startswith="GEN-").exists() or \
+            User.objects.filter(username__startswith="gen-").exists()
+
+    def run(self):
+        self.section("warehouses", self.generate_warehouses)
+        self.section("catalog", self.generate_catalog)
+        self.section("users", self.generate_users)
+        self.section("carts", self.generate_carts)
+        self.section("orders", self.generate_orders)
+
+    def section(self, name, func):
+        started = time.perf_counter()
+        rows = func(self.rng(name))
+        elapsed = time.perf_counter() - started
+        rate = rows / elapsed if elapsed else 0
+        self.log(f"{name:<10} {rows:>12,} rows  {elapsed:8.1f}s  {rate:10,.0f} rows/s")
+
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield range(start, min(start + self.batch_size, total))
+
+    # warehouses ---------------------------------------------------------------
+
+    def generate_warehouses(self, rng):
+        warehouses = Warehouse.objects.bulk_create([
+            Warehouse(
+                code=f"GEN-WH-{i + 1:03d}", name=f"{CITIES[i % len(CITIES)][0]} Fulfilment Centre {i // len(CITIES) + 1}",
+                address=f"Plot {rng.randint(1, 300)}, Industrial Area, {CITIES[i % len(CITIES)][0]}",
+                location_code=f"DC{i + 1:03d}", timezone="Asia/Kolkata",
+            )
+            for i in range(self.warehouses)
+        ])
+        WarehouseRegion.objects.bulk_create([
+            WarehouseRegion(warehouse=warehouse, country="India", state=CITIES[i % len(CITIES)][1],
+                            postal_prefix=CITIES[i % len(CITIES)][2][:2], priority=rng.randint(10, 200))
+            for i, warehouse in enumerate(warehouses)
+        ])
+        self.warehouse_ids = [warehouse.pk for warehouse in warehouses]
+        return len(warehouses) * 2
+
+    # catalog -------------------------------------------------------------------
+
+    def generate_catalog(self, rng):
+        rows = 0
+        categories = {}  # seed category -> leaf category ids
+        for name in dict.fromkeys(template["category"] for template in self.templates):
+            root = Category.objects.create(name=name.title(), slug=f"gen-{slugify(name)}", is_featured=True)
+            children = Category.objects.bulk_create([
+                Category(name=f"{audience}'s {name.title()}", slug=f"gen-{slugify(name)}-{slugify(audience)}",
+                         parent=root)
+                for audience in AUDIENCES
+            ])
+            categories[name] = [child.pk for child in children]
+            rows += 1 + len(children)
+
+        brand_names = list(dict.fromkeys(template["brand"] for template in self.templates))
+        brand_names += [f"{rng.choice(STYLES)} Label {i + 1}" for i in range(self.products // 1000)]
+        brands = Brand.objects.bulk_create([
+            Brand(name=name, slug=f"gen-{slugify(name)}", description=f"{name} products.")
+            for name in brand_names
+        ], batch_size=self.batch_size)
+        own_brands = {brand.name: brand.pk for brand in brands}
+        brand_ids = [brand.pk for brand in brands]
+        rows += len(brands)
+
+        for attribute, values in dict(template["option"] for template in self.templates).items():
+            attribute = ProductAttribute.objects.create(name=f"gen-{attribute}", slug=f"gen-{attribute}",
+                                                        display_name=attribute.title())
+            ProductAttributeValue.objects.bulk_create([
+                ProductAttributeValue(attribute=attribute, value=value, slug=slugify(value), sort_order=i)
+                for i, value in enumerate(values)
+            ])
+            rows += 1 + len(values)
+
+        for batch in self.batches(self.products):
+            with transaction.atomic():
+                rows += self.generate_products(rng, batch, categories, own_brands, brand_ids)
+        return rows
+
+    def generate_products(self, rng, batch, categories, own_brands, brand_ids):
+        products, picks = [], []
+        for i in batch:
+            template = rng.choice(self.templates)
+            name = f"{template['base_name']} {rng.choice(STYLES)} - {rng.choice(COLOURS)}"
+            list_cents = int((template["original_price"] or template["price"]) * rng.uniform(0.7, 1.4)) * 100
+            on_sale = template["original_price"] is not None and rng.random() < 0.6
+            products.append(Product(
+                sku=f"GEN-{i:08d}", name=name, slug=f"gen-{slugify(name)}-{i}",
+                brand_id=own_brands[template["brand"]] if rng.random() < 0.7 else rng.choice(brand_ids),
+                price=money(list_cents),
+                discount_price=money(list_cents * rng.randint(60, 90) // 100) if on_sale else None,
+                short_description=f"{name} by {template['brand']}.",
+                description=f"{name}. {rng.choice(STYLES)} {template['category']} from {template['brand']}, "
+                            f"rated {template['rating']} by our customers.",
+                search_keywords=f"{template['category']} {template['brand']} {template['base_name']}".lower(),
+                is_featured=rng.random() < 0.05,
+                metadata={"rating": round(min(5, max(1, rng.gauss(template["rating"], 0.3))), 1),
+                          "is_new": rng.random() < 0.15, "template": template["sku"]},
+            ))
+            picks.append((template, list_cents))
+        Product.objects.bulk_create(products)
+
+        through = Product.categories.through
+        links = []
+        for product, (template, _) in zip(products, picks):
+            for category_id in rng.sample(categories[template["category"]], rng.randint(1, 2)):
+                links.append(through(product_id=product.pk, category_id=category_id))
+        through.objects.bulk_create(links)
+
+        images = [
+            ProductImage(product=product, image=f"products/{template['sku']}-{rng.randint(1, 4)}.jpg",
+                         is_primary=True, alt_text=product.name)
+            for product, (template, _) in zip(products, picks)
+        ]
+        ProductImage.objects.bulk_create(images)
+
+        variants, stock = [], []
+        for product, (template, list_cents) in zip(products, picks):
+            attribute, values = template["option"]
+            for j in range(self.variants_per_product):
+                value = values[j % len(values)]
+                attributes = {attribute: value}
+                if j >= len(values):
+                    attributes["colour"] = COLOURS[(j // len(values) - 1) % len(COLOURS)]
+                cents = list_cents + rng.choice((0, 0, 0, 10000, 20000)) if attribute != "colour" else list_cents
+                levels = self.stock_levels(rng, template)
+                variants.append(ProductVariant(
+                    product=product, sku=f"{product.sku}-{j + 1:02d}", name=" / ".join(attributes.values()),
+                    price=money(cents), barcode=f"890{rng.randrange(10 ** 9, 10 ** 10)}", attributes=attributes,
+                    weight_kg=Decimal(rng.randint(100, 2500)).scaleb(-3), is_default=j == 0,
+                    stock_quantity=sum(level["on_hand"] for level in levels),
+                ))
+                stock.append(levels)
+        ProductVariant.objects.bulk_create(variants)
+
+        inventories, ledger, availability = [], [], []
+        for variant, levels in zip(variants, stock):
+            for level in levels:
+                inventories.append(Inventory(variant=variant, **level))
+                ledger.append(InventoryTransaction(
+                    transaction_type="receipt", variant=variant, warehouse_id=level["warehouse_id"],
+                    quantity_delta=level["on_hand"], resulting_on_hand=level["on_hand"], resulting_reserved=0,
+                    currency="INR", reference="opening-stock", source_document="generate_dataset",
+                ))
+            availability.append(VariantAvailability(variant=variant, ats=variant.stock_quantity,
+                                                    on_hand=variant.stock_quantity))
+            self.variant_ids.append(variant.pk)
+            self.variant_cents.append(int(variant.price * 100))
+        Inventory.objects.bulk_create(inventories)
+        InventoryTransaction.objects.bulk_create(ledger)
+        VariantAvailability.objects.bulk_create(availability)
+        return len(products) + len(links) + len(images) + len(variants) + len(inventories) * 2 + len(availability)
+
+    def stock_levels(self, rng, template):
+        """Inventory rows (as field dicts) for one variant: a few warehouses, some of them out of stock."""
+        levels = []
+        for warehouse_id in rng.sample(self.warehouse_ids, min(len(self.warehouse_ids), rng.randint(1, 3))):
+            level = {"warehouse_id": warehouse_id, "on_hand": 0 if rng.random() < 0.1 else rng.randint(1, 200)}
+            if template["category"] == "perfumes":
+                # lots that expire, for FEFO reservation
+                level["lot"] = f"L{rng.randint(1000, 9999)}"
+                level["expiration_date"] = (self.now + timedelta(days=rng.randint(60, 900))).date()
+            levels.append(level)
+        return levels
+
+    # users ---------------------------------------------------------------------
+
+    def generate_users(self, rng):
+        password = make_password(PASSWORD)
+        rows = 0
+        for batch in self.batches(self.users):
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(
+                        username=f"gen-user-{i:08d}", email=f"gen-user-{i:08d}@example.com", password=password,
+                        fullname=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                        phonenumber=f"9{rng.randrange(10 ** 8, 10 ** 9)}", is_verified=rng.random() < 0.95,
+                        date_joined=self.now - timedelta(days=rng.randint(0, 1000)),
+                    )
+                    for i in batch
+                ])
+                addresses = []
+                for user in users:
+                    city, state, postcode = rng.choice(CITIES)
+                    addresses.append(Address(
+                        user=user, address_line1=f"{rng.randint(1, 999)}, {rng.choice(LAST_NAMES)} Nagar",
+                        city=city, state=state, postal_code=postcode, phone_number=user.phonenumber,
+                        is_default=True,
+                    ))
+                Address.objects.bulk_create(addresses)
+            self.user_ids.extend(user.pk for user in users)
+            self.address_ids.extend(address.pk for address in addresses)
+            rows += len(users) + len(addresses)
+        return rows
+
+    # carts ---------------------------------------------------------------------
+
+    def generate_carts(self, rng):
+        if not self.variant_ids:
+            return 0
+        owners = [self.user_ids[i] for i in range(0, len(self.user_ids), CART_SHARE)]
+        rows = 0
+        for start in range(0, len(owners), self.batch_size):
+            with transaction.atomic():
+                carts, lines = [], []
+                for user_id in owners[start:start + self.batch_size]:
+                    picked = rng.sample(range(len(self.variant_ids)), min(len(self.variant_ids), rng.randint(1, 4)))
+                    items = [(self.variant_ids[k], rng.randint(1, 3), self.variant_cents[k]) for k in picked]
+                    carts.append(Cart(user_id=user_id, grand_total=money(sum(q * c for _, q, c in items))))
+                    lines.append(items)
+                Cart.objects.bulk_create(carts)
+                snapshots = PriceSnapshot.objects.bulk_create([
+                    PriceSnapshot(amount=money(cents), currency="INR", source="catalog")
+                    for items in lines for _, _, cents in items
+                ])
+                snapshots = iter(snapshots)
+                items = [
+                    CartItem(cart=cart, variant_id=variant_id, quantity=quantity, price_snapshot=next(snapshots),
+                             line_total=money(quantity * cents))
+                    for cart, cart_lines in zip(carts, lines) for variant_id, quantity, cents in cart_lines
+                ]
+                CartItem.objects.bulk_create(items)
+            rows += len(carts) + len(items) * 2
+        return rows
+
+    # orders --------------------------------------------------------------------
+
+    def generate_orders(self, rng):
+        if not self.variant_ids or not self.user_ids:
+            return 0
+        statuses, weights = zip(*ORDER_STATUSES)
+        rows = 0
+        for batch in self.batches(self.orders):
+            specs = []
+            for i in batch:
+                user = rng.randrange(len(self.user_ids))
+                picked = rng.sample(range(len(self.variant_ids)),
+                                    min(len(self.variant_ids), rng.choices((1, 2, 3, 4), (50, 30, 15, 5))[0]))
+                specs.append((i, user, rng.choices(statuses, weights)[0], rng.randint(0, 365 * 24 * 60),
+                              [(self.variant_ids[k], rng.randint(1, 3)) for k in picked]))
+            variants = {
+                row["pk"]: row
+                for row in ProductVariant.all_objects.filter(
+                    pk__in={variant_id for *_, lines in specs for variant_id, _ in lines},
+                ).values("pk", "sku", "name", "price")
+            }
+
+            orders, lines = [], []
+            for i, user, status, minutes_ago, items in specs:
+                subtotal = sum(variants[variant_id]["price"] * quantity for variant_id, quantity in items)
+                shipping = Decimal("0.00") if subtotal >= 999 else Decimal("99.00")
+                placed_at = self.now - timedelta(minutes=minutes_ago)
+                orders.append(Order(
+                    user_id=self.user_ids[user], reference=f"GEN-{i:010d}", status=status, currency="INR",
+                    subtotal=subtotal, shipping_total=shipping, total=subtotal + shipping,
+                    billing_address_id=self.address_ids[user], shipping_address_id=self.address_ids[user],
+                    placed_at=placed_at, metadata={"channel": rng.choice(("web", "web", "android", "ios"))},
+                ))
+                lines.append(items)
+            with transaction.atomic():
+                Order.objects.bulk_create(orders)
+                items = [
+                    OrderItem(order=order, variant_id=variant_id, sku=variants[variant_id]["sku"],
+                              name=f"{variants[variant_id]['sku']} ({variants[variant_id]['name']})", quantity=quantity,
+                              unit_price=variants[variant_id]["price"],
+                              line_total=variants[variant_id]["price"] * quantity)
+                    for order, order_lines in zip(orders, lines) for variant_id, quantity in order_lines
+                ]
+                OrderItem.objects.bulk_create(items)
+            rows += len(orders) + len(items)
+        return rows
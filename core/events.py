@@ -0,0 +1,151 @@
+"""
+Transactional outbox.
+
+Producers call `publish()` inside the transaction that makes the change, so an
+event exists if and only if the change committed. `manage.py run_outbox_dispatcher`
+claims pending events in batches with SELECT ... FOR UPDATE SKIP LOCKED (so
+several dispatchers can run side by side), leases them for OUTBOX_CLAIM_TIMEOUT
+and commits, then hands each one to the handlers subscribed to its topic, with
+no row locks held:
+
+    # <app>/subscribers.py (imported automatically)
+    from core.events import subscribe
+
+    @subscribe("order.status_changed")
+    def notify_warehouse(event):
+        ...
+
+Delivery is at-least-once: a failing handler makes the whole event retry with
+exponential backoff, and a dispatcher that dies mid-batch leaves its events to
+be claimed again once the lease runs out, so handlers that already ran see them
+again and must be idempotent. Ordering is only guaranteed within a batch.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import OutboxEvent
+from .utils.backoff import exponential_backoff
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = defaultdict(list)
+ALL_TOPICS = "*"
+
+
+def subscribe(topic):
+    """Register the decorated function for `topic` ("*" receives every event)."""
+    def decorator(func):
+        HANDLERS[topic].append(func)
+        return func
+    return decorator
+
+
+def handlers_for(topic):
+    return HANDLERS.get(topic, []) + HANDLERS.get(ALL_TOPICS, [])
+
+
+def autodiscover():
+    autodiscover_modules("subscribers")
+
+
+def build_event(topic, payload, *, aggregate=None):
+    event = OutboxEvent(topic=topic, payload=payload)
+    if aggregate is not None:
+        event.aggregate_type = aggregate._meta.label_lower
+        event.aggregate_id = str(aggregate.pk)
+    return event
+
+
+def publish(topic, payload, *, aggregate=None):
+    """Write one event; call inside the transaction making the change."""
+    event = build_event(topic, payload, aggregate=aggregate)
+    event.save()
+    return event
+
+
+def publish_many(events):
+    """Write events built with `build_event` in one INSERT."""
+    events = list(events)
+    if events:
+        OutboxEvent.objects.bulk_create(events, batch_size=1000)
+    return events
+
+
+def get_max_attempts():
+    return getattr(settings, "OUTBOX_MAX_ATTEMPTS", 10)
+
+
+def get_retry_backoff():
+    return getattr(settings, "OUTBOX_RETRY_BACKOFF", timedelta(seconds=5))
+
+
+def get_claim_timeout():
+    return getattr(settings, "OUTBOX_CLAIM_TIMEOUT", timedelta(minutes=5))
+
+
+def claim(batch_size, *, now=None):
+    """Lease up to `batch_size` due events to the caller (their available_at is pushed past the lease)."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(processed_at__isnull=True, available_at__lte=now)
+            .order_by('id')[:batch_size]
+        )
+        if events:
+            OutboxEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+                available_at=now + get_claim_timeout(),
+            )
+    return events
+
+
+def dispatch_batch(*, batch_size=100, now=None):
+    """
+    Deliver up to `batch_size` due events. Returns the number of events claimed.
+    The claim is committed before any handler runs; each handler runs in its own
+    transaction, so a failure does not undo the others' writes.
+    """
+    events = claim(batch_size, now=now)
+    if not events:
+        return 0
+
+    for event in events:
+        try:
+            for handler in handlers_for(event.topic):
+                with transaction.atomic():
+                    handler(event)
+        except Exception as exc:
+            logger.exception("Outbox handler failed for event %s (%s)", event.pk, event.topic)
+            event.attempts += 1
+            event.last_error = f"{type(exc).__name__}: {exc}"[:2000]
+            if event.attempts >= get_max_attempts():
+                event.failed = True
+                event.processed_at = timezone.now()
+            else:
+                event.available_at = timezone.now() + exponential_backoff(event.attempts, get_retry_backoff())
+        else:
+            event.processed_at = timezone.now()
+
+    OutboxEvent.objects.bulk_update(
+        events, ['attempts', 'last_error', 'failed', 'available_at', 'processed_at'], batch_size=1000,
+    )
+    return len(events)
+
+
+def purge_processed(*, older_than, batch_size=5000):
+    """Delete delivered events processed before `older_than`. Failed events are kept."""
+    total = 0
+    while True:
+        pks = list(
+            OutboxEvent.objects.filter(processed_at__lt=older_than, failed=False)
+            .order_by('processed_at').values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return total
+        total += OutboxEvent.objects.filter(pk__in=pks).delete()[0]
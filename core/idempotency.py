@@ -0,0 +1,168 @@
+"""
+`Idempotency-Key` support for mutating API endpoints.
+
+    @action(detail=True, methods=["post"])
+    @idempotent
+    def reserve_action(self, request, pk=None): ...
+
+The first request with a given key (per user, method and path) runs the view
+and stores its response; retries with the same key and body get the stored
+response back with an `Idempotent-Replayed: true` header. A retry arriving
+while the first request is still running waits up to IDEMPOTENCY_WAIT_TIMEOUT
+for it to finish, then gets 409 Conflict; however long the original runs, it
+is never executed twice. The running request refreshes its key's heartbeat,
+and only a key whose heartbeat is older than IDEMPOTENCY_LOCK_TIMEOUT (its
+worker died) is taken over. Keys are kept for IDEMPOTENCY_KEY_TTL and removed
+by `manage.py purge_idempotency_keys`.
+"""
+import hashlib
+import json
+import threading
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from rest_framework.response import Response
+
+from core.renderers import FastJSONRenderer
+from core.utils.response_utils import api_response
+from .models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+REPLAY_HEADER = "Idempotent-Replayed"
+POLL_INTERVAL = 0.05
+
+
+def get_key_ttl():
+    return getattr(settings, "IDEMPOTENCY_KEY_TTL", timedelta(hours=24))
+
+
+def get_wait_timeout():
+    """Seconds a duplicate waits for the in-flight original before giving up."""
+    return getattr(settings, "IDEMPOTENCY_WAIT_TIMEOUT", 10)
+
+
+def get_lock_timeout():
+    """An in-flight key without a heartbeat for this long is treated as abandoned (crashed worker)."""
+    return getattr(settings, "IDEMPOTENCY_LOCK_TIMEOUT", timedelta(minutes=1))
+
+
+def request_fingerprint(request):
+    body = request.data
+    try:
+        payload = json.dumps(body, sort_keys=True, default=str)
+    except TypeError:
+        payload = repr(body)
+    return hashlib.sha256(f"{request.method} {request.path}\n{payload}".encode()).hexdigest()
+
+
+def request_scope(request):
+    user_id = request.user.pk if request.user.is_authenticated else "anon"
+    return f"{user_id}:{request.method}:{request.path}"[:255]
+
+
+def _acquire(scope, key, fingerprint):
+    """Insert the in-flight row. Returns (acquired, existing row or None)."""
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(
+                scope=scope, key=key, fingerprint=fingerprint,
+                created_at=now, expires_at=now + get_key_ttl(),
+            )
+        return True, None
+    except IntegrityError:
+        return False, IdempotencyKey.objects.filter(scope=scope, key=key).first()
+
+
+class Heartbeat:
+    """Refresh an in-flight key's heartbeat_at from a background thread while the view runs."""
+
+    def __init__(self, scope, key):
+        self.scope = scope
+        self.key = key
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        interval = get_lock_timeout().total_seconds() / 3
+        try:
+            while not self._stop.wait(interval):
+                IdempotencyKey.objects.filter(scope=self.scope, key=self.key, status="in_flight").update(
+                    heartbeat_at=timezone.now(),
+                )
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def _replay(record):
+    response = Response(record.response_body, status=record.response_status)
+    response[REPLAY_HEADER] = "true"
+    return response
+
+
+def idempotent(view_func):
+    """Decorate a DRF view method so requests carrying an Idempotency-Key run at most once."""
+
+    @wraps(view_func)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_func(self, request, *args, **kwargs)
+        if len(key) > 255:
+            return api_response(False, status=400, message=f"{HEADER} must be at most 255 characters")
+
+        scope = request_scope(request)
+        fingerprint = request_fingerprint(request)
+        deadline = time.monotonic() + get_wait_timeout()
+
+        while True:
+            acquired, existing = _acquire(scope, key, fingerprint)
+            if acquired:
+                break
+            if existing is None:  # finished and purged in between
+                continue
+            if existing.fingerprint != fingerprint:
+                return api_response(False, status=422, message=f"{HEADER} was already used for a different request")
+            if existing.status == "completed" and existing.expires_at > timezone.now():
+                return _replay(existing)
+            if existing.status == "completed" or existing.heartbeat_at < timezone.now() - get_lock_timeout():
+                # expired, or left behind by a request that died mid-flight: take it over
+                IdempotencyKey.objects.filter(
+                    pk=existing.pk, status=existing.status, heartbeat_at=existing.heartbeat_at,
+                ).delete()
+                continue
+            if time.monotonic() >= deadline:
+                return api_response(False, status=409, message="A request with this Idempotency-Key is still in progress")
+            time.sleep(POLL_INTERVAL)
+
+        try:
+            with Heartbeat(scope, key):
+                response = view_func(self, request, *args, **kwargs)
+        except Exception:
+            IdempotencyKey.objects.filter(scope=scope, key=key).delete()
+            raise
+
+        if response.status_code >= 500 or not isinstance(response, Response):
+            # let the client retry failures (and non-DRF responses we cannot store)
+            IdempotencyKey.objects.filter(scope=scope, key=key).delete()
+            return response
+
+        body = json.loads(FastJSONRenderer().render(response.data) or "null")
+        IdempotencyKey.objects.filter(scope=scope, key=key).update(
+            status="completed", response_status=response.status_code, response_body=body,
+        )
+        return response
+
+    return wrapper
@@ -0,0 +1,276 @@
+"""
+In-process load test of the API, meant for a database filled by generate_dataset.
+
+Virtual users run scenarios (browse, search, add to cart, checkout) picked at
+random with the weights of the mix. Requests go through the whole Django
+stack (middleware, authentication, views, rendering) via django.test.Client,
+so nothing listens on a socket and no network is involved: the figures are
+the application's and the database's, without an HTTP server in front.
+Latencies are recorded per endpoint (method and URL pattern) and reported as
+throughput and percentiles.
+
+The cart and checkout scenarios create carts and orders as the sampled users;
+run it against a generated or disposable database.
+"""
+import math
+import random
+import re
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+from django.db.models import Max, Min
+from django.test import Client
+
+from accounts.models import Address, User
+from accounts.serializers import CustomTokenObtainPairSerializer
+from catalog.models import Brand, Category, Product
+
+DEFAULT_MIX = "browse=60,search=25,cart=10,checkout=5"
+ORDERINGS = ("-created_at", "price", "-price", "name")
+PERCENTILES = (50, 90, 99)
+
+
+def parse_mix(value):
+    """{"browse": 60, ...} from "browse=60,search=25"; unknown scenarios and bad weights raise ValueError."""
+    mix = {}
+    for part in filter(None, (part.strip() for part in value.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise ValueError(f"unknown scenario {name!r} (choose from {', '.join(SCENARIOS)})")
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise ValueError(f"bad weight for {name!r}: {weight!r}")
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("the mix needs at least one scenario with a positive weight")
+    return mix
+
+
+def endpoint_name(method, response, path):
+    """"GET api/catalog/products/<slug>/" for a response, from the URL pattern that served it."""
+    match = response.resolver_match
+    if match is None:
+        return f"{method.upper()} {path.split('?')[0]}"
+    route = re.sub(r"\(\?P<(\w+)>[^)]*\)", r"<\1>", match.route).replace("^", "").replace("$", "")
+    route = re.sub(r"<\w+:(\w+)>", r"<\1>", route)
+    return f"{method.upper()} {route}"
+
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of an ascending list."""
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def sample(queryset, rng, size, *fields):
+    """Up to `size` rows of `queryset` picked at random by primary key, without ORDER BY random()."""
+    bounds = queryset.aggregate(low=Min("pk"), high=Max("pk"))
+    if bounds["low"] is None:
+        return []
+    ids = {rng.randint(bounds["low"], bounds["high"]) for _ in range(size * 2)}
+    rows = list(queryset.filter(pk__in=ids).order_by("pk").values_list(*fields)[:size])
+    if len(rows) < size // 4:  # sparse primary keys
+        rows = list(queryset.order_by("pk").values_list(*fields)[:size])
+    return rows
+
+
+class World:
+    """What the virtual users pick from: product slugs, categories, search terms and shoppers with a token."""
+
+    def __init__(self, rng, size=500):
+        self.slugs = [slug for slug, in sample(
+            Product.objects.filter(is_active=True, deleted_at__isnull=True), rng, size, "slug")]
+        self.categories = list(
+            Category.objects.filter(is_active=True, deleted_at__isnull=True).values_list("slug", flat=True)[:size])
+        names = [name for name, in sample(Product.objects.filter(is_active=True), rng, size, "name")]
+        words = {word.lower() for name in names for word in re.findall(r"[A-Za-z]{4,}", name)}
+        self.terms = sorted(words | set(Brand.objects.values_list("name", flat=True)[:100]))
+
+        users = User.objects.filter(
+            pk__in=[pk for pk, in sample(User.objects.filter(is_active=True, is_verified=True, is_staff=False),
+                                         rng, min(size, 200), "pk")],
+        )
+        addresses = dict(Address.objects.filter(user__in=users, is_default=True).values_list("user_id", "pk"))
+        # access tokens minted once: logging in is not part of these scenarios
+        self.shoppers = [
+            (str(CustomTokenObtainPairSerializer.get_token(user).access_token), addresses.get(user.pk))
+            for user in users
+        ]
+
+    def check(self, mix):
+        if not self.slugs:
+            raise ValueError("no active products; run generate_dataset first")
+        if any(name in mix for name in ("cart", "checkout")) and not self.shoppers:
+            raise ValueError("no verified customers for the cart and checkout scenarios")
+
+
+class Recorder:
+    """Latencies (seconds) and error counts per endpoint, for one worker thread."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self.statuses = Counter()
+        self.scenarios = Counter()
+
+    def merge(self, other):
+        for endpoint, values in other.latencies.items():
+            self.latencies[endpoint].extend(values)
+        self.errors.update(other.errors)
+        self.statuses.update(other.statuses)
+        self.scenarios.update(other.scenarios)
+
+
+class Session:
+    """One virtual user's run of a scenario: timed requests, with the shopper's token when signed in."""
+
+    def __init__(self, client, recorder, world, rng, shopper=None):
+        self.client = client
+        self.recorder = recorder
+        self.world = world
+        self.rng = rng
+        self.headers = {}
+        self.address = None
+        if shopper is not None:
+            token, self.address = shopper
+            self.headers["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+
+    def request(self, method, path, data=None, **headers):
+        kwargs = {"content_type": "application/json"} if method != "get" else {}
+        started = time.perf_counter()
+        response = getattr(self.client, method)(path, data, **kwargs, **self.headers, **headers)
+        elapsed = time.perf_counter() - started
+
+        endpoint = endpoint_name(method, response, path)
+        self.recorder.latencies[endpoint].append(elapsed)
+        self.recorder.statuses[response.status_code] += 1
+        if response.status_code >= 400:
+            self.recorder.errors[endpoint] += 1
+        return response
+
+    def get(self, path):
+        return self.request("get", path)
+
+    def post(self, path, data=None, **headers):
+        return self.request("post", path, data or {}, **headers)
+
+    def view_product(self):
+        """Product page: details, then stock of its variants. Returns the variants (dicts) shown."""
+        response = self.get(f"/api/catalog/products/{self.rng.choice(self.world.slugs)}/")
+        if response.status_code != 200:
+            return []
+        variants = response.json()["data"]["variants"]
+        if variants:
+            self.get(f"/api/inventory/availability/?variants={','.join(str(v['id']) for v in variants)}")
+        return variants
+
+
+def browse(session):
+    session.get("/api/catalog/categories/")
+    category = session.rng.choice(session.world.categories) if session.world.categories else ""
+    session.get(f"/api/catalog/products/?categories={category}&ordering={session.rng.choice(ORDERINGS)}")
+    for _ in range(session.rng.randint(1, 3)):
+        session.view_product()
+
+
+def search(session):
+    session.get(f"/api/catalog/products/?search={session.rng.choice(session.world.terms)}")
+    session.view_product()
+
+
+def cart(session):
+    """Create a cart and add one to three of the variants of the products viewed. Returns (cart id, lines)."""
+    response = session.post("/api/cart/carts/")
+    if response.status_code != 201:
+        return None, []
+    cart_id = response.json()["id"]
+    lines = []
+    for _ in range(session.rng.randint(1, 3)):
+        variants = [variant for variant in session.view_product() if variant not in lines]
+        if variants:
+            variant = session.rng.choice(variants)
+            response = session.post("/api/cart/items/", {"cart": cart_id, "variant": variant["id"], "quantity": 1})
+            if response.status_code == 201:
+                lines.append(variant)
+    session.get(f"/api/cart/carts/{cart_id}/")
+    return cart_id, lines
+
+
+def checkout(session):
+    cart_id, lines = cart(session)
+    if not lines:
+        return
+    order = {
+        "items": [
+            {"variant": variant["id"], "sku": variant["sku"], "name": variant["name"], "quantity": 1,
+             "unit_price": variant["price"]}
+            for variant in lines
+        ],
+        "shipping_address_id": session.address,
+        "billing_address_id": session.address,
+    }
+    session.post("/api/orders/", order, HTTP_IDEMPOTENCY_KEY=str(uuid.uuid4()))
+    session.post(f"/api/cart/carts/{cart_id}/checkout/")
+    session.get("/api/orders/")
+
+
+SCENARIOS = {"browse": browse, "search": search, "cart": cart, "checkout": checkout}
+SIGNED_IN = {"cart", "checkout"}
+
+
+class LoadTest:
+    def __init__(self, mix, *, sessions, threads=1, duration=None, warmup=0, seed=0, sample_size=500,
+                 host="localhost"):
+        self.mix = mix
+        self.sessions = sessions
+        self.threads = max(1, threads)
+        self.duration = duration
+        self.warmup = warmup
+        self.seed = seed
+        self.sample_size = sample_size
+        self.host = host
+        self.elapsed = 0.0
+
+    def run(self):
+        """Run the scenarios; returns the merged Recorder (self.elapsed is the measured wall time)."""
+        self.world = World(random.Random(f"{self.seed}:world"), self.sample_size)
+        self.world.check(self.mix)
+        if self.warmup:
+            self.worker("warmup", self.warmup, None)
+
+        shares = [self.sessions // self.threads + (1 if i < self.sessions % self.threads else 0)
+                  for i in range(self.threads)]
+        started = time.perf_counter()
+        deadline = started + self.duration if self.duration else None
+        if self.threads == 1:
+            recorders = [self.worker(0, shares[0], deadline)]
+        else:
+            with ThreadPoolExecutor(self.threads) as executor:
+                futures = [executor.submit(self.worker, i, share, deadline) for i, share in enumerate(shares)]
+                recorders = [future.result() for future in futures]
+        self.elapsed = time.perf_counter() - started
+
+        recorder = Recorder()
+        for worker_recorder in recorders:
+            recorder.merge(worker_recorder)
+        return recorder
+
+    def worker(self, index, sessions, deadline):
+        rng = random.Random(f"{self.seed}:{index}")
+        client = Client(HTTP_HOST=self.host, raise_request_exception=False)
+        recorder = Recorder()
+        names, weights = zip(*self.mix.items())
+        try:
+            for _ in range(sessions):
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+                name = rng.choices(names, weights)[0]
+                shopper = rng.choice(self.world.shoppers) if name in SIGNED_IN else None
+                SCENARIOS[name](Session(client, recorder, self.world, rng, shopper))
+                recorder.scenarios[name] += 1
+        finally:
+            if self.threads > 1:
+                connections.close_all()
+        return recorder
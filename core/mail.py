@@ -0,0 +1,189 @@
+"""
+Durable outgoing mail.
+
+Request code calls `queue_mail()`, which inserts an OutgoingEmail row and
+enqueues the `core.mail.send_email` task in the same transaction;
+`manage.py runworker` renders and delivers it. Retries, backoff and stale
+claims are the task queue's (see core.tasks). Each worker thread keeps its
+backend connection open between messages, so a burst of mail costs one
+SMTP/TLS handshake per thread rather than one per message. When the server
+itself is unreachable, a circuit breaker pauses sending for
+MAIL_CIRCUIT_COOLDOWN (the tasks are put back without using up attempts)
+instead of burning through every message's attempts.
+
+Templates are rendered by the worker, so requests don't pay for it. The
+stored context and body are blanked once the message is sent or given up
+on, as they may carry a verification code or a password reset link.
+Messages queued with `expires_in` are given up on, unsent, once that has
+passed.
+"""
+import logging
+import smtplib
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import OutgoingEmail
+from .tasks import Retry, task
+
+logger = logging.getLogger(__name__)
+
+# the server (not the message) is the problem: retry later and count towards the breaker
+CONNECTION_ERRORS = (
+    smtplib.SMTPConnectError, smtplib.SMTPServerDisconnected, smtplib.SMTPAuthenticationError,
+    ConnectionError, TimeoutError, socket.gaierror,
+)
+# the message can never be delivered as is
+PERMANENT_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused)
+# a thread's connection unused for longer than this is reopened (servers drop idle clients)
+CONNECTION_MAX_IDLE = 30
+
+
+def get_max_attempts():
+    return getattr(settings, "MAIL_QUEUE_MAX_ATTEMPTS", 5)
+
+
+def queue_mail(subject, to, *, template=None, context=None, body="", from_email=None, expires_in=None):
+    """
+    Queue one message: `template` is rendered with `context` (which must be
+    JSON-serializable) by the worker, otherwise `body` is sent as is. Pass
+    `expires_in` (a timedelta) for messages that are useless after a while,
+    such as verification codes.
+    """
+    email = OutgoingEmail.objects.create(
+        subject=subject,
+        to=[to] if isinstance(to, str) else list(to),
+        template=template or "",
+        context=(context or {}) if template else {},
+        body="" if template else body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL or "",
+        expires_at=timezone.now() + expires_in if expires_in else None,
+    )
+    send_email.delay(email.pk)
+    return email
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive connection failures and stays open for `cooldown` seconds."""
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return time.monotonic() < self.open_until
+
+    def remaining(self):
+        """Seconds until the circuit closes again."""
+        return max(0.0, self.open_until - time.monotonic())
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.open_until = time.monotonic() + self.cooldown
+                self.failures = 0
+                logger.warning("Mail circuit open for %ss after repeated connection failures", self.cooldown)
+
+
+breaker = CircuitBreaker(
+    getattr(settings, "MAIL_CIRCUIT_THRESHOLD", 5),
+    getattr(settings, "MAIL_CIRCUIT_COOLDOWN", 60),
+)
+
+_local = threading.local()
+
+
+def close_connection():
+    """Close this thread's backend connection, if it has one."""
+    connection, _local.connection = getattr(_local, "connection", None), None
+    if connection is not None:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+def _send(message):
+    if getattr(_local, "connection", None) is None:
+        connection = get_connection(fail_silently=False)
+        connection.open()
+        _local.connection = connection
+    try:
+        _local.connection.send_messages([message])
+    except CONNECTION_ERRORS:
+        close_connection()
+        raise
+    _local.used_at = time.monotonic()
+
+
+def send_message(message):
+    """Send over this thread's connection, opening one (or replacing an idle or dropped one) as needed."""
+    if time.monotonic() - getattr(_local, "used_at", 0.0) > CONNECTION_MAX_IDLE:
+        close_connection()
+    if getattr(_local, "connection", None) is None:
+        _send(message)
+        return
+    try:
+        _send(message)
+    except CONNECTION_ERRORS:
+        _send(message)  # the server dropped the kept connection: once more on a fresh one
+
+
+def _finish(email, status, error=""):
+    """Record the final outcome and drop the context and body (they may hold a code or reset link)."""
+    email.status = status
+    email.context = {}
+    email.body = ""
+    email.last_error = error[:2000]
+    if status == "sent":
+        email.sent_at = timezone.now()
+    email.save(update_fields=["status", "context", "body", "last_error", "sent_at", "attempts"])
+
+
+@task(name="core.mail.send_email", max_attempts=get_max_attempts(),
+      retry_backoff=getattr(settings, "MAIL_QUEUE_RETRY_BACKOFF", timedelta(seconds=30)))
+def send_email(email_id):
+    email = OutgoingEmail.objects.filter(pk=email_id, status="queued").first()
+    if email is None:  # already sent or given up on
+        return
+    if email.expires_at is not None and email.expires_at <= timezone.now():
+        _finish(email, "failed", "Expired before it could be sent")
+        return
+    if breaker.is_open:
+        raise Retry(timedelta(seconds=breaker.remaining()), "mail circuit open")
+
+    body = render_to_string(email.template, email.context) if email.template else email.body
+    message = EmailMessage(email.subject, body, email.from_email or None, email.to)
+    email.attempts += 1
+    try:
+        send_message(message)
+    except PERMANENT_ERRORS as exc:
+        _finish(email, "failed", f"{type(exc).__name__}: {exc}")
+        return
+    except Exception as exc:
+        if isinstance(exc, CONNECTION_ERRORS):
+            breaker.record_failure()
+        logger.warning("Sending mail %s failed: %s", email.pk, exc)
+        if email.attempts >= get_max_attempts():
+            _finish(email, "failed", f"{type(exc).__name__}: {exc}")
+        else:
+            email.last_error = f"{type(exc).__name__}: {exc}"[:2000]
+            email.save(update_fields=["attempts", "last_error"])
+        raise  # the task queue retries with backoff
+    breaker.record_success()
+    _finish(email, "sent")
@@ -0,0 +1,63 @@
+import io
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.timezone import now
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer, orjson
+from core.utils.response_utils import build_envelope
+
+
+class Command(BaseCommand):
+    help = "Compare JSON render/parse speed of DRF's stdlib classes and core's orjson ones on real product payloads."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=100, help="Products per payload (one list page).")
+        parser.add_argument("--rounds", type=int, default=200)
+
+    def handle(self, *args, **options):
+        from catalog.models import Product
+        from catalog.serializers import ProductSerializer
+
+        if orjson is None:
+            self.stdout.write(self.style.WARNING("orjson is not installed; the fast classes use the stdlib path."))
+
+        products = list(
+            Product.objects.filter(is_active=True, deleted_at__isnull=True)
+            .select_related("brand").prefetch_related("categories", "variants", "images")
+            .order_by("-created_at")[:options["limit"]]
+        )
+        if not products:
+            raise CommandError("No active products to serialize; create some (e.g. with generate_dataset) first.")
+
+        meta = {"request_id": str(uuid.uuid4()), "timestamp": now().isoformat()}
+        data = build_envelope(True, "OK", None, ProductSerializer(products, many=True).data, None, meta)
+        rounds = options["rounds"]
+
+        body = JSONRenderer().render(data)
+        self.stdout.write(f"{len(products)} product(s), {len(body) / 1024:.1f} KiB per payload")
+
+        stdlib = self.bench("render json", rounds, len(body), lambda: JSONRenderer().render(data))
+        fast = self.bench("render orjson", rounds, len(body), lambda: FastJSONRenderer().render(data))
+        self.speedup(stdlib, fast)
+
+        stdlib = self.bench("parse json", rounds, len(body), lambda: JSONParser().parse(io.BytesIO(body)))
+        fast = self.bench("parse orjson", rounds, len(body), lambda: FastJSONParser().parse(io.BytesIO(body)))
+        self.speedup(stdlib, fast)
+
+    def bench(self, label, rounds, size, func):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            func()
+        per_op = (time.perf_counter() - started) / rounds
+        mb_per_s = size / per_op / 1e6 if per_op else 0
+        self.stdout.write(f"{label:<16} {per_op * 1000:8.3f} ms/op  {mb_per_s:8.1f} MB/s")
+        return per_op
+
+    def speedup(self, baseline, candidate):
+        self.stdout.write(f"{'speedup':<16} {baseline / candidate if candidate else 0:8.2f}x")
+
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.models import Task
+from core.tasks import Worker, autodiscover, enqueue_many, noop
+
+
+class Command(BaseCommand):
+    help = "Measure task enqueue and dequeue/execute throughput with no-op tasks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=5000)
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument("--pool", choices=("thread", "process"), default="thread")
+
+    def handle(self, *args, **options):
+        autodiscover()
+        count = options["count"]
+        single = max(1, count // 10)
+        Task.objects.filter(name=noop.name).delete()
+
+        started = time.perf_counter()
+        for i in range(single):
+            noop.delay(i)
+        self.report("enqueue (delay)", single, time.perf_counter() - started)
+
+        started = time.perf_counter()
+        enqueue_many(noop.build(i) for i in range(count - single))
+        self.report("enqueue (enqueue_many)", count - single, time.perf_counter() - started)
+
+        worker = Worker(concurrency=options["concurrency"], pool=options["pool"], interval=0.05)
+        started = time.perf_counter()
+        processed = worker.run(once=True)
+        self.report(f"dequeue+run ({options['pool']} x{options['concurrency']})", processed, time.perf_counter() - started)
+
+        Task.objects.filter(name=noop.name).delete()
+
+    def report(self, label, count, elapsed):
+        rate = count / elapsed if elapsed else 0
+        self.stdout.write(f"{label:<32} {count:>7} task(s) in {elapsed:6.2f}s  {rate:8.0f}/s")
@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.loadtest import DEFAULT_MIX, PERCENTILES, LoadTest, parse_mix, percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Run browse/search/cart/checkout scenarios in-process against the current database (e.g. one filled by "
+        "generate_dataset) and report throughput and latency percentiles per endpoint. Creates carts and orders."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Scenario weights (default {DEFAULT_MIX}).")
+        parser.add_argument("--sessions", type=int, default=200, help="Scenario runs, split across threads.")
+        parser.add_argument("--duration", type=float, default=None, help="Stop after this many seconds.")
+        parser.add_argument("--threads", type=int, default=1,
+                            help="Concurrent virtual users (SQLite serializes writes; use PostgreSQL for >1).")
+        parser.add_argument("--warmup", type=int, default=10, help="Unrecorded scenario runs before measuring.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--sample", type=int, default=500, help="Products and users sampled for the scenarios.")
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options["mix"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        host = next((host.lstrip(".") for host in settings.ALLOWED_HOSTS if host != "*"), "localhost")
+        load_test = LoadTest(
+            mix,
+            sessions=options["sessions"],
+            threads=options["threads"],
+            duration=options["duration"],
+            warmup=options["warmup"],
+            seed=options["seed"],
+            sample_size=options["sample"],
+            host=host,
+        )
+        try:
+            recorder = load_test.run()
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.report(recorder, load_test.elapsed)
+
+    def report(self, recorder, elapsed):
+        elapsed = elapsed or 1e-9
+        columns = "".join(f"{f'p{q}':>9}" for q in PERCENTILES)
+        self.stdout.write(f"{'endpoint':<52} {'reqs':>7} {'errors':>7} {'req/s':>8} {'mean':>9}{columns} {'max':>9}")
+        for endpoint, latencies in sorted(recorder.latencies.items(), key=lambda item: -sum(item[1])):
+            ordered = sorted(latencies)
+            points = "".join(f"{percentile(ordered, q) * 1000:9.1f}" for q in PERCENTILES)
+            self.stdout.write(
+                f"{endpoint:<52} {len(ordered):>7} {recorder.errors[endpoint]:>7} {len(ordered) / elapsed:>8.1f} "
+                f"{sum(ordered) / len(ordered) * 1000:9.1f}{points} {ordered[-1] * 1000:9.1f}"
+            )
+
+        requests = sum(map(len, recorder.latencies.values()))
+        scenarios = ", ".join(f"{name} {count}" for name, count in recorder.scenarios.most_common())
+        statuses = ", ".join(f"{status}: {count}" for status, count in sorted(recorder.statuses.items()))
+        self.stdout.write(
+            f"{requests} requests in {elapsed:.1f}s: {requests / elapsed:.1f} req/s "
+            f"({sum(recorder.scenarios.values()) / elapsed:.1f} scenarios/s). Latencies in ms.\n"
+            f"scenarios: {scenarios or 'none'}\nstatuses: {statuses or 'none'}"
+        )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Delete expired Idempotency-Key records in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        total = 0
+        while True:
+            pks = list(
+                IdempotencyKey.objects.filter(expires_at__lte=now)
+                .order_by("expires_at").values_list("pk", flat=True)[:options["batch_size"]]
+            )
+            if not pks:
+                break
+            total += IdempotencyKey.objects.filter(pk__in=pks).delete()[0]
+        self.stdout.write(f"Deleted {total} expired idempotency key(s).")
@@ -0,0 +1,23 @@
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = "Delete expired sessions in batches (clearsessions deletes them in one statement)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        total = 0
+        while True:
+            keys = list(
+                Session.objects.filter(expire_date__lt=now)
+                .order_by("expire_date").values_list("pk", flat=True)[:options["batch_size"]]
+            )
+            if not keys:
+                break
+            total += Session.objects.filter(pk__in=keys).delete()[0]
+        self.stdout.write(f"Deleted {total} expired session(s).")
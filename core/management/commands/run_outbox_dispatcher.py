@@ -0,0 +1,39 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.events import autodiscover, dispatch_batch, purge_processed
+
+
+class Command(BaseCommand):
+    help = "Deliver pending outbox events to their subscribers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--loop", action="store_true", help="Keep running as a worker instead of exiting when drained.")
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds to sleep between polls when idle (with --loop).")
+        parser.add_argument("--keep-days", type=int, default=7, help="Delete delivered events older than this when idle.")
+
+    def handle(self, *args, **options):
+        autodiscover()
+        batch_size = options["batch_size"]
+
+        while True:
+            total = 0
+            while True:
+                claimed = dispatch_batch(batch_size=batch_size)
+                total += claimed
+                if claimed < batch_size:
+                    break
+
+            if total:
+                self.stdout.write(f"Dispatched {total} event(s).")
+            purged = purge_processed(older_than=timezone.now() - timedelta(days=options["keep_days"]))
+            if purged:
+                self.stdout.write(f"Purged {purged} delivered event(s).")
+
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,32 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from core.tasks import Worker, autodiscover
+
+
+class Command(BaseCommand):
+    help = "Run background tasks from the database queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=4, help="Pool size.")
+        parser.add_argument("--pool", choices=("thread", "process"), default="thread",
+                            help="thread for I/O-bound tasks (mail, HTTP), process for CPU-bound ones.")
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds between polls when idle.")
+        parser.add_argument("--keep-days", type=int, default=7, help="Delete succeeded tasks older than this.")
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is drained.")
+
+    def handle(self, *args, **options):
+        autodiscover()
+        worker = Worker(
+            concurrency=options["concurrency"],
+            pool=options["pool"],
+            interval=options["interval"],
+            keep_days=options["keep_days"],
+        )
+        # finish running tasks on SIGTERM/SIGINT instead of abandoning them mid-flight
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+
+        processed = worker.run(once=options["once"])
+        self.stdout.write(f"Worker stopped after {processed} task(s).")
@@ -0,0 +1,149 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.db import connections
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .performance import (
+    RequestStats, get_n_plus_one_threshold, get_sample_rate, get_slow_request_ms, instrument_caches,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def is_sessionless(request):
+    prefixes = getattr(settings, "SESSIONLESS_PATH_PREFIXES", ("/api/",))
+    return request.path_info.startswith(tuple(prefixes))
+
+
+class APISessionMiddleware(SessionMiddleware):
+    """
+    SessionMiddleware that leaves the API alone: `/api/` requests authenticate
+    with JWT, so their session is never read from the cookie, loaded or saved.
+    They get an empty in-memory session so AuthenticationMiddleware and friends
+    still work (request.user is anonymous until DRF authenticates the token).
+    """
+
+    def process_request(self, request):
+        if is_sessionless(request):
+            request.session = self.SessionStore()
+            return
+        super().process_request(request)
+
+    def process_response(self, request, response):
+        if is_sessionless(request):
+            return response
+        return super().process_response(request, response)
+
+
+class PerformanceMiddleware:
+    """
+    Wall time of every request, and for a sample of them (PERFORMANCE_SAMPLE_RATE,
+    or staff requests sent with `X-Debug-Performance: 1`, any with DEBUG) DB
+    time, query count, repeated queries, cache hits/misses and response size.
+
+    Staff users (everyone with DEBUG) get the sampled figures in a
+    `Server-Timing` header and, for api_response bodies, under
+    `meta.performance` (as of the end of the view: rendering isn't included).
+    Requests slower than PERFORMANCE_SLOW_REQUEST_MS are logged as JSON, as
+    are queries repeated PERFORMANCE_N_PLUS_ONE_THRESHOLD times or more.
+
+    An unsampled request costs two clock reads and a random number.
+    """
+    header = "HTTP_X_DEBUG_PERFORMANCE"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        instrument_caches()
+
+    def __call__(self, request):
+        rate = get_sample_rate()
+        if not ((rate and random.random() < rate) or self.debug_requested(request)):
+            started = time.perf_counter()
+            response = self.get_response(request)
+            elapsed = (time.perf_counter() - started) * 1000
+            if elapsed >= get_slow_request_ms():
+                self.log(logging.WARNING, "slow_request", request, response, {"wall_ms": round(elapsed, 2)})
+            return response
+
+        stats = request.performance = RequestStats()
+        token = stats.activate()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            stats.deactivate(token)
+
+        record = stats.as_dict()
+        if not getattr(response, "streaming", False):
+            record["bytes"] = len(response.content)
+        if self.exposed(request):
+            response["Server-Timing"] = self.server_timing(record)
+
+        repeated = [dup for dup in record["duplicate_queries"] if dup["count"] >= get_n_plus_one_threshold()]
+        if record["wall_ms"] >= get_slow_request_ms():
+            self.log(logging.WARNING, "slow_request", request, response, record)
+        elif repeated:
+            self.log(logging.WARNING, "repeated_queries", request, response, dict(record, duplicate_queries=repeated))
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are still unrendered here, so their data can be extended
+        stats = getattr(request, "performance", None)
+        data = getattr(response, "data", None)
+        if stats is not None and isinstance(data, dict) and isinstance(data.get("meta"), dict) and self.exposed(request):
+            data["meta"]["performance"] = stats.as_dict()
+        return response
+
+    def debug_requested(self, request):
+        """
+        Whether `X-Debug-Performance: 1` counts: with DEBUG, or for staff, as
+        for exposing the figures. request.user isn't set this far out, so the
+        API's authenticators check the credentials (only when the header is sent).
+        """
+        if request.META.get(self.header) != "1":
+            return False
+        if settings.DEBUG:
+            return True
+        api_request = Request(request)
+        for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+            try:
+                authenticated = authenticator().authenticate(api_request)
+            except APIException:
+                return False
+            if authenticated is not None:
+                return bool(authenticated[0].is_staff)
+        return False
+
+    @staticmethod
+    def exposed(request):
+        user = getattr(request, "user", None)
+        return settings.DEBUG or bool(user is not None and user.is_staff)
+
+    @staticmethod
+    def server_timing(record):
+        metrics = [
+            f'total;dur={record["wall_ms"]}',
+            f'db;dur={record["db_ms"]};desc="{record["queries"]} queries"',
+            f'cache;desc="{record["cache_hits"]} hits, {record["cache_misses"]} misses"',
+        ]
+        if record["duplicate_queries"]:
+            metrics.append(f'dup;desc="{record["duplicate_queries"][0]["count"]}x repeated query"')
+        return ", ".join(metrics)
+
+    @staticmethod
+    def log(level, event, request, response, record):
+        record = {
+            "event": event, "method": request.method, "path": request.path,
+            "status": response.status_code, **record,
+        }
+        logger.log(level, json.dumps(record))
@@ -0,0 +1,118 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+
+class IdempotencyKey(models.Model):
+    """
+    First response of a request sent with an `Idempotency-Key` header, replayed
+    for retries of the same request. A row is inserted (status in_flight) before
+    the view runs, so concurrent duplicates find it and wait instead of executing;
+    the running request keeps heartbeat_at fresh until it completes.
+    """
+    STATUS_CHOICES = [
+        ("in_flight", "In flight"),
+        ("completed", "Completed"),
+    ]
+
+    key = models.CharField(max_length=255)
+    scope = models.CharField(max_length=255)  # user + method + path
+    fingerprint = models.CharField(max_length=64)  # sha256 of the request body
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default="in_flight")
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    heartbeat_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = (('scope', 'key'),)
+        indexes = [models.Index(fields=['expires_at'])]
+
+    def __str__(self):
+        return f"{self.scope} {self.key} ({self.status})"
+
+
+class OutboxEvent(models.Model):
+    """
+    Domain event written in the same transaction as the change it describes
+    and delivered to subscribers afterwards by `manage.py run_outbox_dispatcher`
+    (see core.events).
+    """
+    topic = models.CharField(max_length=100)
+    aggregate_type = models.CharField(max_length=100, blank=True)  # e.g. "orders.order"
+    aggregate_id = models.CharField(max_length=64, blank=True)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now)
+    available_at = models.DateTimeField(default=timezone.now)  # pushed back after a failed delivery
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    failed = models.BooleanField(default=False)  # gave up after OUTBOX_MAX_ATTEMPTS
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['processed_at', 'available_at']),
+            models.Index(fields=['aggregate_type', 'aggregate_id']),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} #{self.pk}"
+
+
+class Task(models.Model):
+    """A queued call of a function registered with `core.tasks.task`; run by `manage.py runworker`."""
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("succeeded", "Succeeded"),
+        ("failed", "Failed"),
+    ]
+
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True, encoder=DjangoJSONEncoder)
+    kwargs = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default="queued")
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # refreshed by the worker while running
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_at'])]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class OutgoingEmail(models.Model):
+    """Mail queued by `core.mail.queue_mail` and delivered by the `core.mail.send_email` task."""
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("sent", "Sent"),
+        ("failed", "Failed"),
+    ]
+
+    to = models.JSONField(default=list)
+    from_email = models.CharField(max_length=255, blank=True)
+    subject = models.CharField(max_length=255)
+    template = models.CharField(max_length=255, blank=True)  # rendered with `context` by the worker
+    # both may hold verification codes or reset links: blanked once sent or given up on
+    context = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    body = models.TextField(blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default="queued")
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(null=True, blank=True)  # given up on, unsent, after this
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def __str__(self):
+        return f"{self.subject} → {', '.join(self.to)} ({self.status})"
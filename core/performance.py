@@ -0,0 +1,145 @@
+"""
+Per-request performance figures, collected by core.middleware.PerformanceMiddleware.
+
+A sampled request gets a RequestStats that sees every query (through
+connection.execute_wrapper) and every cache read (the configured cache
+backends' get/get_many are wrapped once, and count only while a sampled
+request is running). Queries are grouped by fingerprint, their SQL with the
+length of IN lists erased, so the same statement run once per row of a list
+shows up as one fingerprint with a high count: an N+1.
+"""
+import contextvars
+import re
+import time
+from collections import Counter
+from functools import lru_cache, wraps
+
+from django.conf import settings
+from django.core.cache.backends.base import BaseCache
+from django.utils.module_loading import import_string
+
+_current = contextvars.ContextVar("performance_stats", default=None)
+
+_IN_LIST = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+_NUMBER = re.compile(r"\b\d+\b")
+_SPACE = re.compile(r"\s+")
+
+
+def get_sample_rate():
+    return getattr(settings, "PERFORMANCE_SAMPLE_RATE", 0.0)
+
+
+def get_slow_request_ms():
+    return getattr(settings, "PERFORMANCE_SLOW_REQUEST_MS", 1000)
+
+
+def get_n_plus_one_threshold():
+    return getattr(settings, "PERFORMANCE_N_PLUS_ONE_THRESHOLD", 5)
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """`sql` with IN lists collapsed and literal numbers (LIMIT, inlined ids) replaced."""
+    sql = _IN_LIST.sub("(...)", sql)
+    sql = _NUMBER.sub("N", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_time = 0.0
+        self.queries = 0
+        self.fingerprints = Counter()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._in_cache_call = False
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            self.fingerprints[sql] += 1
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def duplicates(self, limit=5):
+        """The most repeated query fingerprints, [(fingerprint, count)], count > 1."""
+        counts = Counter()
+        for sql, count in self.fingerprints.items():
+            counts[fingerprint(sql)] += count
+        return [(sql, count) for sql, count in counts.most_common(limit) if count > 1]
+
+    def as_dict(self):
+        return {
+            "wall_ms": round(self.elapsed() * 1000, 2),
+            "db_ms": round(self.db_time * 1000, 2),
+            "queries": self.queries,
+            "duplicate_queries": [{"sql": sql, "count": count} for sql, count in self.duplicates()],
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+        }
+
+    def activate(self):
+        return _current.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _current.reset(token)
+
+
+def _count_get(get):
+    missing = object()
+
+    @wraps(get)
+    def wrapper(self, key, default=None, version=None):
+        stats = _current.get()
+        if stats is None or stats._in_cache_call:
+            return get(self, key, default, version)
+        stats._in_cache_call = True  # backends implementing get() with get_many() count once
+        try:
+            value = get(self, key, missing, version)
+        finally:
+            stats._in_cache_call = False
+        if value is missing:
+            stats.cache_misses += 1
+            return default
+        stats.cache_hits += 1
+        return value
+    return wrapper
+
+
+def _count_get_many(get_many):
+    @wraps(get_many)
+    def wrapper(self, keys, version=None):
+        stats = _current.get()
+        if stats is None or stats._in_cache_call:
+            return get_many(self, keys, version)
+        keys = list(keys)
+        stats._in_cache_call = True
+        try:
+            found = get_many(self, keys, version)
+        finally:
+            stats._in_cache_call = False
+        stats.cache_hits += len(found)
+        stats.cache_misses += len(keys) - len(found)
+        return found
+    return wrapper
+
+
+def instrument_caches():
+    """Wrap get/get_many of every configured cache backend class (once) to count hits and misses."""
+    for config in settings.CACHES.values():
+        backend = import_string(config["BACKEND"])
+        if backend.__dict__.get("_performance_instrumented"):
+            continue
+        backend.get = _count_get(backend.get)
+        # BaseCache.get_many goes through get(), which is already counted
+        if backend.get_many is not BaseCache.get_many:
+            backend.get_many = _count_get_many(backend.get_many)
+        backend._performance_instrumented = True
@@ -0,0 +1,75 @@
+"""
+JSON rendering through orjson when it is installed.
+
+Output matches DRF's JSONRenderer byte for byte in the compact, UTF-8 default
+configuration: anything orjson does not handle natively (Decimal, lazy strings,
+datetimes, which DRF writes with a trailing "Z") goes through DRF's own
+encoder. orjson writes some floats differently (1e20 for 1e+20, 0.00001 for
+1e-05) and NaN and Infinity as null, so payloads holding such floats are
+rendered by DRF, which writes repr() and raises ValueError for non-finite
+values under STRICT_JSON. Indented output (browsable API, `; indent=` media
+types), UNICODE_JSON = False and payloads orjson rejects (e.g. integers over
+64 bits) fall back to the stdlib path too.
+"""
+import datetime
+import gc
+import math
+from decimal import Decimal
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+_drf_default = encoders.JSONEncoder().default
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+# no referents for gc.get_referents() to return: a level made of these and
+# plain containers can be handed to it whole, without filtering in Python
+_SCALARS = frozenset((str, int, bool, float, type(None), Decimal, datetime.datetime, datetime.date, datetime.time))
+_CONTAINERS = (dict, list, tuple, set, frozenset)
+_PLAIN = _SCALARS | frozenset(_CONTAINERS)
+
+
+def needs_stdlib(data):
+    """
+    True if `data` holds a float orjson would not write the way DRF does:
+    NaN or Infinity (null from orjson), or one repr() writes in exponent form
+    (1e+20, 1e-05). The containers are walked a level at a time in C, which
+    keeps this well under the cost of the encoding it guards.
+    """
+    level = [data]
+    while level:
+        types = set(map(type, level))
+        if any(issubclass(t, float) for t in types) and any(
+            not math.isfinite(obj) or "e" in float.__repr__(obj) for obj in level if isinstance(obj, float)
+        ):
+            return True
+        if not types <= _PLAIN:
+            level = [obj for obj in level if isinstance(obj, _CONTAINERS)]
+        level = gc.get_referents(*level)
+    return False
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.ensure_ascii or not self.compact or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if needs_stdlib(data):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_drf_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # same strict-javascript-subset escaping as JSONRenderer
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+        return ret
@@ -0,0 +1,307 @@
+"""
+Read-only serializers compiled from DRF ModelSerializers, for list pages.
+
+Listing thousands of rows through a ModelSerializer builds a model instance
+per row and goes through DRF's field machinery for every value. A
+CompiledSerializer produces the same output as its `serializer_class` from
+`.values()` rows instead:
+
+  * the DRF field list is compiled once per class into (name, column,
+    converter) steps. Fields whose database value already is their
+    representation (strings, integers, booleans, JSON, primary keys) get no
+    converter, decimals and datetimes get a shortcut for the common case, and
+    the rest keep the DRF field's own to_representation.
+  * nested serializers cost one query per relation per page, whatever the
+    number of rows; child rows are attached to their parents through dicts
+    keyed by parent id. Nested ModelSerializers are compiled automatically.
+
+Fields without a column (SerializerMethodField, model properties) have to be
+declared in `nested` or `computed`. Anything else the compiler can't
+reproduce exactly raises ImproperlyConfigured the first time the class is
+used, instead of returning different output.
+
+The output shares nested dicts between rows (a brand listed under many
+products is one dict): it is meant to be rendered, not modified.
+"""
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models import F
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+PARENT = "_compiled_parent"
+
+# to_representation() returns the value a database row already holds
+_IDENTITY_FIELDS = (
+    serializers.CharField, serializers.IntegerField, serializers.BooleanField, serializers.ReadOnlyField,
+)
+
+
+class Nested:
+    """
+    Child serializer for the relation `source` of the model: a forward
+    ForeignKey/OneToOneField, or a related manager name (reverse foreign key,
+    many-to-many). `serializer` is a CompiledSerializer subclass or "self";
+    `filter` is a Q applied to the related rows.
+    """
+
+    def __init__(self, serializer, source=None, filter=None):
+        self.serializer = serializer
+        self.source = source
+        self.filter = filter
+
+
+class _Relation:
+    def __init__(self, name, serializer, manager, lookup, key, many, filter):
+        self.name = name
+        self.serializer = serializer
+        self.manager = manager
+        self.lookup = lookup  # child field filtered with __in on the parent keys
+        self.key = key  # parent row column holding those keys
+        self.many = many
+        self.filter = filter
+
+
+class _Plan:
+    def __init__(self, columns, steps, relations, computed, bound):
+        self.columns = columns
+        self.steps = steps
+        self.relations = relations
+        self.computed = computed
+        self.bound = bound  # field name -> converter factory taking the serializer context
+
+
+class CompiledSerializer:
+    serializer_class = None
+    nested = {}
+    computed = {}  # field name -> callable(item), run once the rest of the item is built
+
+    def __init__(self, context=None):
+        self.context = context or {}
+
+    @classmethod
+    def get_plan(cls):
+        plan = cls.__dict__.get("_plan")
+        if plan is None:
+            plan = cls._plan = cls.compile()
+        return plan
+
+    @classmethod
+    def compile(cls):
+        model = cls.serializer_class.Meta.model
+        opts = model._meta
+        columns = {opts.pk.attname: None}
+        steps, relations, computed, bound = [], [], [], {}
+
+        for field in cls.serializer_class()._readable_fields:
+            name = field.field_name
+            if name in cls.computed:
+                steps.append((name, (PARENT, name), None))
+                computed.append((name, cls.computed[name]))
+                continue
+
+            nested = cls.nested.get(name)
+            if nested is None and isinstance(field, serializers.BaseSerializer):
+                child = field.child if isinstance(field, serializers.ListSerializer) else field
+                nested = Nested(compiled(type(child)))
+            if nested is not None:
+                relation = cls._relation(opts, name, nested, nested.source or field.source)
+                if relation.key != opts.pk.attname:
+                    columns[relation.key] = None
+                relations.append(relation)
+                steps.append((name, (PARENT, name), None))
+                continue
+
+            model_field = cls._model_field(opts, name, field)
+            columns[model_field.attname] = None
+            if isinstance(field, serializers.FileField):
+                bound[name] = _file_converter(field, model_field.storage)
+            elif isinstance(field, serializers.DateTimeField):
+                bound[name] = _datetime_converter(field)
+            steps.append((name, model_field.attname, cls._converter(field)))
+
+        return _Plan(list(columns), steps, relations, computed, bound)
+
+    @classmethod
+    def _model_field(cls, opts, name, field):
+        try:
+            model_field = opts.get_field(field.source)
+        except FieldDoesNotExist:
+            model_field = None
+        if model_field is None or not model_field.concrete or model_field.many_to_many:
+            raise ImproperlyConfigured(
+                f"{cls.__name__} can't compile {name!r} ({type(field).__name__}); "
+                f"declare it in `nested` or `computed`."
+            )
+        if model_field.is_relation and not isinstance(field, serializers.PrimaryKeyRelatedField):
+            raise ImproperlyConfigured(
+                f"{cls.__name__} can't compile {name!r}: only primary keys of related objects are supported."
+            )
+        return model_field
+
+    @staticmethod
+    def _converter(field):
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            return field.pk_field.to_representation if field.pk_field is not None else None
+        if isinstance(field, serializers.JSONField):
+            return field.to_representation if field.binary else None
+        if isinstance(field, serializers.ChoiceField):
+            identity = all(key == value for key, value in field.choice_strings_to_values.items())
+            return None if identity else field.to_representation
+        if isinstance(field, _IDENTITY_FIELDS):
+            return None
+        if isinstance(field, serializers.DecimalField):
+            return _decimal_converter(field)
+        return field.to_representation
+
+    @classmethod
+    def _relation(cls, opts, name, nested, source):
+        serializer = cls if nested.serializer == "self" else nested.serializer
+        try:
+            field = opts.get_field(source)
+        except FieldDoesNotExist:
+            field = None
+        if field is not None and field.concrete and (field.many_to_one or field.one_to_one):
+            # forward foreign key: children are looked up by their own primary key
+            related = field.related_model._meta
+            return _Relation(name, serializer, field.related_model._base_manager, related.pk.name,
+                             field.attname, False, nested.filter)
+        if field is not None and field.one_to_many:
+            return _Relation(name, serializer, field.related_model._default_manager, field.field.name,
+                             opts.pk.attname, True, nested.filter)
+        if field is not None and field.many_to_many:
+            lookup = field.related_query_name() if field.concrete else field.field.name
+            return _Relation(name, serializer, field.related_model._default_manager, lookup,
+                             opts.pk.attname, True, nested.filter)
+        raise ImproperlyConfigured(f"{cls.__name__}: {source!r} is not a relation {name!r} can be nested from.")
+
+    def values(self, queryset):
+        """`queryset` as the values() rows `to_representation` takes, e.g. to paginate."""
+        return queryset.values(*self.get_plan().columns)
+
+    def serialize(self, queryset):
+        return self.to_representation(self.values(queryset))
+
+    def to_representation(self, rows):
+        plan = self.get_plan()
+        rows = list(rows)
+        if not rows:
+            return []
+        for relation in plan.relations:
+            self._attach(relation, rows)
+        for name, _ in plan.computed:
+            for row in rows:
+                row[PARENT, name] = None
+
+        steps = plan.steps
+        if plan.bound:
+            steps = [
+                (name, key, plan.bound[name](self.context) if name in plan.bound else conv)
+                for name, key, conv in steps
+            ]
+
+        items = []
+        for row in rows:
+            item = {}
+            for name, key, conv in steps:
+                value = row[key]
+                item[name] = value if conv is None or value is None else conv(value)
+            for name, func in plan.computed:
+                item[name] = func(item)
+            items.append(item)
+        return items
+
+    def _attach(self, relation, rows):
+        """Serialize `relation`'s children of `rows` with one query and store them on each row."""
+        slot = (PARENT, relation.name)
+        keys = {row[relation.key] for row in rows} - {None}
+        child = relation.serializer(context=self.context)
+        child_rows = []
+        if keys:
+            queryset = relation.manager.filter(**{f"{relation.lookup}__in": keys})
+            if relation.filter is not None:
+                queryset = queryset.filter(relation.filter)
+            if relation.many:
+                child_rows = list(queryset.values(*child.get_plan().columns, **{PARENT: F(relation.lookup)}))
+            else:
+                child_rows = list(child.values(queryset))
+        child_items = child.to_representation(child_rows)
+
+        if relation.many:
+            grouped = defaultdict(list)
+            for child_row, child_item in zip(child_rows, child_items):
+                grouped[child_row[PARENT]].append(child_item)
+            for row in rows:
+                row[slot] = grouped.get(row[relation.key], [])
+        else:
+            pk = relation.serializer.serializer_class.Meta.model._meta.pk.attname
+            by_pk = {child_row[pk]: child_item for child_row, child_item in zip(child_rows, child_items)}
+            for row in rows:
+                row[slot] = by_pk.get(row[relation.key])
+
+
+def _decimal_converter(field):
+    """DecimalField.to_representation, skipping the quantize of values stored with the field's decimal places."""
+    coerce_to_string = getattr(field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.normalize_output or field.decimal_places is None:
+        return field.to_representation
+    exponent = -field.decimal_places
+
+    def convert(value):
+        if isinstance(value, Decimal) and value.as_tuple().exponent == exponent:
+            return f"{value:f}"
+        return field.to_representation(value)
+    return convert
+
+
+def _datetime_converter(field):
+    """Factory for DateTimeField.to_representation with the timezone looked up once per page, not per value."""
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+
+    def bind(context):
+        if output_format is None or output_format.lower() != ISO_8601:
+            return field.to_representation
+        field_timezone = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+        if field_timezone is None:
+            return field.to_representation
+
+        def convert(value):
+            if not isinstance(value, datetime) or value.utcoffset() is None:
+                return field.to_representation(value)
+            value = value.astimezone(field_timezone).isoformat()
+            return value[:-6] + "Z" if value.endswith("+00:00") else value
+        return convert
+    return bind
+
+
+def _file_converter(field, storage):
+    """Factory for FileField.to_representation from the stored name instead of a FieldFile."""
+    use_url = getattr(field, "use_url", api_settings.UPLOADED_FILES_USE_URL)
+
+    def bind(context):
+        request = context.get("request")
+
+        def convert(name):
+            if not name:
+                return None
+            if not use_url:
+                return name
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+        return convert
+    return bind
+
+
+_compiled = {}
+
+
+def compiled(serializer_class):
+    """CompiledSerializer subclass for a ModelSerializer that needs no declarations."""
+    if serializer_class not in _compiled:
+        _compiled[serializer_class] = type(
+            f"Compiled{serializer_class.__name__}", (CompiledSerializer,), {"serializer_class": serializer_class},
+        )
+    return _compiled[serializer_class]
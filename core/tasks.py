@@ -0,0 +1,290 @@
+"""
+Database-backed background tasks.
+
+    # <app>/tasks.py (imported automatically by the worker)
+    from core.tasks import task
+
+    @task(max_attempts=5)
+    def rebuild_search_index(product_id):
+        ...
+
+    rebuild_search_index.delay(42)                        # as soon as a worker is free
+    rebuild_search_index.schedule(timezone.now() + timedelta(hours=1), 42)
+    rebuild_search_index(42)                              # plain synchronous call
+
+Enqueueing inserts a Task row, so a task enqueued inside a transaction only
+becomes visible to workers if that transaction commits. `manage.py runworker`
+claims due rows with SELECT ... FOR UPDATE SKIP LOCKED and runs them on a
+thread or process pool; failures are retried with exponential backoff up to
+the task's max_attempts (the first delay is TASKS_RETRY_BACKOFF, or the task's
+own retry_backoff). A task raising Retry(delay) is run again after `delay`
+without using up an attempt. Arguments must be JSON-serialisable.
+"""
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, models, transaction
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import Task
+from .utils.backoff import exponential_backoff
+from .worker_process import init_worker_process
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+class Retry(Exception):
+    """Raised by a task to be run again after `delay` (a timedelta) without using up an attempt."""
+
+    def __init__(self, delay, reason=""):
+        super().__init__(reason or f"retry in {delay}")
+        self.delay = delay
+
+
+class TaskFunction:
+    def __init__(self, func, *, name=None, max_attempts=3, retry_backoff=None):
+        self.func = func
+        self.name = name or f"{func.__module__}.{func.__qualname__}"
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff  # first retry delay, doubled per attempt; TASKS_RETRY_BACKOFF if None
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def schedule(self, run_at, *args, **kwargs):
+        """Enqueue to run no earlier than `run_at`. Returns the Task row."""
+        if getattr(settings, "TASKS_ALWAYS_EAGER", False):
+            self.func(*args, **kwargs)
+            return None
+        return Task.objects.create(
+            name=self.name, args=list(args), kwargs=kwargs,
+            run_at=run_at, max_attempts=self.max_attempts,
+        )
+
+    def delay(self, *args, **kwargs):
+        return self.schedule(timezone.now(), *args, **kwargs)
+
+    def retry_delay(self, attempts):
+        return exponential_backoff(attempts, self.retry_backoff or get_retry_backoff())
+
+    def build(self, *args, run_at=None, **kwargs):
+        """Unsaved Task for `enqueue_many`."""
+        return Task(
+            name=self.name, args=list(args), kwargs=kwargs,
+            run_at=run_at or timezone.now(), max_attempts=self.max_attempts,
+        )
+
+
+def task(func=None, *, name=None, max_attempts=3, retry_backoff=None):
+    """Register a function as a background task (usable with or without arguments)."""
+    def decorator(func):
+        wrapped = TaskFunction(func, name=name, max_attempts=max_attempts, retry_backoff=retry_backoff)
+        TASKS[wrapped.name] = wrapped
+        return wrapped
+    return decorator(func) if func is not None else decorator
+
+
+def enqueue_many(tasks):
+    """Insert many Task rows (see TaskFunction.build) with one INSERT."""
+    return Task.objects.bulk_create(list(tasks), batch_size=1000)
+
+
+def autodiscover():
+    autodiscover_modules("tasks")
+    from . import mail  # noqa: F401 (registers the mail delivery task)
+
+
+def get_retry_backoff():
+    return getattr(settings, "TASKS_RETRY_BACKOFF", timedelta(seconds=10))
+
+
+def get_visibility_timeout():
+    return getattr(settings, "TASKS_VISIBILITY_TIMEOUT", timedelta(minutes=15))
+
+
+CLAIM_FIELDS = ("id", "name", "args", "kwargs", "attempts", "max_attempts")
+
+
+def claim(batch_size, *, now=None):
+    """Mark up to `batch_size` due tasks as running and return them as dicts (see CLAIM_FIELDS)."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(status="queued", run_at__lte=now)
+            .order_by("run_at", "id")
+            .values(*CLAIM_FIELDS)[:batch_size]
+        )
+        if jobs:
+            Task.objects.filter(pk__in=[job["id"] for job in jobs]).update(
+                status="running", started_at=now, heartbeat_at=now,
+            )
+    return jobs
+
+
+def heartbeat(task_ids):
+    """Extend the claim on running tasks, so requeue_stale leaves them alone however long they take."""
+    if task_ids:
+        Task.objects.filter(pk__in=task_ids, status="running").update(heartbeat_at=timezone.now())
+
+
+def requeue_stale(*, older_than=None):
+    """Put back tasks whose worker died while running them (no heartbeat within the visibility timeout)."""
+    cutoff = older_than or timezone.now() - get_visibility_timeout()
+    stale = models.Q(heartbeat_at__lt=cutoff) | models.Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    return Task.objects.filter(stale, status="running").update(status="queued", run_at=timezone.now())
+
+
+def close_broken_connections():
+    """
+    Pool threads keep their connection between tasks (close_old_connections would
+    reconnect per task with CONN_MAX_AGE=0); only drop ones a failed task left unusable.
+    """
+    for conn in connections.all(initialized_only=True):
+        if conn.connection is not None and conn.errors_occurred and not conn.is_usable():
+            conn.close()
+
+
+def run_task(job):
+    """Execute one claimed task and record the outcome. Safe to call from pool threads/processes."""
+    close_broken_connections()
+    try:
+        attempts = job["attempts"] + 1
+        func = TASKS.get(job["name"])
+        try:
+            if func is None:
+                raise LookupError(f"Unknown task {job['name']}")
+            func.func(*job["args"], **job["kwargs"])
+        except Retry as exc:
+            Task.objects.filter(pk=job["id"]).update(
+                status="queued", run_at=timezone.now() + exc.delay, last_error=str(exc)[:2000],
+            )
+            return False
+        except Exception as exc:
+            logger.exception("Task %s (%s) failed", job["id"], job["name"])
+            now = timezone.now()
+            if attempts >= job["max_attempts"] or func is None:
+                changes = {"status": "failed", "finished_at": now}
+            else:
+                changes = {"status": "queued", "run_at": now + func.retry_delay(attempts)}
+            Task.objects.filter(pk=job["id"]).update(
+                attempts=attempts, last_error=f"{type(exc).__name__}: {exc}"[:2000], **changes,
+            )
+            return False
+        Task.objects.filter(pk=job["id"]).update(attempts=attempts, status="succeeded", finished_at=timezone.now())
+        return True
+    finally:
+        close_broken_connections()
+
+
+def purge_finished(*, older_than, batch_size=5000):
+    """Delete succeeded tasks finished before `older_than`. Failed tasks are kept for inspection."""
+    total = 0
+    while True:
+        pks = list(
+            Task.objects.filter(status="succeeded", finished_at__lt=older_than)
+            .order_by("finished_at").values_list("pk", flat=True)[:batch_size]
+        )
+        if not pks:
+            return total
+        total += Task.objects.filter(pk__in=pks).delete()[0]
+
+
+class Worker:
+    """
+    Claims due tasks and runs them on a pool of `concurrency` threads or processes.
+    Up to two tasks per pool slot are claimed ahead, and the queue is only polled
+    again once half of them are done, so claims stay batched under load.
+
+    On a timer, busy or idle, the worker refreshes the heartbeat of the tasks it
+    holds (every third of TASKS_VISIBILITY_TIMEOUT) and runs housekeeping:
+    requeueing tasks of dead workers and purging old finished ones.
+    """
+
+    housekeeping_interval = 60.0
+
+    def __init__(self, *, concurrency=4, pool="thread", interval=1.0, keep_days=7):
+        self.concurrency = concurrency
+        self.pool = pool
+        self.interval = interval
+        self.keep_days = keep_days
+        self.stopping = False
+        self.processed = 0
+
+    def make_executor(self):
+        if self.pool == "process":
+            connections.close_all()
+            return ProcessPoolExecutor(
+                self.concurrency,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker_process,
+            )
+        return ThreadPoolExecutor(self.concurrency, thread_name_prefix="task-worker")
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def housekeeping(self):
+        requeue_stale()
+        purge_finished(older_than=timezone.now() - timedelta(days=self.keep_days))
+
+    def run(self, *, once=False):
+        """Process tasks until stopped (or, with `once`, until the queue is drained)."""
+        inflight = {}  # future -> task id
+        heartbeat_interval = get_visibility_timeout().total_seconds() / 3
+        last_heartbeat, last_housekeeping = time.monotonic(), float("-inf")
+        with self.make_executor() as executor:
+            while True:
+                jobs = []
+                if not self.stopping and len(inflight) <= self.concurrency:
+                    jobs = claim(self.concurrency * 2 - len(inflight))
+                    inflight.update((executor.submit(run_task, job), job["id"]) for job in jobs)
+
+                now = time.monotonic()
+                if now - last_heartbeat >= heartbeat_interval:
+                    heartbeat(list(inflight.values()))
+                    last_heartbeat = now
+                if now - last_housekeeping >= self.housekeeping_interval:
+                    self.housekeeping()
+                    last_housekeeping = now
+
+                if not inflight:
+                    if self.stopping or once:
+                        break
+                    time.sleep(self.interval)
+                    continue
+
+                # wake up for the next heartbeat or housekeeping even when every task runs long
+                due = min(last_heartbeat + heartbeat_interval, last_housekeeping + self.housekeeping_interval)
+                timeout = max(0.0, due - time.monotonic())
+                if not jobs:
+                    timeout = min(timeout, self.interval)
+                done, _ = wait(inflight, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del inflight[future]
+                self.processed += len(done)
+
+            if self.pool == "thread":
+                # one job per thread (the barrier keeps them on distinct threads) to close their connections
+                barrier = threading.Barrier(self.concurrency)
+                wait([executor.submit(_close_thread_connections, barrier) for _ in range(self.concurrency)])
+        return self.processed
+
+
+def _close_thread_connections(barrier):
+    barrier.wait()
+    connections.close_all()
+
+
+@task
+def noop(*args, **kwargs):
+    """Does nothing; used by `manage.py bench_tasks` and for checking workers are alive."""
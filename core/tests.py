@@ -0,0 +1,800 @@
+"""
+Query and response-size budgets for every API route.
+
+Each route in shop_backend/urls.py under /api/ has an entry in BUDGETS: one
+representative request, the status it must return, and upper bounds on the
+queries it may run and the bytes it may return. The requests run against a
+seeded dataset, then again after the dataset has been doubled: list
+endpoints whose query count grows with the number of rows (N+1) fail the
+second pass. Caches are cleared before every request, so the counts are
+cold-cache worst cases, authentication included.
+
+A route without a budget fails the suite. The report printed at the end lists
+actual figures against the budgets; runs the same on SQLite and PostgreSQL.
+"""
+import re
+import smtplib
+import sys
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from django.contrib.sessions.backends.cached_db import SessionStore
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils import timezone
+from django.utils.encoding import smart_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework.permissions import AllowAny
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.views import APIView
+
+from accounts.authentication import local_cache
+from accounts.models import Address, User
+from accounts.revocation import revocation_filter
+from accounts.serializers import CustomTokenObtainPairSerializer
+from cart.models import Cart, CartItem, PriceSnapshot
+from catalog.models import (
+    Brand, Category, Product, ProductAttribute, ProductAttributeValue, ProductImage, ProductVariant,
+)
+from core.dataset import DatasetGenerator
+from core.events import autodiscover as autodiscover_subscribers, claim as claim_events, dispatch_batch, publish, subscribe
+from core.idempotency import idempotent
+from core.loadtest import DEFAULT_MIX, LoadTest, parse_mix
+from core.performance import RequestStats
+from core.mail import breaker, close_connection, get_max_attempts, queue_mail
+from core.models import IdempotencyKey, OutboxEvent, OutgoingEmail, Task
+from core.renderers import FastJSONRenderer
+from core.tasks import Worker, claim, heartbeat, noop, requeue_stale, run_task, task
+from inventory.models import Inventory, InventoryTransaction, StockTransfer, StockTransferLine, Warehouse
+from orders.models import Order, OrderItem
+
+PASSWORD = "Budget-Password-1"
+
+
+class Endpoint:
+    """
+    One request and its budget. `path` is formatted with the fixture ids;
+    `data` is a dict or a callable taking the test case (for one-off tokens).
+    """
+
+    def __init__(self, method, path, *, user=None, data=None, status=200, queries, kb):
+        self.method = method
+        self.path = path
+        self.user = user
+        self.data = data
+        self.status = status
+        self.queries = queries
+        self.kb = kb
+
+
+BUDGETS = {
+    # accounts
+    "api/auth/register/": Endpoint("post", "/api/auth/register/", status=201, data={
+        "username": "newcomer", "email": "newcomer@example.com", "password": PASSWORD, "password2": PASSWORD,
+    }, queries=7, kb=1),
+    "api/auth/verify-otp/": Endpoint("post", "/api/auth/verify-otp/", data=lambda t: {
+        "email": t.pending.email, "otp": t.pending.generate_otp(),
+    }, queries=7, kb=1),
+    "api/auth/resend-otp/": Endpoint("post", "/api/auth/resend-otp/", data=lambda t: {
+        "email": t.pending.email,
+    }, queries=7, kb=1),
+    "api/auth/login/": Endpoint("post", "/api/auth/login/", data={
+        "username": "customer", "password": PASSWORD,
+    }, queries=2, kb=1),
+    "api/auth/logout/": Endpoint("post", "/api/auth/logout/", user="customer", data=lambda t: {
+        "refresh": str(t.refresh_token()),
+    }, queries=4, kb=1),
+    "api/auth/change-password/": Endpoint("post", "/api/auth/change-password/", user="customer", data={
+        "old_password": PASSWORD, "new_password": "Budget-Password-2", "confirm_new_password": "Budget-Password-2",
+    }, queries=3, kb=1),
+    "api/auth/request-reset-email/": Endpoint("post", "/api/auth/request-reset-email/", data={
+        "email": "customer@example.com",
+    }, queries=5, kb=1),
+    "api/auth/password-reset-confirm/<uidb64>/<token>/": Endpoint(
+        "post", "/api/auth/password-reset-confirm/{uidb64}/{reset_token}/", data=lambda t: {
+            "password": "Budget-Password-2", "password2": "Budget-Password-2",
+            "uidb64": t.ids["uidb64"], "token": t.ids["reset_token"],
+        }, queries=2, kb=1),
+    "api/auth/user/": Endpoint("get", "/api/auth/user/", user="customer", queries=2, kb=2),
+    "api/auth/user/addresses/": Endpoint("get", "/api/auth/user/addresses/", user="customer", queries=3, kb=1),
+    "api/auth/user/addresses/batch/": Endpoint("post", "/api/auth/user/addresses/batch/", user="customer", data={
+        "create": [{"address_line1": "1 Budget Road", "city": "Pune", "state": "MH", "postal_code": "411001"}],
+    }, queries=5, kb=2),
+    "api/auth/user/addresses/<pk>/": Endpoint("get", "/api/auth/user/addresses/{address}/", user="customer",
+                                               queries=2, kb=1),
+    "api/auth/token/": Endpoint("post", "/api/auth/token/", data={
+        "username": "customer", "password": PASSWORD,
+    }, queries=2, kb=1),
+    "api/auth/token/refresh/": Endpoint("post", "/api/auth/token/refresh/", data=lambda t: {
+        "refresh": str(t.refresh_token()),
+    }, queries=6, kb=1),
+    "api/auth/token/verify/": Endpoint("post", "/api/auth/token/verify/", data=lambda t: {
+        "token": str(t.refresh_token()),
+    }, queries=2, kb=1),
+
+    # catalog
+    "api/catalog/": Endpoint("get", "/api/catalog/", queries=0, kb=1),
+    "api/catalog/categories/": Endpoint("get", "/api/catalog/categories/", queries=4, kb=13),
+    "api/catalog/categories/<pk>/": Endpoint("get", "/api/catalog/categories/{category}/", queries=6, kb=2),
+    "api/catalog/brands/": Endpoint("get", "/api/catalog/brands/", queries=1, kb=2),
+    "api/catalog/brands/<pk>/": Endpoint("get", "/api/catalog/brands/{brand}/", queries=1, kb=1),
+    "api/catalog/products/": Endpoint("get", "/api/catalog/products/", queries=8, kb=42),
+    "api/catalog/products/<slug>/": Endpoint("get", "/api/catalog/products/{product}/", queries=13, kb=5),
+    "api/catalog/products/<slug>/images/": Endpoint("get", "/api/catalog/products/{product}/images/",
+                                                    queries=2, kb=1),
+    "api/catalog/products/<slug>/variants/": Endpoint("get", "/api/catalog/products/{product}/variants/",
+                                                      queries=2, kb=2),
+    "api/catalog/product-attributes/": Endpoint("get", "/api/catalog/product-attributes/", queries=2, kb=2),
+    "api/catalog/product-attributes/<pk>/": Endpoint("get", "/api/catalog/product-attributes/{attribute}/",
+                                                     queries=2, kb=2),
+    "api/catalog/product-attribute-values/": Endpoint("get", "/api/catalog/product-attribute-values/",
+                                                      queries=1, kb=2),
+    "api/catalog/product-attribute-values/<pk>/": Endpoint(
+        "get", "/api/catalog/product-attribute-values/{attribute_value}/", queries=1, kb=1),
+    "api/catalog/product-variants/": Endpoint("get", "/api/catalog/product-variants/", queries=1, kb=11),
+    "api/catalog/product-variants/<pk>/": Endpoint("get", "/api/catalog/product-variants/{variant}/",
+                                                   queries=1, kb=1),
+    "api/catalog/product-images/": Endpoint("get", "/api/catalog/product-images/", queries=1, kb=4),
+    "api/catalog/product-images/<pk>/": Endpoint("get", "/api/catalog/product-images/{image}/", queries=1, kb=1),
+
+    # cart
+    "api/cart/": Endpoint("get", "/api/cart/", queries=0, kb=1),
+    "api/cart/carts/": Endpoint("get", "/api/cart/carts/", user="customer", queries=5, kb=4),
+    "api/cart/carts/<pk>/": Endpoint("get", "/api/cart/carts/{cart}/", user="customer", queries=4, kb=2),
+    "api/cart/carts/<pk>/checkout/": Endpoint("post", "/api/cart/carts/{cart}/checkout/", user="customer",
+                                              queries=5, kb=2),
+    "api/cart/items/": Endpoint("get", "/api/cart/items/", user="customer", queries=3, kb=3),
+    "api/cart/items/<pk>/": Endpoint("get", "/api/cart/items/{cart_item}/", user="customer", queries=2, kb=1),
+    "api/cart/snapshots/": Endpoint("get", "/api/cart/snapshots/", user="staff", queries=3, kb=1),
+    "api/cart/snapshots/<pk>/": Endpoint("get", "/api/cart/snapshots/{snapshot}/", user="staff", queries=2, kb=1),
+
+    # orders
+    "api/orders/": Endpoint("get", "/api/orders/", user="customer", queries=4, kb=9),
+    "api/orders/<pk>/": Endpoint("get", "/api/orders/{order}/", user="customer", queries=3, kb=1),
+    "api/orders/<pk>/cancel/": Endpoint("post", "/api/orders/{order}/cancel/", user="customer",
+                                        queries=12, kb=2),
+    "api/orders/<pk>/status/": Endpoint("post", "/api/orders/{staff_order}/status/", user="staff", data={
+        "status": "confirmed",
+    }, queries=11, kb=1),
+
+    # inventory
+    "api/inventory/": Endpoint("get", "/api/inventory/", queries=0, kb=1),
+    "api/inventory/availability/": Endpoint("get", "/api/inventory/availability/?variants={variant}",
+                                            queries=1, kb=1),
+    "api/inventory/warehouses/": Endpoint("get", "/api/inventory/warehouses/", user="staff", queries=3, kb=2),
+    "api/inventory/warehouses/<pk>/": Endpoint("get", "/api/inventory/warehouses/{warehouse}/", user="staff",
+                                               queries=2, kb=1),
+    "api/inventory/inventories/": Endpoint("get", "/api/inventory/inventories/", user="customer",
+                                           queries=3, kb=12),
+    "api/inventory/inventories/import/": Endpoint("post", "/api/inventory/inventories/import/", user="staff",
+                                                  data=lambda t: {"file": t.import_file()}, queries=21, kb=1),
+    "api/inventory/inventories/reserve-fefo/": Endpoint(
+        "post", "/api/inventory/inventories/reserve-fefo/", user="staff",
+        data=lambda t: {"variant_id": t.ids["variant"], "qty": 1, "reference": "cart:budget"}, queries=15, kb=1),
+    "api/inventory/inventories/<pk>/": Endpoint("get", "/api/inventory/inventories/{inventory}/", user="customer",
+                                                queries=2, kb=2),
+    "api/inventory/inventories/<pk>/allocate/": Endpoint(
+        "post", "/api/inventory/inventories/{inventory}/allocate/", user="staff", data={"qty": 1, "reference": "order:budget"},
+        queries=20, kb=3),
+    "api/inventory/inventories/<pk>/release/": Endpoint(
+        "post", "/api/inventory/inventories/{inventory}/release/", user="staff", data={"qty": 1, "reference": "cart:budget"},
+        queries=20, kb=3),
+    "api/inventory/inventories/<pk>/reserve/": Endpoint(
+        "post", "/api/inventory/inventories/{inventory}/reserve/", user="staff", data={"qty": 1, "reference": "cart:budget"},
+        queries=21, kb=3),
+    "api/inventory/transactions/": Endpoint("get", "/api/inventory/transactions/", user="customer",
+                                            queries=5, kb=12),
+    "api/inventory/transactions/balance/": Endpoint(
+        "get", "/api/inventory/transactions/balance/?variant={variant}&warehouse={warehouse}", user="customer",
+        queries=3, kb=1),
+    "api/inventory/transactions/<pk>/": Endpoint("get", "/api/inventory/transactions/{transaction}/",
+                                                 user="customer", queries=2, kb=2),
+    "api/inventory/transfers/": Endpoint("get", "/api/inventory/transfers/", user="staff", queries=4, kb=2),
+    "api/inventory/transfers/<pk>/": Endpoint("get", "/api/inventory/transfers/{transfer}/", user="staff",
+                                              queries=3, kb=1),
+    "api/inventory/transfers/<pk>/cancel/": Endpoint("post", "/api/inventory/transfers/{transfer}/cancel/",
+                                                     user="staff", queries=9, kb=1),
+    "api/inventory/transfers/<pk>/receive/": Endpoint("post", "/api/inventory/transfers/{shipped_transfer}/receive/",
+                                                      user="staff", queries=21, kb=1),
+    "api/inventory/transfers/<pk>/ship/": Endpoint("post", "/api/inventory/transfers/{transfer}/ship/",
+                                                   user="staff", queries=20, kb=1),
+}
+
+# documentation, not application endpoints
+UNBUDGETED_PREFIXES = ("api/schema/",)
+
+
+def api_routes(patterns=None, prefix=""):
+    """Normalized routes ("api/catalog/products/<slug>/") of every URL pattern under api/."""
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        route = prefix + re.sub(r"\(\?P<(\w+)>[^)]*\)", r"<\1>", str(pattern.pattern)).replace("^", "").replace("$", "")
+        route = re.sub(r"<\w+:(\w+)>", r"<\1>", route)
+        if isinstance(pattern, URLResolver):
+            yield from api_routes(pattern.url_patterns, route)
+        elif isinstance(pattern, URLPattern) and route.startswith("api/") and "<format>" not in route:
+            if not route.startswith(UNBUDGETED_PREFIXES):
+                yield route
+
+
+class QueryBudgetTests(TestCase):
+    report = []
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user("customer", "customer@example.com", PASSWORD, is_verified=True)
+        cls.staff = User.objects.create_user("staff", "staff@example.com", PASSWORD, is_verified=True, is_staff=True)
+        cls.pending = User.objects.create_user("pending", "pending@example.com", PASSWORD)
+        cls.ids = seed(cls.customer, cls.staff, 0)
+        cls.ids.update(
+            uidb64=urlsafe_base64_encode(smart_bytes(cls.customer.pk)),
+            reset_token=PasswordResetTokenGenerator().make_token(cls.customer),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if cls.report:
+            lines = [f"{'route':<58} {'status':>6} {'queries':>9} {'budget':>6} {'KiB':>11} {'budget':>6}"]
+            for route, status, queries, kib, endpoint in cls.report:
+                lines.append(
+                    f"{route:<58} {status:>6} {'/'.join(map(str, queries)):>9} {endpoint.queries:>6} "
+                    f"{'/'.join(f'{k:.1f}' for k in kib):>11} {endpoint.kb:>6}"
+                )
+            sys.stderr.write("\nQuery budgets (seeded / doubled dataset)\n" + "\n".join(lines) + "\n")
+
+    def refresh_token(self):
+        return CustomTokenObtainPairSerializer.get_token(self.customer)
+
+    def import_file(self):
+        variant = ProductVariant.objects.get(pk=self.ids["variant"])
+        warehouse = Warehouse.objects.get(pk=self.ids["warehouse"])
+        rows = f"sku,warehouse,quantity\n{variant.sku},{warehouse.code},5\n"
+        return SimpleUploadedFile("stock.csv", rows.encode(), content_type="text/csv")
+
+    def client_for(self, user):
+        client = APIClient(raise_request_exception=False)
+        if user is not None:
+            token = CustomTokenObtainPairSerializer.get_token(getattr(self, user)).access_token
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        return client
+
+    def measure(self, route, endpoint):
+        """Run `endpoint` in a rolled-back transaction with cold caches; returns (status, queries, KiB)."""
+        with transaction.atomic():
+            client = self.client_for(endpoint.user)
+            data = endpoint.data(self) if callable(endpoint.data) else endpoint.data
+            path = endpoint.path.format(**self.ids)
+            cache.clear()
+            local_cache.clear()
+            revocation_filter.reset()
+            Site.objects.clear_cache()
+            with CaptureQueriesContext(connection) as queries:
+                fmt = "multipart" if route.endswith("import/") else "json"
+                response = getattr(client, endpoint.method)(path, data, format=fmt)
+            transaction.set_rollback(True)
+        return response, len(queries), len(response.content) / 1024
+
+    def test_every_route_has_a_budget(self):
+        routes = set(api_routes())
+        self.assertEqual(sorted(routes - set(BUDGETS)), [], "routes without a budget")
+        self.assertEqual(sorted(set(BUDGETS) - routes), [], "budgets for routes that no longer exist")
+
+    def test_budgets(self):
+        results = {}
+        for doubled in (False, True):
+            if doubled:
+                seed(self.customer, self.staff, 1)
+            for route, endpoint in BUDGETS.items():
+                response, queries, kib = self.measure(route, endpoint)
+                status, counts, sizes = results.setdefault(route, (response.status_code, [], []))
+                counts.append(queries)
+                sizes.append(kib)
+                with self.subTest(route=route, doubled=doubled):
+                    self.assertEqual(response.status_code, endpoint.status, response.content[:500])
+                    self.assertLessEqual(queries, endpoint.queries, "queries over budget")
+                    self.assertLessEqual(kib, endpoint.kb, "response over budget (KiB)")
+        type(self).report = [(route, status, counts, sizes, BUDGETS[route]) for route, (status, counts, sizes)
+                             in results.items()]
+
+
+def seed(customer, staff, batch):
+    """A small but representative catalog, stock, carts and orders. Returns the ids requests refer to."""
+    n = f"{batch}-"
+    categories = []
+    for i in range(2):
+        root = Category.objects.create(name=f"Root {n}{i}")
+        categories.append(root)
+        for j in range(2):
+            child = Category.objects.create(name=f"Child {n}{i}-{j}", parent=root)
+            categories.append(child)
+            Category.objects.create(name=f"Leaf {n}{i}-{j}", parent=child)
+    brands = [Brand.objects.create(name=f"Brand {n}{i}") for i in range(2)]
+
+    attribute = ProductAttribute.objects.create(name=f"Size {n}")
+    values = [ProductAttributeValue.objects.create(attribute=attribute, value=v) for v in ("S", "M", "L")]
+
+    warehouses = [Warehouse.objects.create(code=f"W{n}{i}", name=f"Warehouse {n}{i}") for i in range(2)]
+    variants, products = [], []
+    for i in range(6):
+        product = Product.objects.create(
+            sku=f"P{n}{i}", name=f"Product {n}{i}", price=Decimal("100.00"), brand=brands[i % 2],
+            description="A product used by the query budget tests.", metadata={"tags": ["budget"]},
+        )
+        product.categories.set(categories[i % len(categories):][:2])
+        products.append(product)
+        for j in range(2):
+            variant = ProductVariant.objects.create(
+                product=product, sku=f"V{n}{i}-{j}", name=f"Variant {j}", price=Decimal("100.00"),
+                attributes={"size": values[j].value}, stock_quantity=10,
+            )
+            variants.append(variant)
+            for warehouse in warehouses:
+                Inventory.objects.create(variant=variant, warehouse=warehouse, on_hand=50, reserved=5)
+        ProductImage.objects.create(product=product, image=f"products/{n}{i}.jpg", is_primary=True)
+
+    for i, variant in enumerate(variants):
+        InventoryTransaction.objects.create(
+            transaction_type="receipt", variant=variant, warehouse=warehouses[i % 2],
+            quantity_delta=50, resulting_on_hand=50, resulting_reserved=0, created_by=staff,
+        )
+
+    snapshot = PriceSnapshot.objects.create(amount=Decimal("100.00"), source="catalog")
+    cart = Cart.objects.create(user=customer)
+    items = [CartItem.objects.create(cart=cart, variant=variant, quantity=1, price_snapshot=snapshot)
+             for variant in variants[:3]]
+
+    address = Address.objects.create(
+        user=customer, address_line1=f"{batch} Budget Street", city="Pune", state="MH", postal_code="411001",
+        is_default=batch == 0,
+    )
+    orders = []
+    for i in range(12):
+        order = Order.objects.create(user=customer, reference=f"BUDGET-{n}{i}", status="pending",
+                                     shipping_address=address)
+        orders.append(order)
+        for variant in variants[:2]:
+            OrderItem.objects.create(order=order, variant=variant, sku=variant.sku, name=variant.name,
+                                     quantity=1, unit_price=variant.price, line_total=variant.price)
+    staff_order = Order.objects.create(user=staff, reference=f"BUDGET-STAFF-{n}", status="pending")
+
+    transfers = []
+    for status in ("draft", "in_transit"):
+        transfer = StockTransfer.objects.create(
+            source=warehouses[0], destination=warehouses[1], status=status, created_by=staff,
+        )
+        StockTransferLine.objects.create(transfer=transfer, variant=variants[0], quantity=1)
+        transfers.append(transfer)
+
+    # what run_outbox_dispatcher does in production (e.g. refreshing variant availability)
+    autodiscover_subscribers()
+    while dispatch_batch(batch_size=1000):
+        pass
+
+    return {
+        "category": categories[0].pk, "brand": brands[0].pk, "product": products[0].slug,
+        "attribute": attribute.pk, "attribute_value": values[0].pk, "variant": variants[0].pk,
+        "image": products[0].images.get().pk, "cart": cart.pk, "cart_item": items[0].pk, "snapshot": snapshot.pk,
+        "order": orders[0].pk, "staff_order": staff_order.pk, "address": address.pk,
+        "warehouse": warehouses[0].pk, "inventory": Inventory.objects.filter(variant=variants[0]).first().pk,
+        "transaction": InventoryTransaction.objects.filter(variant=variants[0]).first().pk,
+        "transfer": transfers[0].pk, "shipped_transfer": transfers[1].pk,
+    }
+
+
+class DatasetTests(TestCase):
+    """generate_dataset at a tiny scale, and a load test run against what it generated."""
+
+    options = {"products": 12, "variants_per_product": 2, "warehouses": 3, "users": 20, "orders": 40,
+               "batch_size": 7}
+
+    def snapshot(self):
+        return (
+            list(Product.objects.order_by("sku").values_list("sku", "name", "price", "discount_price", "brand__name")),
+            list(ProductVariant.objects.order_by("sku").values_list("sku", "price", "stock_quantity")),
+            list(Inventory.objects.order_by("variant__sku", "warehouse__code")
+                 .values_list("variant__sku", "warehouse__code", "on_hand")),
+            list(Order.objects.order_by("reference").values_list("reference", "user__username", "status", "total")),
+            list(CartItem.objects.order_by("cart__user__username", "variant__sku")
+                 .values_list("cart__user__username", "variant__sku", "quantity")),
+        )
+
+    def generate(self, seed):
+        with transaction.atomic():
+            DatasetGenerator(seed=seed, **self.options).run()
+            snapshot = self.snapshot()
+            transaction.set_rollback(True)
+        return snapshot
+
+    def test_same_seed_same_data(self):
+        first = self.generate(seed=3)
+        self.assertEqual(self.generate(seed=3), first)
+        self.assertNotEqual(self.generate(seed=4), first)
+
+    def test_counts_and_derived_fields(self):
+        DatasetGenerator(seed=1, **self.options).run()
+        self.assertTrue(DatasetGenerator.exists())
+        self.assertEqual(Product.objects.count(), 12)
+        self.assertEqual(ProductVariant.objects.count(), 24)
+        self.assertEqual(Order.objects.count(), 40)
+        self.assertEqual(Address.objects.filter(is_default=True).count(), 20)
+        for variant in ProductVariant.objects.prefetch_related("inventory"):
+            self.assertEqual(variant.stock_quantity, sum(i.on_hand for i in variant.inventory.all()))
+        for order in Order.objects.prefetch_related("items"):
+            self.assertEqual(order.subtotal, sum(item.line_total for item in order.items.all()))
+
+    def test_load_test_runs_every_scenario(self):
+        DatasetGenerator(seed=1, **self.options).run()
+        recorder = LoadTest(parse_mix(DEFAULT_MIX), sessions=30, seed=2, sample_size=20).run()
+        self.assertEqual(sum(recorder.scenarios.values()), 30)
+        self.assertEqual(dict(recorder.errors), {})
+        self.assertIn("GET api/catalog/products/<slug>/", recorder.latencies)
+        with self.assertRaises(ValueError):
+            parse_mix("browse=1,teleport=2")
+
+
+@task(name="core.tests.slow")
+def slow(seconds):
+    time.sleep(seconds)
+
+
+class TaskQueueTests(TestCase):
+    def test_stale_claims_are_requeued_unless_heartbeating(self):
+        first, second = noop.delay(), noop.delay()
+        self.assertEqual(len(claim(10)), 2)
+        long_ago = timezone.now() - timedelta(hours=1)
+        Task.objects.update(started_at=long_ago, heartbeat_at=long_ago)
+
+        heartbeat([second.pk])
+
+        self.assertEqual(requeue_stale(), 1)
+        self.assertEqual(Task.objects.get(pk=first.pk).status, "queued")
+        self.assertEqual(Task.objects.get(pk=second.pk).status, "running")
+
+
+class WorkerTests(TransactionTestCase):
+    @override_settings(TASKS_VISIBILITY_TIMEOUT=timedelta(seconds=0.3))
+    def test_heartbeat_and_housekeeping_run_while_busy(self):
+        long_task = slow.delay(1)
+        # claimed just now by a worker that then died: stale while the long task runs
+        orphan = noop.delay()
+        Task.objects.filter(pk=orphan.pk).update(status="running", started_at=timezone.now(),
+                                                 heartbeat_at=timezone.now())
+
+        worker = Worker(concurrency=1, interval=0.05)
+        worker.housekeeping_interval = 0.2
+        self.assertEqual(worker.run(once=True), 2)
+
+        long_task.refresh_from_db()
+        self.assertEqual(long_task.status, "succeeded")
+        self.assertEqual(long_task.attempts, 1)  # never handed out twice
+        self.assertGreater(long_task.heartbeat_at - long_task.started_at, timedelta(seconds=0.5))
+        self.assertEqual(Task.objects.get(pk=orphan.pk).status, "succeeded")
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class MailQueueTests(TestCase):
+    send_messages = "django.core.mail.backends.locmem.EmailBackend.send_messages"
+
+    def setUp(self):
+        breaker.failures, breaker.open_until = 0, 0.0
+        close_connection()
+        self.addCleanup(close_connection)
+
+    def queue_otp(self, **kwargs):
+        return queue_mail("Verify your account.", "ann@example.com", template="accounts/otp_email.html",
+                          context={"user": {"username": "ann"}, "domain": "example.com", "otp": "424242"},
+                          **kwargs)
+
+    def run_queued(self):
+        return [run_task(job) for job in claim(10)]
+
+    def test_worker_renders_the_template_and_blanks_the_context_once_sent(self):
+        with mock.patch("core.mail.render_to_string") as render:
+            email = self.queue_otp()
+        render.assert_not_called()
+        email.refresh_from_db()
+        self.assertEqual((email.context["otp"], email.body), ("424242", ""))
+        self.assertEqual(Task.objects.get().name, "core.mail.send_email")
+
+        self.assertEqual(self.run_queued(), [True])
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("424242", mail.outbox[0].body)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.context, email.body, email.attempts), ("sent", {}, "", 1))
+
+    def test_connection_errors_are_retried_with_backoff_then_scrubbed(self):
+        email = self.queue_otp()
+        with mock.patch(self.send_messages, side_effect=smtplib.SMTPServerDisconnected("gone")):
+            self.assertEqual(self.run_queued(), [False])
+            job = Task.objects.get()
+            self.assertEqual(job.status, "queued")
+            self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=20))
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), ("queued", 1))
+
+            for _ in range(get_max_attempts() - 1):
+                breaker.open_until = 0.0
+                Task.objects.update(run_at=timezone.now())
+                self.assertEqual(self.run_queued(), [False])
+
+        self.assertEqual(Task.objects.get().status, "failed")
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.context, email.body), ("failed", {}, ""))
+        self.assertEqual(email.attempts, get_max_attempts())
+        self.assertIn("SMTPServerDisconnected", email.last_error)
+        self.assertEqual(mail.outbox, [])
+
+    def test_refused_recipients_fail_at_once(self):
+        email = self.queue_otp()
+        refused = smtplib.SMTPRecipientsRefused({"ann@example.com": (550, b"no such user")})
+        with mock.patch(self.send_messages, side_effect=refused):
+            self.assertEqual(self.run_queued(), [True])
+
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.body, email.attempts), ("failed", "", 1))
+
+    def test_open_circuit_postpones_without_using_attempts(self):
+        email = self.queue_otp()
+        breaker.open_until = time.monotonic() + 60
+
+        self.assertEqual(self.run_queued(), [False])
+
+        job = Task.objects.get()
+        self.assertEqual((job.status, job.attempts), ("queued", 0))
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=50))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ("queued", 0))
+        self.assertEqual(mail.outbox, [])
+
+    def test_repeated_connection_failures_open_the_circuit(self):
+        threshold = breaker.threshold
+        breaker.threshold = 2
+        self.addCleanup(setattr, breaker, "threshold", threshold)
+        self.queue_otp()
+        self.queue_otp()
+        with mock.patch(self.send_messages, side_effect=ConnectionRefusedError()):
+            self.run_queued()
+
+        self.assertTrue(breaker.is_open)
+
+    def test_expired_mail_is_not_sent(self):
+        email = self.queue_otp(expires_in=timedelta(minutes=5))
+        OutgoingEmail.objects.filter(pk=email.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.run_queued()
+
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.body), ("failed", ""))
+        self.assertEqual(mail.outbox, [])
+
+
+delivered = []
+
+
+@subscribe("core.tests.event")
+def record_event(event):
+    # the claim is committed before handlers run: no row lock is held on the event
+    def lock_from_another_connection():
+        try:
+            with transaction.atomic():
+                OutboxEvent.objects.select_for_update(nowait=True).filter(pk=event.pk).exists()
+            result.append(True)
+        except Exception:
+            result.append(False)
+        finally:
+            connection.close()
+
+    result = []
+    thread = threading.Thread(target=lock_from_another_connection)
+    thread.start()
+    thread.join()
+    delivered.append((event.payload, result[0]))
+
+
+@subscribe("core.tests.broken")
+def broken_handler(event):
+    raise RuntimeError("downstream is down")
+
+
+class OutboxDispatchTests(TransactionTestCase):
+    def setUp(self):
+        delivered.clear()
+
+    def test_handlers_run_after_the_claim_is_committed(self):
+        event = publish("core.tests.event", {"n": 1})
+
+        self.assertEqual(dispatch_batch(), 1)
+
+        self.assertEqual(delivered, [({"n": 1}, True)])
+        event.refresh_from_db()
+        self.assertIsNotNone(event.processed_at)
+        self.assertEqual(dispatch_batch(), 0)
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2)
+    def test_failing_events_are_retried_with_backoff_then_given_up(self):
+        event = publish("core.tests.broken", {})
+
+        self.assertEqual(dispatch_batch(), 1)
+        event.refresh_from_db()
+        self.assertEqual((event.attempts, event.processed_at), (1, None))
+        self.assertGreater(event.available_at, timezone.now())
+        self.assertIn("downstream is down", event.last_error)
+
+        self.assertEqual(dispatch_batch(now=event.available_at), 1)
+        event.refresh_from_db()
+        self.assertEqual((event.attempts, event.failed), (2, True))
+        self.assertIsNotNone(event.processed_at)
+
+    def test_unfinished_claims_are_redelivered_after_the_lease(self):
+        publish("core.tests.event", {"n": 2})
+        self.assertEqual(len(claim_events(10)), 1)  # a dispatcher that then died
+
+        self.assertEqual(dispatch_batch(), 0)
+        self.assertEqual(dispatch_batch(now=timezone.now() + timedelta(minutes=6)), 1)
+        self.assertEqual([payload for payload, _ in delivered], [{"n": 2}])
+
+
+class CountingView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    calls = []
+
+    @idempotent
+    def post(self, request):
+        self.calls.append(request.data)
+        time.sleep(request.data.get("sleep", 0))
+        return Response({"call": len(self.calls)}, status=201)
+
+
+class IdempotencyTests(TransactionTestCase):
+    def setUp(self):
+        CountingView.calls.clear()
+
+    def post(self, data, key="key-1"):
+        request = APIRequestFactory().post("/idempotent/", data, format="json", HTTP_IDEMPOTENCY_KEY=key)
+        response = CountingView.as_view()(request)
+        response.render()
+        return response
+
+    def test_retries_replay_the_first_response(self):
+        first = self.post({"n": 1})
+        retry = self.post({"n": 1})
+
+        self.assertEqual((first.status_code, first.data), (201, {"call": 1}))
+        self.assertEqual((retry.status_code, retry.data), (201, {"call": 1}))
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(len(CountingView.calls), 1)
+        self.assertEqual(self.post({"n": 1}, key="key-2").data, {"call": 2})
+
+    def test_key_reused_for_a_different_request_is_rejected(self):
+        self.post({"n": 1})
+
+        self.assertEqual(self.post({"n": 2}).status_code, 422)
+        self.assertEqual(len(CountingView.calls), 1)
+
+    @override_settings(IDEMPOTENCY_LOCK_TIMEOUT=timedelta(seconds=0.3), IDEMPOTENCY_WAIT_TIMEOUT=0.2)
+    def test_duplicate_of_a_long_running_request_conflicts(self):
+        original = threading.Thread(target=self.post, args=({"sleep": 1},))
+        original.start()
+        time.sleep(0.6)  # past the lock timeout, but the original keeps heartbeating
+
+        self.assertEqual(self.post({"sleep": 1}).status_code, 409)
+        original.join()
+        self.assertEqual(len(CountingView.calls), 1)
+        self.assertEqual(self.post({"sleep": 1}).data, {"call": 1})
+
+    def test_key_of_a_dead_request_is_taken_over(self):
+        self.post({"n": 1})
+        # as left by a worker that died mid-request
+        IdempotencyKey.objects.update(status="in_flight", heartbeat_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(self.post({"n": 1}).data, {"call": 2})
+        self.assertEqual(IdempotencyKey.objects.get().status, "completed")
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    def assertRendersLikeDRF(self, data):
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_output_matches_drf(self):
+        self.assertRendersLikeDRF({
+            "price": Decimal("12.50"), "at": timezone.now(), "tags": ("a", "\u2028"), "none": None,
+            "floats": [2.5, 0.0001, 1 / 3, -0.0, 1e15], "nested": [{"n": 1, "ok": True}],
+        })
+
+    def test_exponent_floats_match_drf(self):
+        for value in (1e20, 1e16, 1.5e-7, 1e-05, 1e300, 5e-324):
+            with self.subTest(value=value):
+                self.assertRendersLikeDRF({"data": [{"metadata": {"weight": value}}]})
+        self.assertEqual(FastJSONRenderer().render({"a": 1e20}), b'{"a":1e+20}')
+
+    def test_non_finite_floats_are_rejected(self):
+        for value in (float("nan"), float("inf"), float("-inf")):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                FastJSONRenderer().render({"data": {"metadata": [value]}})
+
+
+class SessionlessAPITests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user("staff", "staff@example.com", PASSWORD, is_staff=True,
+                                              is_superuser=True, is_verified=True)
+        admin = Client()
+        response = admin.post("/admin/login/", {"username": "staff", "password": PASSWORD, "next": "/admin/"})
+        self.assertEqual(response.status_code, 302)
+        self.session_cookie = admin.cookies[settings.SESSION_COOKIE_NAME].value
+        cache.clear()
+
+    @override_settings(SESSION_SAVE_EVERY_REQUEST=True)
+    def test_api_requests_do_not_load_or_save_sessions(self):
+        client = APIClient()
+        client.cookies[settings.SESSION_COOKIE_NAME] = self.session_cookie
+        token = CustomTokenObtainPairSerializer.get_token(self.staff).access_token
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        with mock.patch.object(SessionStore, "load", autospec=True, side_effect=SessionStore.load) as load, \
+                CaptureQueriesContext(connection) as queries:
+            # sampled: PerformanceMiddleware reads request.user, which would load the session
+            response = client.get("/api/auth/user/", HTTP_X_DEBUG_PERFORMANCE="1")
+
+        self.assertEqual(response.status_code, 200)
+        load.assert_not_called()
+        self.assertFalse([q for q in queries.captured_queries if "django_session" in q["sql"]])
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertNotIn("Cookie", response.get("Vary", ""))
+
+    def test_admin_still_uses_its_session(self):
+        admin = Client()
+        admin.cookies[settings.SESSION_COOKIE_NAME] = self.session_cookie
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(admin.get("/admin/").status_code, 200)
+        # cached_db: loaded from the database once, then from the cache
+        self.assertEqual(len([q for q in queries.captured_queries if "django_session" in q["sql"]]), 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(admin.get("/admin/").status_code, 200)
+        self.assertFalse([q for q in queries.captured_queries if "django_session" in q["sql"]])
+
+
+@override_settings(PERFORMANCE_SAMPLE_RATE=0)
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+
+    def get(self, user=None):
+        client = APIClient()
+        if user is not None:
+            token = CustomTokenObtainPairSerializer.get_token(user).access_token
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        with mock.patch("core.middleware.RequestStats", wraps=RequestStats) as stats:
+            response = client.get("/api/catalog/products/", HTTP_X_DEBUG_PERFORMANCE="1")
+        self.assertEqual(response.status_code, 200)
+        return stats.called, response
+
+    def test_debug_header_only_samples_staff_requests(self):
+        customer = User.objects.create_user("customer", "customer@example.com", PASSWORD, is_verified=True)
+        staff = User.objects.create_user("staff", "staff@example.com", PASSWORD, is_staff=True, is_verified=True)
+
+        self.assertFalse(self.get()[0])
+        self.assertFalse(self.get(customer)[0])
+        sampled, response = self.get(staff)
+        self.assertTrue(sampled)
+        self.assertIn("Server-Timing", response)
+
+    @override_settings(DEBUG=True)
+    def test_debug_header_samples_anyone_with_debug(self):
+        self.assertTrue(self.get()[0])
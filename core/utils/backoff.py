@@ -0,0 +1,6 @@
+from datetime import timedelta
+
+
+def exponential_backoff(attempts, base, cap=timedelta(hours=1)):
+    """Delay before retrying after the `attempts`-th failure: base, 2 x base, 4 x base, ... at most `cap`."""
+    return min(base * (2 ** max(attempts - 1, 0)), cap)
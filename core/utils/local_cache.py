@@ -0,0 +1,62 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+_MISSING = object()
+
+
+def is_process_local(alias=DEFAULT_CACHE_ALIAS):
+    """
+    True if the `alias` cache is one each process keeps to itself (local
+    memory, dummy): what one worker stores or deletes there, the others never see.
+    """
+    return isinstance(caches[alias], (LocMemCache, DummyCache))
+
+
+class LocalLRUCache:
+    """
+    Small in-process LRU with a per-entry TTL, for values read on every request
+    (in front of the shared cache). Thread-safe; entries are dropped on expiry
+    or when more than `maxsize` are stored. Invalidation only reaches this
+    process, so keep `ttl` short.
+    """
+
+    def __init__(self, maxsize=10000, ttl=5):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,62 @@
+import time
+
+from django.core.cache import cache
+
+
+class RateLimit:
+    """
+    At most `limit` requests per `period` seconds, counted in the shared cache
+    with a sliding window: the current fixed window's count plus the previous
+    window's, weighted by how much of it still overlaps the last `period`.
+
+    Counts only change through cache.add/incr, which are atomic on Redis (and
+    within one process on LocMemCache), so concurrent requests cannot both take
+    the last slot. Refused requests are not counted. Without a shared cache
+    (no REDIS_URL) each process enforces the limit on its own.
+    """
+
+    def __init__(self, prefix, *, limit, period):
+        self.prefix = prefix
+        self.limit = limit
+        self.period = period
+
+    def cache_key(self, key, window):
+        return f"ratelimit:{self.prefix}:{key}:{window}"
+
+    def _add(self, cache_key, tokens):
+        # kept through the next window, where it is the "previous" count
+        if cache.add(cache_key, tokens, int(self.period * 2) + 1):
+            return tokens
+        try:
+            return cache.incr(cache_key, tokens)
+        except ValueError:  # expired between add and incr
+            cache.add(cache_key, tokens, int(self.period * 2) + 1)
+            return tokens
+
+    def consume(self, key, tokens=1):
+        """Count `tokens` requests for `key`. Returns (allowed, seconds until they would be allowed)."""
+        now = time.time()
+        window, offset = divmod(now, self.period)
+        window = int(window)
+        elapsed = offset / self.period
+
+        current_key = self.cache_key(key, window)
+        count = self._add(current_key, tokens)
+        previous = cache.get(self.cache_key(key, window - 1), 0)
+        if previous * (1 - elapsed) + count <= self.limit:
+            return True, 0
+
+        try:
+            cache.decr(current_key, tokens)
+        except ValueError:
+            pass
+        count -= tokens
+        if count + tokens <= self.limit:
+            # wait for enough of the previous window to slide out
+            return False, (1 - (self.limit - count - tokens) / previous - elapsed) * self.period
+        # this window alone is over: wait until it has slid out far enough as the previous one
+        return False, (1 - elapsed + 1 - (self.limit - tokens) / count) * self.period
+
+    def reset(self, key):
+        window = int(time.time() // self.period)
+        cache.delete_many([self.cache_key(key, window), self.cache_key(key, window - 1)])
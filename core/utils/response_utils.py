@@ -5,6 +5,14 @@ import uuid
 import time
 from django.utils.timezone import now
 
+def build_envelope(success, message, special_code, data, errors, meta, status=None):
+    """The response body shared by every endpoint; `status` is included when given."""
+    body = {"success": success}
+    if status is not None:
+        body["status"] = status
+    body.update(message=message, special_code=special_code, data=data, errors=errors, meta=meta)
+    return body
+
 def api_response(
         success=True, 
         message=None, 
@@ -17,22 +25,13 @@ def api_response(
     """Standardized API response structure.
     meta: dict -> request_id, timestamp, pagination
     """
-    if meta is None:
-        meta = {}
-    if 'request_id' not in meta:
-        meta['request_id'] = str(uuid.uuid4())
-    if 'timestamp' not in meta:
-        meta['timestamp'] = now().isoformat()
-
+    meta = dict(meta or {})
+    meta.setdefault('request_id', str(uuid.uuid4()))
+    meta.setdefault('timestamp', now().isoformat())
 
-    return Response({
-        "success": success,
-        "message": message or ("OK" if success else "Error"),
-        "special_code": special_code,
-        "data": data,
-        "errors": errors,
-        "meta": meta,
-    }, status=status)
+    return Response(build_envelope(
+        success, message or ("OK" if success else "Error"), special_code, data, errors, meta,
+    ), status=status)
 
 def error_response(
         message="An error occurred", 
@@ -0,0 +1,14 @@
+"""
+Entry point for `runworker --pool process` children. Kept free of model imports:
+spawned interpreters import this module before Django is set up.
+"""
+
+
+def init_worker_process():
+    import django
+
+    django.setup()
+
+    from core.tasks import autodiscover
+
+    autodiscover()
@@ -1,6 +1,17 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
-from .models import Warehouse, Inventory, InventoryTransaction
+from .models import (
+    Warehouse, WarehouseRegion, Inventory, InventoryTransaction, ReservationHold, InventoryCheckpoint, VariantAvailability,
+    StockTransfer, StockTransferLine,
+)
+
+
+class WarehouseRegionInline(admin.TabularInline):
+    model = WarehouseRegion
+    extra = 0
 
 
 @admin.register(Warehouse)
@@ -9,6 +20,7 @@ class WarehouseAdmin(admin.ModelAdmin):
     search_fields = ("code", "name", "address")
     list_filter = ("is_active", "timezone")
     readonly_fields = ("created_at", "updated_at", "deleted_at")
+    inlines = [WarehouseRegionInline]
 
 
 @admin.register(Inventory)
@@ -34,8 +46,30 @@ class InventoryAdmin(admin.ModelAdmin):
     )
 
 
+class LedgerPaginator(Paginator):
+    """Use the planner's row estimate for the unfiltered ledger on PostgreSQL instead of COUNT(*)."""
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, "query", None)
+        if connection.vendor == "postgresql" and query is not None and not query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT SUM(c.reltuples)::bigint FROM pg_class c "
+                    "WHERE c.oid = %s::regclass OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)",
+                    [query.model._meta.db_table] * 2,
+                )
+                estimate = cursor.fetchone()[0]
+            if estimate and estimate > 0:
+                return estimate
+        return super().count
+
+
 @admin.register(InventoryTransaction)
 class InventoryTransactionAdmin(admin.ModelAdmin):
+    paginator = LedgerPaginator
+    show_full_result_count = False
+    list_select_related = ("variant", "warehouse", "created_by")
     list_display = ("id", "transaction_type", "variant", "warehouse", "quantity_delta", "created_at", "created_by")
     search_fields = ("variant__sku", "variant__name", "reference", "source_document")
     list_filter = ("transaction_type", "warehouse", "created_at")
@@ -46,3 +80,61 @@ class InventoryTransactionAdmin(admin.ModelAdmin):
                        "reference", "source_document", "notes", "metadata",
                        "created_by", "created_at", "updated_at")
     # We make transaction admin mostly read-only; creation via code recommended.
+
+
+@admin.register(ReservationHold)
+class ReservationHoldAdmin(admin.ModelAdmin):
+    list_display = ("id", "variant", "warehouse", "quantity", "owner", "expires_at")
+    search_fields = ("variant__sku", "owner")
+    list_filter = ("warehouse",)
+    readonly_fields = ("inventory", "variant", "warehouse", "quantity", "owner", "created_at", "updated_at")
+
+
+@admin.register(InventoryCheckpoint)
+class InventoryCheckpointAdmin(admin.ModelAdmin):
+    list_display = ("id", "variant", "warehouse", "as_of", "on_hand", "reserved", "allocated")
+    search_fields = ("variant__sku",)
+    list_filter = ("warehouse",)
+    readonly_fields = ("variant", "warehouse", "as_of", "on_hand", "reserved", "allocated",
+                       "last_transaction_id", "created_at")
+
+
+@admin.register(VariantAvailability)
+class VariantAvailabilityAdmin(admin.ModelAdmin):
+    list_display = ("variant", "ats", "on_hand", "reserved", "allocated", "updated_at")
+    search_fields = ("variant__sku",)
+    readonly_fields = ("variant", "ats", "on_hand", "reserved", "allocated", "updated_at")
+
+
+class StockTransferLineInline(admin.TabularInline):
+    model = StockTransferLine
+    extra = 0
+    readonly_fields = ("quantity_received",)
+
+
+@admin.register(StockTransfer)
+class StockTransferAdmin(admin.ModelAdmin):
+    list_display = ("reference", "source", "destination", "status", "shipped_at", "received_at", "created_at")
+    search_fields = ("reference", "notes")
+    list_filter = ("status", "source", "destination")
+    readonly_fields = ("reference", "status", "shipped_at", "received_at", "created_by", "created_at", "updated_at")
+    inlines = [StockTransferLineInline]
+    actions = ["ship_transfers", "receive_transfers"]
+
+    def _run(self, request, queryset, method, verb):
+        done = 0
+        for transfer in queryset:
+            try:
+                getattr(transfer, method)(user=request.user)
+                done += 1
+            except ValueError as exc:
+                self.message_user(request, str(exc), level="error")
+        self.message_user(request, f"{verb} {done} transfer(s).")
+
+    @admin.action(description="Ship selected transfers")
+    def ship_transfers(self, request, queryset):
+        self._run(request, queryset, "ship", "Shipped")
+
+    @admin.action(description="Receive selected transfers")
+    def receive_transfers(self, request, queryset):
+        self._run(request, queryset, "receive", "Received")
@@ -0,0 +1,102 @@
+"""
+Per-variant available-to-sell (ATS) aggregate.
+
+ATS = sum over sellable rows (Inventory.objects.sellable(): AVAILABLE or
+EXPIRING_SOON, not past their expiration date) of
+max(0, on_hand - reserved - allocated - safety_stock): the rows orders
+allocate from. It is recomputed for the touched variants after every inventory
+mutation (inside bulk stock operations, and by the inventory.updated/deleted
+outbox subscribers for single-row saves), stored in VariantAvailability (and
+mirrored to ProductVariant.stock_quantity) and served from the cache with a
+short TTL.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Greatest
+
+from catalog.models import ProductVariant
+from .models import Inventory, VariantAvailability
+
+CACHE_PREFIX = "ats:"
+FIELDS = ("ats", "on_hand", "reserved", "allocated")
+
+
+def cache_key(variant_id):
+    return f"{CACHE_PREFIX}{variant_id}"
+
+
+def get_cache_ttl():
+    return getattr(settings, "INVENTORY_ATS_CACHE_TTL", 30)
+
+
+def compute(variant_ids):
+    """Aggregate ATS for `variant_ids` straight from Inventory in one query."""
+    rows = (
+        Inventory.objects.sellable().filter(variant_id__in=variant_ids)
+        .values("variant_id")
+        .annotate(
+            ats=Sum(Greatest(F("on_hand") - F("reserved") - F("allocated") - F("safety_stock"), Value(0))),
+            on_hand_total=Sum("on_hand"),
+            reserved_total=Sum("reserved"),
+            allocated_total=Sum("allocated"),
+        )
+        .order_by()
+    )
+    result = {variant_id: dict.fromkeys(FIELDS, 0) for variant_id in variant_ids}
+    for row in rows:
+        result[row["variant_id"]] = {
+            "ats": row["ats"] or 0,
+            "on_hand": row["on_hand_total"] or 0,
+            "reserved": row["reserved_total"] or 0,
+            "allocated": row["allocated_total"] or 0,
+        }
+    return result
+
+
+def refresh_availability(variant_ids):
+    """
+    Recompute and store ATS for the given variants. Call inside the transaction
+    that changed their inventory; cached values are dropped once it commits.
+    """
+    variant_ids = sorted(set(variant_ids))
+    if not variant_ids:
+        return {}
+
+    values = compute(variant_ids)
+    VariantAvailability.objects.bulk_create(
+        [VariantAvailability(variant_id=variant_id, **data) for variant_id, data in values.items()],
+        update_conflicts=True,
+        unique_fields=["variant"],
+        update_fields=[*FIELDS, "updated_at"],
+    )
+    ProductVariant.all_objects.filter(pk__in=variant_ids).update(stock_quantity=Case(
+        *[When(pk=variant_id, then=Value(data["ats"])) for variant_id, data in values.items()],
+        output_field=IntegerField(),
+    ))
+
+    keys = [cache_key(variant_id) for variant_id in variant_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+    return values
+
+
+def get_availability(variant_ids):
+    """ATS for many variants: cache first, then the aggregate table, then a live aggregate."""
+    variant_ids = list(dict.fromkeys(variant_ids))
+    cached = cache.get_many([cache_key(variant_id) for variant_id in variant_ids])
+    result = {variant_id: cached[cache_key(variant_id)] for variant_id in variant_ids if cache_key(variant_id) in cached}
+
+    missing = [variant_id for variant_id in variant_ids if variant_id not in result]
+    if missing:
+        fresh = {
+            row["variant_id"]: {field: row[field] for field in FIELDS}
+            for row in VariantAvailability.objects.filter(variant_id__in=missing).values("variant_id", *FIELDS)
+        }
+        never_computed = [variant_id for variant_id in missing if variant_id not in fresh]
+        if never_computed:
+            fresh.update(compute(never_computed))
+        cache.set_many({cache_key(variant_id): data for variant_id, data in fresh.items()}, get_cache_ttl())
+        result.update(fresh)
+
+    return result
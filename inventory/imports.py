@@ -0,0 +1,317 @@
+"""
+Bulk stock imports (goods receipts and cycle counts) from CSV.
+
+Lines are processed in chunks, one database transaction per chunk:
+  1. the chunk's (line, sku, warehouse code) keys are staged into a temporary
+     table (COPY on PostgreSQL, executemany elsewhere) and resolved to variant
+     and warehouse ids with a single join;
+  2. the affected Inventory rows are created if missing and locked in pk order;
+  3. each line is checked against the locked counters (a line may not take
+     on_hand below the reserved + allocated stock already committed), the net
+     delta per row is staged the same way and applied with one UPDATE joined
+     to it, and the matching ledger rows are bulk-inserted.
+
+Each line is applied completely or rejected; rejected lines never abort the
+rest of the chunk and are reported with their line number and reason.
+"""
+import csv
+import io
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from catalog.models import ProductVariant
+from .availability import refresh_availability
+from .models import Inventory, InventoryTransaction, Warehouse
+
+# receipt: quantity is added to on_hand
+# adjustment: quantity is a signed correction to on_hand
+# count: quantity is the counted on_hand (written as an adjustment)
+IMPORT_TYPES = ("receipt", "adjustment", "count")
+
+REQUIRED_COLUMNS = ("sku", "warehouse", "quantity")
+ERROR_COLUMNS = ("line", "sku", "warehouse", "quantity", "error")
+
+STAGE_TABLE = "inventory_import_stage"
+DELTA_TABLE = "inventory_import_delta"
+
+
+@dataclass
+class ImportLine:
+    line_no: int
+    sku: str
+    warehouse: str
+    quantity: int
+    cost_price: Decimal = None
+    currency: str = None
+    reference: str = None
+    notes: str = None
+
+
+@dataclass
+class ImportResult:
+    lines: int = 0
+    applied: int = 0
+    rejected: int = 0
+    chunks: int = 0
+    elapsed: float = 0.0
+    errors: list = field(default_factory=list)
+
+    @property
+    def lines_per_second(self):
+        return self.lines / self.elapsed if self.elapsed else 0.0
+
+
+class StockImporter:
+    def __init__(self, transaction_type, *, chunk_size=5000, user=None, reference=None, source_document=None):
+        if transaction_type not in IMPORT_TYPES:
+            raise ValueError(f"Unknown import type: {transaction_type}")
+        self.transaction_type = transaction_type
+        self.chunk_size = chunk_size
+        self.user = user
+        self.reference = reference
+        self.source_document = source_document
+
+    def run(self, csv_file):
+        """Import an open text-mode CSV file. Returns an ImportResult."""
+        result = ImportResult()
+        started = time.perf_counter()
+
+        reader = csv.DictReader(csv_file)
+        missing = [col for col in REQUIRED_COLUMNS if col not in (reader.fieldnames or ())]
+        if missing:
+            raise ValueError(f"Missing column(s): {', '.join(missing)}")
+
+        chunk = []
+        for row in reader:
+            result.lines += 1
+            line = self._parse(reader.line_num, row, result)
+            if line is not None:
+                chunk.append(line)
+            if len(chunk) >= self.chunk_size:
+                self._apply_chunk(chunk, result)
+                chunk = []
+        if chunk:
+            self._apply_chunk(chunk, result)
+
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    def _parse(self, line_no, row, result):
+        sku = (row.get("sku") or "").strip()
+        warehouse = (row.get("warehouse") or "").strip()
+        raw_qty = (row.get("quantity") or "").strip()
+
+        def reject(message):
+            result.rejected += 1
+            result.errors.append((line_no, sku, warehouse, raw_qty, message))
+
+        if not sku or not warehouse:
+            return reject("sku and warehouse are required")
+        try:
+            quantity = int(raw_qty)
+        except ValueError:
+            return reject("quantity must be an integer")
+        if self.transaction_type == "receipt" and quantity <= 0:
+            return reject("receipt quantity must be positive")
+        if self.transaction_type == "count" and quantity < 0:
+            return reject("counted quantity cannot be negative")
+
+        cost_price = None
+        if (row.get("cost_price") or "").strip():
+            try:
+                cost_price = Decimal(row["cost_price"].strip())
+            except InvalidOperation:
+                return reject("cost_price must be a decimal")
+
+        return ImportLine(
+            line_no=line_no, sku=sku, warehouse=warehouse, quantity=quantity, cost_price=cost_price,
+            currency=(row.get("currency") or "").strip() or None,
+            reference=(row.get("reference") or "").strip() or self.reference,
+            notes=(row.get("notes") or "").strip()[:255] or None,
+        )
+
+    def _apply_chunk(self, lines, result):
+        with transaction.atomic():
+            resolved = self._resolve(lines)
+
+            pairs = {}
+            for line in lines:
+                ids = resolved.get(line.line_no)
+                error = None
+                if ids is None or ids[0] is None:
+                    error = f"unknown sku {line.sku}"
+                elif ids[0] == "ambiguous":
+                    error = f"sku {line.sku} matches more than one variant"
+                elif ids[1] is None:
+                    error = f"unknown warehouse {line.warehouse}"
+                if error:
+                    result.rejected += 1
+                    result.errors.append((line.line_no, line.sku, line.warehouse, line.quantity, error))
+                    continue
+                pairs.setdefault(ids, []).append(line)
+
+            inventories = self._lock_inventories(pairs)
+            now = timezone.now()
+            deltas, txns = {}, []
+            for pair, pair_lines in pairs.items():
+                inv = inventories[pair]
+                committed = inv.reserved + inv.allocated
+                on_hand = inv.on_hand
+                for line in pair_lines:
+                    delta = line.quantity - on_hand if self.transaction_type == "count" else line.quantity
+                    if on_hand + delta < committed:
+                        result.rejected += 1
+                        result.errors.append((
+                            line.line_no, line.sku, line.warehouse, line.quantity,
+                            f"would leave on_hand at {on_hand + delta}, below the {committed} committed",
+                        ))
+                        continue
+                    on_hand += delta
+                    deltas[inv.pk] = deltas.get(inv.pk, 0) + delta
+                    txns.append(self._ledger_row(inv, line, delta, on_hand, now))
+                    result.applied += 1
+
+            _apply_deltas(deltas, now)
+            InventoryTransaction.objects.bulk_create(txns, batch_size=1000)
+            refresh_availability({inv.variant_id for inv in inventories.values() if inv.pk in deltas})
+        result.chunks += 1
+
+    def _ledger_row(self, inv, line, delta, on_hand, now):
+        txn = InventoryTransaction(
+            transaction_type="receipt" if self.transaction_type == "receipt" else "adjustment",
+            variant_id=inv.variant_id,
+            warehouse_id=inv.warehouse_id,
+            quantity_delta=delta,
+            resulting_on_hand=on_hand,
+            resulting_reserved=inv.reserved,
+            resulting_allocated=inv.allocated,
+            cost_price=line.cost_price,
+            reference=line.reference,
+            source_document=self.source_document,
+            notes=line.notes,
+            metadata={"import_line": line.line_no, "import_type": self.transaction_type},
+            created_by=self.user,
+            created_at=now,
+        )
+        if line.currency:
+            txn.currency = line.currency
+        return txn
+
+    def _resolve(self, lines):
+        """Map line_no -> (variant_id, warehouse_id) through the staging table."""
+        variant_table = ProductVariant._meta.db_table
+        warehouse_table = Warehouse._meta.db_table
+        with connection.cursor() as cursor:
+            _create_stage(
+                cursor, STAGE_TABLE,
+                "line_no integer NOT NULL, sku varchar(64) NOT NULL, warehouse_code varchar(32) NOT NULL",
+            )
+            try:
+                _load_stage(
+                    cursor, STAGE_TABLE, ("line_no", "sku", "warehouse_code"),
+                    [(line.line_no, line.sku, line.warehouse) for line in lines],
+                )
+                cursor.execute(
+                    f"SELECT s.line_no, v.id, w.id FROM {STAGE_TABLE} s "
+                    f"LEFT JOIN {variant_table} v ON v.sku = s.sku AND v.deleted_at IS NULL "
+                    f"LEFT JOIN {warehouse_table} w ON w.code = s.warehouse_code AND w.deleted_at IS NULL"
+                )
+                rows = cursor.fetchall()
+            finally:
+                _drop_stage(cursor, STAGE_TABLE)
+
+        resolved = {}
+        for line_no, variant_id, warehouse_id in rows:
+            previous = resolved.get(line_no)
+            if previous is not None and previous[0] != variant_id:
+                variant_id = "ambiguous"
+            resolved[line_no] = (variant_id, warehouse_id)
+        return resolved
+
+    def _lock_inventories(self, pairs):
+        """Create missing Inventory rows, then lock every row the chunk touches in pk order."""
+        if not pairs:
+            return {}
+        Inventory.objects.bulk_create(
+            [Inventory(variant_id=variant_id, warehouse_id=warehouse_id) for variant_id, warehouse_id in pairs],
+            ignore_conflicts=True,
+            batch_size=1000,
+        )
+        variant_ids = {variant_id for variant_id, _ in pairs}
+        warehouse_ids = {warehouse_id for _, warehouse_id in pairs}
+        candidates = (
+            Inventory.objects.filter(variant_id__in=variant_ids, warehouse_id__in=warehouse_ids)
+            .order_by("pk").values_list("pk", "variant_id", "warehouse_id")
+        )
+        pks = [pk for pk, variant_id, warehouse_id in candidates if (variant_id, warehouse_id) in pairs]
+        return {
+            (inv.variant_id, inv.warehouse_id): inv
+            for inv in Inventory.objects.select_for_update().filter(pk__in=pks).order_by("pk")
+        }
+
+
+def _apply_deltas(deltas, now):
+    """Add the staged net delta to each Inventory row's on_hand with a single UPDATE."""
+    if not deltas:
+        return
+    table = Inventory._meta.db_table
+    with connection.cursor() as cursor:
+        _create_stage(cursor, DELTA_TABLE, "inventory_id bigint NOT NULL, delta bigint NOT NULL")
+        try:
+            _load_stage(cursor, DELTA_TABLE, ("inventory_id", "delta"), list(deltas.items()))
+            if connection.vendor == "mysql":
+                cursor.execute(
+                    f"UPDATE {table} i JOIN {DELTA_TABLE} d ON d.inventory_id = i.id "
+                    f"SET i.on_hand = i.on_hand + d.delta, i.updated_at = %s",
+                    [now],
+                )
+            elif connection.vendor == "sqlite" and connection.Database.sqlite_version_info < (3, 33):
+                # UPDATE ... FROM arrived in SQLite 3.33
+                cursor.execute(
+                    f"UPDATE {table} SET updated_at = %s, on_hand = on_hand + "
+                    f"(SELECT d.delta FROM {DELTA_TABLE} d WHERE d.inventory_id = {table}.id) "
+                    f"WHERE id IN (SELECT inventory_id FROM {DELTA_TABLE})",
+                    [now],
+                )
+            else:
+                cursor.execute(
+                    f"UPDATE {table} SET on_hand = {table}.on_hand + d.delta, updated_at = %s "
+                    f"FROM {DELTA_TABLE} d WHERE {table}.id = d.inventory_id",
+                    [now],
+                )
+        finally:
+            _drop_stage(cursor, DELTA_TABLE)
+
+
+def _create_stage(cursor, table, columns):
+    temporary = "TEMP" if connection.vendor == "sqlite" else "TEMPORARY"
+    cursor.execute(f"CREATE {temporary} TABLE {table} ({columns})")
+
+
+def _drop_stage(cursor, table):
+    # DROP TEMPORARY TABLE does not commit implicitly on MySQL, plain DROP TABLE does
+    temporary = "TEMPORARY " if connection.vendor == "mysql" else ""
+    cursor.execute(f"DROP {temporary}TABLE IF EXISTS {table}")
+
+
+def _load_stage(cursor, table, columns, rows):
+    column_list = ", ".join(columns)
+    if connection.vendor == "postgresql":
+        raw = cursor.cursor
+        copy_sql = f"COPY {table} ({column_list}) FROM STDIN"
+        if hasattr(raw, "copy"):  # psycopg 3
+            with raw.copy(copy_sql) as copy:
+                for row in rows:
+                    copy.write_row(row)
+            return
+        buffer = io.StringIO()  # psycopg2
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        raw.copy_expert(f"{copy_sql} WITH (FORMAT csv)", buffer)
+        return
+    placeholders = ", ".join(["%s"] * len(columns))
+    cursor.executemany(f"INSERT INTO {table} ({column_list}) VALUES ({placeholders})", rows)
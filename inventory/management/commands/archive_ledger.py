@@ -0,0 +1,78 @@
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from inventory import partitioning
+from inventory.models import InventoryCheckpoint, InventoryTransaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Move closed months of the inventory ledger to gzipped JSONL files. "
+        "A checkpoint is written at each month end before its rows are removed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--before", required=True, help="First month to keep, YYYY-MM. Earlier months are archived.")
+        parser.add_argument("--output-dir", default=None, help="Defaults to settings.LEDGER_ARCHIVE_DIR.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        try:
+            cutoff = datetime.strptime(options["before"], "%Y-%m").replace(tzinfo=dt_timezone.utc)
+        except ValueError:
+            raise CommandError("--before must look like YYYY-MM")
+        if cutoff > partitioning.month_start(datetime.now(dt_timezone.utc)):
+            raise CommandError("Only closed months can be archived.")
+
+        output_dir = options["output_dir"] or settings.LEDGER_ARCHIVE_DIR
+        os.makedirs(output_dir, exist_ok=True)
+        batch_size = options["batch_size"]
+
+        oldest = InventoryTransaction.objects.filter(created_at__lt=cutoff).order_by("created_at").values_list("created_at", flat=True).first()
+        if oldest is None:
+            self.stdout.write("Nothing to archive.")
+            return
+
+        month = partitioning.month_start(oldest)
+        while month < cutoff:
+            end = partitioning.next_month(month)
+            self.archive_month(month, end, output_dir, batch_size)
+            month = end
+
+    def archive_month(self, start, end, output_dir, batch_size):
+        started = time.perf_counter()
+        rows = InventoryTransaction.objects.filter(created_at__gte=start, created_at__lt=end)
+
+        # balances at month end must survive the rows they are derived from
+        InventoryCheckpoint.create_for(end, batch_size=batch_size)
+
+        path = os.path.join(output_dir, f"inventory_ledger_{start:%Y_%m}.jsonl.gz")
+        tmp_path = f"{path}.part"
+        count = 0
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as fh:
+            for row in rows.order_by("id").values().iterator(chunk_size=batch_size):
+                fh.write(json.dumps(row, cls=DjangoJSONEncoder))
+                fh.write("\n")
+                count += 1
+        os.replace(tmp_path, path)
+
+        # the month's partition goes in one statement; whatever is left (no partitioning,
+        # or rows that landed in the default partition) is deleted in batches
+        partitioning.drop_partition(start)
+        while True:
+            with transaction.atomic():
+                ids = list(rows.order_by("id").values_list("id", flat=True)[:batch_size])
+                if not ids:
+                    break
+                InventoryTransaction.objects.filter(id__in=ids).delete()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"{start:%Y-%m}: archived {count} row(s) to {path} in {elapsed:.1f}s")
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from inventory.models import InventoryCheckpoint
+
+
+class Command(BaseCommand):
+    help = "Write ledger checkpoints for every (variant, warehouse) so as-of stock queries stay bounded."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--as-of", default=None, help="ISO datetime, defaults to now.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        as_of = parse_datetime(options["as_of"]) if options["as_of"] else None
+        if as_of and timezone.is_naive(as_of):
+            as_of = timezone.make_aware(as_of)
+        written = InventoryCheckpoint.create_for(as_of, batch_size=options["batch_size"])
+        self.stdout.write(f"Wrote {written} checkpoint(s).")
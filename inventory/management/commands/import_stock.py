@@ -0,0 +1,42 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.imports import ERROR_COLUMNS, IMPORT_TYPES, StockImporter
+
+
+class Command(BaseCommand):
+    help = "Import stock receipts, adjustments or cycle counts from a CSV file (sku,warehouse,quantity[,cost_price,...])."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file with a header row.")
+        parser.add_argument("--type", dest="transaction_type", choices=IMPORT_TYPES, default="receipt")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Lines applied per transaction.")
+        parser.add_argument("--errors", default=None, help="CSV file for rejected lines (default: <path>.errors.csv).")
+        parser.add_argument("--reference", default=None, help="Reference for lines that do not carry their own.")
+
+    def handle(self, *args, **options):
+        importer = StockImporter(
+            options["transaction_type"],
+            chunk_size=options["chunk_size"],
+            reference=options["reference"],
+            source_document=options["path"],
+        )
+        try:
+            with open(options["path"], newline="", encoding="utf-8-sig") as csv_file:
+                result = importer.run(csv_file)
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        if result.errors:
+            errors_path = options["errors"] or f"{options['path']}.errors.csv"
+            with open(errors_path, "w", newline="") as out:
+                writer = csv.writer(out)
+                writer.writerow(ERROR_COLUMNS)
+                writer.writerows(sorted(result.errors))
+            self.stderr.write(f"{result.rejected} line(s) rejected, see {errors_path}")
+
+        self.stdout.write(
+            f"Imported {result.applied}/{result.lines} line(s) in {result.chunks} chunk(s), "
+            f"{result.elapsed:.1f}s ({result.lines_per_second:.0f} lines/s)."
+        )
@@ -0,0 +1,29 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+
+from inventory import partitioning
+
+
+class Command(BaseCommand):
+    help = (
+        "Convert the inventory ledger to monthly range partitions (PostgreSQL only) "
+        "and create partitions for upcoming months. Run monthly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months-ahead", type=int, default=3)
+
+    def handle(self, *args, **options):
+        if not partitioning.supports_partitioning():
+            self.stdout.write("Database does not support declarative partitioning; ledger stays a plain table.")
+            return
+
+        if partitioning.convert_to_partitioned():
+            self.stdout.write("Converted ledger to a partitioned table.")
+
+        until = datetime.now(dt_timezone.utc)
+        for _ in range(options["months_ahead"]):
+            until = partitioning.next_month(until)
+        partitioning.ensure_partitions(until)
+        self.stdout.write(f"Partitions ensured through {until:%Y-%m}.")
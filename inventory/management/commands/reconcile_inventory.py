@@ -0,0 +1,35 @@
+import csv
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventory.reconciliation import REPORT_COLUMNS, reconcile
+
+
+class Command(BaseCommand):
+    help = "Check Inventory counters against the ledger and report (optionally fix) discrepancies."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=50000, help="Inventory rows compared per chunk.")
+        parser.add_argument("--report", default=None, help="CSV file for discrepancies (default: stdout).")
+        parser.add_argument("--fix", action="store_true", help="Write corrective adjustment transactions.")
+
+    def handle(self, *args, **options):
+        out = open(options["report"], "w", newline="") if options["report"] else sys.stdout
+        writer = csv.writer(out)
+        writer.writerow(REPORT_COLUMNS)
+
+        started = time.perf_counter()
+        try:
+            result = reconcile(chunk_size=options["chunk_size"], fix=options["fix"], on_discrepancy=writer.writerow)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        elapsed = time.perf_counter() - started
+
+        self.stderr.write(
+            f"Checked {result.checked} inventory row(s) in {elapsed:.1f}s: "
+            f"{result.discrepancies} discrepancy(ies), {result.orphans} ledger pair(s) without inventory, "
+            f"{result.adjustments} adjustment(s) written."
+        )
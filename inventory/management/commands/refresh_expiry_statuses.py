@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from inventory.models import Inventory
+
+
+class Command(BaseCommand):
+    help = "Flag lots as EXPIRING_SOON / EXPIRED from their expiration_date. Intended to run nightly."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--warning-days", type=int, default=None,
+                            help="Defaults to settings.INVENTORY_EXPIRY_WARNING_DAYS.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        counts = Inventory.refresh_expiry_statuses(
+            warning_days=options["warning_days"],
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(
+            f"Marked {counts['expired']} row(s) EXPIRED and {counts['expiring_soon']} row(s) EXPIRING_SOON."
+        )
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventory.models import ReservationHold
+
+
+class Command(BaseCommand):
+    help = "Release reserved stock for expired reservation holds (abandoned carts, unpaid orders)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--loop", action="store_true", help="Keep running as a worker instead of exiting when drained.")
+        parser.add_argument("--interval", type=float, default=30.0, help="Seconds to sleep between sweeps when idle (with --loop).")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        while True:
+            total = 0
+            while True:
+                released = ReservationHold.release_expired(batch_size=batch_size)
+                total += released
+                if released < batch_size:
+                    break
+
+            if total:
+                self.stdout.write(f"Released {total} expired reservation hold(s).")
+
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:59
+
+import django.db.models.deletion
+import django.db.models.manager
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Warehouse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('code', models.CharField(max_length=32, unique=True)),
+                ('name', models.CharField(max_length=255)),
+                ('address', models.TextField(blank=True)),
+                ('location_code', models.CharField(blank=True, max_length=64)),
+                ('contact_person', models.CharField(blank=True, max_length=128)),
+                ('timezone', models.CharField(default='UTC', max_length=64)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Inventory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('on_hand', models.BigIntegerField(default=0)),
+                ('reserved', models.BigIntegerField(default=0)),
+                ('allocated', models.BigIntegerField(default=0)),
+                ('incoming', models.BigIntegerField(default=0)),
+                ('safety_stock', models.BigIntegerField(default=0)),
+                ('lot', models.CharField(blank=True, max_length=128, null=True)),
+                ('batch_number', models.CharField(blank=True, max_length=64, null=True)),
+                ('manufactured_date', models.DateField(blank=True, null=True)),
+                ('expiration_date', models.DateField(blank=True, null=True)),
+                ('uom', models.CharField(default='pcs', max_length=20)),
+                ('status', models.CharField(choices=[('AVAILABLE', 'Available'), ('ON_HOLD', 'On Hold'), ('DAMAGED', 'Damaged'), ('EXPIRING_SOON', 'Expiring Soon'), ('EXPIRED', 'Expired'), ('QUARANTINE', 'Quarantine'), ('RETURNED', 'Returned')], default='AVAILABLE', max_length=20)),
+                ('metadata', models.JSONField(blank=True, default=dict)),
+                ('variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory', to='catalog.productvariant')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='InventoryTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('transaction_type', models.CharField(choices=[('receipt', 'Receipt'), ('sale', 'Sale'), ('adjustment', 'Adjustment'), ('allocation', 'Allocation'), ('unallocation', 'Unallocation'), ('reservation', 'Reservation'), ('release', 'Release'), ('transfer_in', 'Transfer In'), ('transfer_out', 'Transfer Out'), ('return', 'Return')], max_length=32)),
+                ('quantity_delta', models.BigIntegerField()),
+                ('resulting_on_hand', models.BigIntegerField()),
+                ('resulting_reserved', models.BigIntegerField()),
+                ('resulting_allocated', models.BigIntegerField(default=0)),
+                ('cost_price', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('currency', models.CharField(default='USD', max_length=8)),
+                ('reference', models.CharField(blank=True, max_length=255, null=True)),
+                ('source_document', models.CharField(blank=True, max_length=100, null=True)),
+                ('notes', models.CharField(blank=True, max_length=255, null=True)),
+                ('metadata', models.JSONField(blank=True, default=dict)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+        ('inventory', '0001_initial'),
+        ('orders', '0001_initial'),
+        ('returns', '__first__'),
+        ('shipping', '__first__'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventorytransaction',
+            name='order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='orders.order'),
+        ),
+        migrations.AddField(
+            model_name='inventorytransaction',
+            name='return_record',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='returns.returnrequest'),
+        ),
+        migrations.AddField(
+            model_name='inventorytransaction',
+            name='shipment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='shipping.shipment'),
+        ),
+        migrations.AddField(
+            model_name='inventorytransaction',
+            name='variant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='catalog.productvariant'),
+        ),
+        migrations.AddField(
+            model_name='inventorytransaction',
+            name='warehouse',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='inventory.warehouse'),
+        ),
+        migrations.AddField(
+            model_name='inventory',
+            name='warehouse',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='inventories', to='inventory.warehouse'),
+        ),
+        migrations.AddIndex(
+            model_name='inventorytransaction',
+            index=models.Index(fields=['variant', 'warehouse', 'created_at'], name='inventory_i_variant_0ff8e1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventorytransaction',
+            index=models.Index(fields=['transaction_type'], name='inventory_i_transac_2eccee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventory',
+            index=models.Index(fields=['variant', 'warehouse'], name='inventory_i_variant_d9b855_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventory',
+            index=models.Index(fields=['status'], name='inventory_i_status_2e2af1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventory',
+            index=models.Index(fields=['lot'], name='inventory_i_lot_93b4ce_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventory',
+            index=models.Index(fields=['expiration_date'], name='inventory_i_expirat_5a5c97_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='inventory',
+            unique_together={('variant', 'warehouse')},
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_reservationhold'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WarehouseRegion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country', models.CharField(max_length=100)),
+                ('state', models.CharField(blank=True, max_length=100)),
+                ('postal_prefix', models.CharField(blank=True, max_length=20)),
+                ('priority', models.PositiveSmallIntegerField(default=100)),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='regions', to='inventory.warehouse')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['country', 'state'], name='inventory_w_country_cbce62_idx')],
+            },
+        ),
+    ]
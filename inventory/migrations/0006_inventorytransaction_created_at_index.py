@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+        ('inventory', '0005_inventorycheckpoint'),
+        ('orders', '0001_initial'),
+        ('returns', '__first__'),
+        ('shipping', '__first__'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventorytransaction',
+            index=models.Index(fields=['created_at'], name='inventory_i_created_670884_idx'),
+        ),
+    ]
@@ -1,8 +1,30 @@
+from collections import defaultdict, deque
+from datetime import timedelta
+from uuid import uuid4
+
+from django.conf import settings
 from django.db import models
 from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone
+from core.events import build_event, publish, publish_many
 from core.utils.common import SoftDeleteModel, TimeStampedModel
 
+
+def get_reservation_ttl():
+    """How long a reservation hold lives before the sweeper releases it."""
+    return getattr(settings, 'INVENTORY_RESERVATION_TTL', timedelta(minutes=30))
+
+
+def require_reference(reference):
+    """
+    Reservations are tracked by owner: a hold nobody can name would never be
+    consumed, and the sweeper would later release its stock a second time.
+    """
+    if not reference:
+        raise ValueError("A reference (e.g. 'cart:123' or 'order:456') is required")
+
 class Warehouse(TimeStampedModel, SoftDeleteModel):
     # company = models.ForeignKey("accounts.Company", null=True, blank=True, on_delete=models.CASCADE, related_name="warehouses")
     code = models.CharField(max_length=32, unique=True)
@@ -18,6 +40,35 @@ class Warehouse(TimeStampedModel, SoftDeleteModel):
     def __str__(self):
         return f"{self.code} - {self.name}"
 
+class WarehouseRegion(models.Model):
+    """
+    Areas a warehouse ships to, used to pick the nearest warehouse for an order.
+    Most specific match wins: postal prefix, then state, then country.
+    """
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, related_name='regions')
+    country = models.CharField(max_length=100)
+    state = models.CharField(max_length=100, blank=True)
+    postal_prefix = models.CharField(max_length=20, blank=True)
+    priority = models.PositiveSmallIntegerField(default=100)  # lower = nearer
+
+    class Meta:
+        indexes = [models.Index(fields=['country', 'state'])]
+
+    def __str__(self):
+        area = self.postal_prefix or self.state or self.country
+        return f"{self.warehouse.code} → {area} ({self.priority})"
+
+class InventoryQuerySet(models.QuerySet):
+    SELLABLE_STATUSES = ("AVAILABLE", "EXPIRING_SOON")
+
+    def sellable(self, on=None):
+        """Rows stock can be promised from: not expired, quarantined, damaged or on hold."""
+        on = on or timezone.localdate()
+        return self.filter(status__in=self.SELLABLE_STATUSES).filter(
+            models.Q(expiration_date__isnull=True) | models.Q(expiration_date__gt=on)
+        )
+
+
 class Inventory(TimeStampedModel):
     variant = models.ForeignKey('catalog.ProductVariant', on_delete=models.CASCADE, related_name='inventory')
     warehouse = models.ForeignKey(Warehouse, on_delete=models.PROTECT, related_name='inventories')
@@ -50,6 +101,8 @@ class Inventory(TimeStampedModel):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="AVAILABLE")
     metadata = models.JSONField(default=dict, blank=True)
 
+    objects = InventoryQuerySet.as_manager()
+
     class Meta:
         unique_together = (('variant','warehouse'),)
         indexes = [
@@ -63,10 +116,16 @@ class Inventory(TimeStampedModel):
         """Available to sell (ATS) = On Hand - Reserved - Allocated"""
         return max(0, self.on_hand - self.reserved - self.allocated)
 
-    def reserve(self, qty, *, reference=None, user=None):
-        """Reserve stock temporarily (e.g., for cart / unconfirmed order)."""
+    def reserve(self, qty, *, reference=None, user=None, ttl=None):
+        """
+            Reserve stock temporarily (e.g., for cart / unconfirmed order).
+            A ReservationHold owned by `reference` is created alongside, so the
+            reservation is released automatically if it is never converted; the
+            owner's other holds are extended, so an active cart keeps its stock.
+        """
         if qty <= 0:
             raise ValueError("qty must be positive")
+        require_reference(reference)
         
         with transaction.atomic():
             inv = Inventory.objects.select_for_update().get(pk=self.pk)
@@ -87,12 +146,23 @@ class Inventory(TimeStampedModel):
                 reference=reference,
                 created_by=user,
             )
+
+            ReservationHold.extend(reference, ttl=ttl)
+            ReservationHold.objects.create(
+                inventory=inv,
+                variant=inv.variant,
+                warehouse=inv.warehouse,
+                quantity=qty,
+                owner=reference,
+                expires_at=timezone.now() + (ttl or get_reservation_ttl()),
+            )
             return inv
 
     def release(self, qty, *, reference=None, user=None):
-        """Release reserved stock (e.g., cart abandoned / order cancelled)."""
+        """Release reserved stock (e.g., cart abandoned / order cancelled), consuming `reference`'s holds."""
         if qty <= 0:
             raise ValueError("qty must be positive")
+        require_reference(reference)
 
         with transaction.atomic():
             inv = Inventory.objects.select_for_update().get(pk=self.pk)
@@ -101,6 +171,7 @@ class Inventory(TimeStampedModel):
             
             inv.reserved -= qty
             inv.save()
+            ReservationHold.consume(inv, qty, owner=reference)
 
             InventoryTransaction.objects.create(
                 transaction_type='release',
@@ -118,10 +189,11 @@ class Inventory(TimeStampedModel):
     def allocate(self, qty, *, reference=None, user=None):
         """
             Move stock from reserved → allocated 
-            (e.g., order confirmed/paid).
+            (e.g., order confirmed/paid), consuming `reference`'s holds.
         """
         if qty <= 0:
             raise ValueError("qty must be positive")
+        require_reference(reference)
         
         with transaction.atomic():
             inv = Inventory.objects.select_for_update().get(pk=self.pk)
@@ -131,6 +203,7 @@ class Inventory(TimeStampedModel):
             inv.reserved -= qty
             inv.allocated += qty
             inv.save()
+            ReservationHold.consume(inv, qty, owner=reference)
 
             InventoryTransaction.objects.create(
                 transaction_type='allocation',
@@ -145,6 +218,158 @@ class Inventory(TimeStampedModel):
             )
             return inv
 
+    @classmethod
+    def reserve_fefo(cls, variant, qty, *, reference=None, user=None, ttl=None):
+        """
+            Reserve `qty` of a variant first-expired-first-out across its sellable lot rows
+            (expired, quarantined and other non-sellable rows are skipped).
+            Rows are locked in pk order, updated with one bulk UPDATE, and the ledger
+            entries and reservation holds are written with bulk_create; the
+            owner's other holds are extended as in `reserve`.
+            Returns a list of (inventory, qty) picks.
+        """
+        from .availability import refresh_availability
+
+        if qty <= 0:
+            raise ValueError("qty must be positive")
+        require_reference(reference)
+
+        with transaction.atomic():
+            # lock in pk order like every other stock mutation, then walk lots FEFO
+            rows = list(cls.objects.select_for_update().sellable().filter(variant=variant).order_by('pk'))
+            rows.sort(key=lambda inv: (inv.expiration_date is None, inv.expiration_date, inv.pk))
+
+            picks = []
+            need = qty
+            for inv in rows:
+                take = min(need, inv.available())
+                if take <= 0:
+                    continue
+                picks.append((inv, take))
+                need -= take
+                if need == 0:
+                    break
+            if need > 0:
+                raise Exception("Insufficient stock to reserve")
+
+            now = timezone.now()
+            expires_at = now + (ttl or get_reservation_ttl())
+            txns = []
+            holds = []
+            for inv, take in picks:
+                inv.reserved += take
+                inv.updated_at = now
+                txns.append(InventoryTransaction(
+                    transaction_type='reservation',
+                    variant_id=inv.variant_id,
+                    warehouse_id=inv.warehouse_id,
+                    quantity_delta=-take,
+                    resulting_on_hand=inv.on_hand,
+                    resulting_reserved=inv.reserved,
+                    resulting_allocated=inv.allocated,
+                    reference=reference,
+                    metadata={"lot": inv.lot, "batch_number": inv.batch_number},
+                    created_by=user,
+                ))
+                holds.append(ReservationHold(
+                    inventory=inv,
+                    variant_id=inv.variant_id,
+                    warehouse_id=inv.warehouse_id,
+                    quantity=take,
+                    owner=reference,
+                    expires_at=expires_at,
+                ))
+
+            cls.objects.bulk_update([inv for inv, _ in picks], ['reserved', 'updated_at'])
+            InventoryTransaction.objects.bulk_create(txns)
+            ReservationHold.extend(reference, ttl=ttl)
+            ReservationHold.objects.bulk_create(holds)
+            refresh_availability([getattr(variant, 'pk', variant)])
+            return picks
+
+    @classmethod
+    def refresh_expiry_statuses(cls, *, today=None, warning_days=None, batch_size=1000):
+        """
+            Flip sellable rows to EXPIRED / EXPIRING_SOON based on expiration_date.
+            Works in pk batches of set-based UPDATEs (no per-row saves) so locks stay short.
+            Rows in other states (quarantine, damaged, on hold...) are left alone.
+            Returns {"expired": n, "expiring_soon": n}.
+        """
+        from .availability import refresh_availability
+
+        today = today or timezone.localdate()
+        if warning_days is None:
+            warning_days = getattr(settings, 'INVENTORY_EXPIRY_WARNING_DAYS', 30)
+
+        phases = {
+            "EXPIRED": models.Q(
+                status__in=("AVAILABLE", "EXPIRING_SOON"),
+                expiration_date__lte=today,
+            ),
+            "EXPIRING_SOON": models.Q(
+                status="AVAILABLE",
+                expiration_date__gt=today,
+                expiration_date__lte=today + timedelta(days=warning_days),
+            ),
+        }
+
+        counts = {}
+        for new_status, condition in phases.items():
+            changed = 0
+            while True:
+                batch = list(cls.objects.filter(condition).order_by('pk').values_list('pk', 'variant_id')[:batch_size])
+                if not batch:
+                    break
+                with transaction.atomic():
+                    changed += cls.objects.filter(condition, pk__in=[pk for pk, _ in batch]).update(
+                        status=new_status, updated_at=timezone.now()
+                    )
+                    refresh_availability([variant_id for _, variant_id in batch])
+            counts[new_status.lower()] = changed
+        return counts
+
+
+class InventoryTransactionQuerySet(models.QuerySet):
+    # what identifies a just-inserted ledger row when the backend doesn't return its pk
+    READ_BACK_FIELDS = (
+        "variant_id", "warehouse_id", "created_at", "transaction_type", "quantity_delta",
+        "resulting_on_hand", "resulting_reserved", "resulting_allocated", "reference",
+    )
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """
+        Ledger rows and their outbox events are written together. Where the
+        backend doesn't return the new pks (MySQL), the rows are read back so
+        every event still carries its row's id.
+        """
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            if any(txn.pk is None for txn in objs):
+                self._read_back_pks(objs)
+            publish_many(txn.outbox_event() for txn in objs)
+        return objs
+
+    def _read_back_pks(self, objs):
+        """Give the pk-less rows of `objs` their pks, matching inserted rows in insertion (pk) order."""
+        pending = defaultdict(deque)
+        for txn in objs:
+            if txn.pk is None:
+                pending[tuple(getattr(txn, name) for name in self.READ_BACK_FIELDS)].append(txn)
+        rows = (
+            self.model._default_manager.using(self.db)
+            .filter(
+                variant_id__in={key[0] for key in pending},
+                created_at__in={key[2] for key in pending},
+            )
+            .order_by("pk")
+            .values_list("pk", *self.READ_BACK_FIELDS)
+        )
+        for pk, *key in rows:
+            matches = pending.get(tuple(key))
+            if matches:
+                matches.popleft().pk = pk
+
+
 class InventoryTransaction(TimeStampedModel):
     TRANSACTION_CHOICES = [
         ("receipt", "Receipt"),           # stock in from purchase/production
@@ -190,10 +415,486 @@ class InventoryTransaction(TimeStampedModel):
         indexes = [
             models.Index(fields=['variant','warehouse','created_at']),
             models.Index(fields=["transaction_type"]),
+            models.Index(fields=["created_at"]),  # recent-first ledger pages
         ]
 
+    objects = InventoryTransactionQuerySet.as_manager()
+
     def save(self, *args, **kwargs):
         """Make transaction immutable after creation."""
         if self.pk:
             raise ValueError("InventoryTransaction records cannot be updated once created.")
-        super().save(*args, **kwargs)
\ No newline at end of file
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            publish_many([self.outbox_event()])
+
+    def outbox_event(self):
+        return build_event("inventory.transaction", {
+            "id": self.pk,
+            "transaction_type": self.transaction_type,
+            "variant_id": self.variant_id,
+            "warehouse_id": self.warehouse_id,
+            "quantity_delta": self.quantity_delta,
+            "resulting_on_hand": self.resulting_on_hand,
+            "resulting_reserved": self.resulting_reserved,
+            "resulting_allocated": self.resulting_allocated,
+            "order_id": self.order_id,
+            "reference": self.reference,
+            "created_at": self.created_at,
+        }, aggregate=self)
+
+
+class ReservationHold(TimeStampedModel):
+    """
+    Time-limited claim on reserved stock.
+
+    Every `Inventory.reserve` creates one (`Order.place_order` one per inventory
+    row, owned by the order reference); `release`/`allocate` with the same
+    reference consume them and `release_expired` hands stock back for holds
+    nobody converted in time (abandoned carts etc.). Holds are deleted once released, so the table only
+    contains live claims and the `expires_at` index stays small.
+    """
+    inventory = models.ForeignKey(Inventory, on_delete=models.CASCADE, related_name='holds')
+    variant = models.ForeignKey('catalog.ProductVariant', on_delete=models.CASCADE, related_name='reservation_holds')
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.PROTECT, related_name='reservation_holds')
+    quantity = models.BigIntegerField()
+    owner = models.CharField(max_length=255, blank=True, default="")  # e.g. "cart:123"
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['expires_at']),
+            models.Index(fields=['owner', 'inventory']),
+        ]
+
+    def __str__(self):
+        return f"Hold {self.quantity} x {self.variant_id} @ {self.warehouse_id} ({self.owner or 'anonymous'})"
+
+    @classmethod
+    def extend(cls, owner, *, ttl=None):
+        """Push back expiry of all holds of `owner` (e.g. on cart activity). Single UPDATE."""
+        if not owner:
+            return 0
+        return cls.objects.filter(owner=owner).update(
+            expires_at=timezone.now() + (ttl or get_reservation_ttl()),
+            updated_at=timezone.now(),
+        )
+
+    @classmethod
+    def consume(cls, inventory, qty, *, owner):
+        """
+            Shrink the owner's holds on `inventory` by `qty`, oldest first.
+            Must be called inside the transaction that changed `reserved`.
+        """
+        holds = cls.objects.select_for_update().filter(inventory=inventory, owner=owner).order_by('expires_at')
+        drop = []
+        for hold in holds:
+            if qty <= 0:
+                break
+            if hold.quantity <= qty:
+                qty -= hold.quantity
+                drop.append(hold.pk)
+            else:
+                hold.quantity -= qty
+                hold.save(update_fields=['quantity', 'updated_at'])
+                qty = 0
+        if drop:
+            cls.objects.filter(pk__in=drop).delete()
+
+    @classmethod
+    def release_expired(cls, *, batch_size=500, now=None):
+        """
+            Release up to `batch_size` expired holds in one transaction.
+            Inventory rows are locked in pk order and updated with a single bulk UPDATE;
+            one `release` ledger entry per hold is written with bulk_create.
+            Returns the number of holds processed.
+        """
+        from .availability import refresh_availability
+
+        now = now or timezone.now()
+
+        with transaction.atomic():
+            holds = list(
+                cls.objects.select_for_update(skip_locked=True)
+                .filter(expires_at__lte=now)
+                .order_by('expires_at')[:batch_size]
+            )
+            if not holds:
+                return 0
+
+            inventories = {
+                inv.pk: inv
+                for inv in Inventory.objects.select_for_update()
+                .filter(pk__in={hold.inventory_id for hold in holds})
+                .order_by('pk')
+            }
+
+            txns = []
+            for hold in holds:
+                inv = inventories[hold.inventory_id]
+                # never release more than is still reserved (manual releases may have raced us)
+                qty = min(hold.quantity, inv.reserved)
+                if qty <= 0:
+                    continue
+                inv.reserved -= qty
+                inv.updated_at = now
+                txns.append(InventoryTransaction(
+                    transaction_type='release',
+                    variant_id=inv.variant_id,
+                    warehouse_id=inv.warehouse_id,
+                    quantity_delta=qty,
+                    resulting_on_hand=inv.on_hand,
+                    resulting_reserved=inv.reserved,
+                    resulting_allocated=inv.allocated,
+                    reference=hold.owner or None,
+                    notes="Reservation hold expired",
+                ))
+
+            Inventory.objects.bulk_update(inventories.values(), ['reserved', 'updated_at'])
+            InventoryTransaction.objects.bulk_create(txns)
+            cls.objects.filter(pk__in=[hold.pk for hold in holds]).delete()
+            refresh_availability([inv.variant_id for inv in inventories.values()])
+
+        return len(holds)
+
+
+
+class InventoryCheckpoint(models.Model):
+    """
+    Ledger-implied stock for one (variant, warehouse) at a point in time.
+
+    Written periodically by `create_inventory_checkpoints`; as-of queries start
+    from the nearest checkpoint and only scan ledger rows after it, and the
+    archiver relies on them once old ledger rows are gone.
+    """
+    variant = models.ForeignKey('catalog.ProductVariant', on_delete=models.CASCADE, related_name='inventory_checkpoints')
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.PROTECT, related_name='checkpoints')
+    as_of = models.DateTimeField()
+    on_hand = models.BigIntegerField(default=0)
+    reserved = models.BigIntegerField(default=0)
+    allocated = models.BigIntegerField(default=0)
+    last_transaction_id = models.BigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['variant', 'warehouse', 'as_of'], name='unique_inventory_checkpoint'),
+        ]
+        indexes = [models.Index(fields=['as_of'])]
+
+    def __str__(self):
+        return f"Checkpoint {self.variant_id}@{self.warehouse_id} as of {self.as_of:%Y-%m-%d %H:%M}"
+
+    @classmethod
+    def balance_as_of(cls, variant, warehouse, at=None):
+        """
+            Stock of (variant, warehouse) at time `at` (default: now).
+            One index seek for the nearest checkpoint, then the last ledger row in the
+            bounded range (checkpoint.as_of, at] via the (variant, warehouse, created_at) index.
+        """
+        at = at or timezone.now()
+        variant_id = getattr(variant, 'pk', variant)
+        warehouse_id = getattr(warehouse, 'pk', warehouse)
+
+        checkpoint = (
+            cls.objects.filter(variant_id=variant_id, warehouse_id=warehouse_id, as_of__lte=at)
+            .order_by('-as_of').first()
+        )
+        txns = InventoryTransaction.objects.filter(variant_id=variant_id, warehouse_id=warehouse_id, created_at__lte=at)
+        if checkpoint:
+            txns = txns.filter(created_at__gt=checkpoint.as_of)
+        txn = txns.order_by('-created_at', '-id').first()
+
+        if txn:
+            return {
+                "on_hand": txn.resulting_on_hand,
+                "reserved": txn.resulting_reserved,
+                "allocated": txn.resulting_allocated,
+                "as_of": at,
+                "source": "ledger",
+                "transaction_id": txn.pk,
+            }
+        if checkpoint:
+            return {
+                "on_hand": checkpoint.on_hand,
+                "reserved": checkpoint.reserved,
+                "allocated": checkpoint.allocated,
+                "as_of": at,
+                "source": "checkpoint",
+                "transaction_id": checkpoint.last_transaction_id,
+            }
+        return {"on_hand": 0, "reserved": 0, "allocated": 0, "as_of": at, "source": "empty", "transaction_id": None}
+
+    @classmethod
+    def create_for(cls, as_of=None, *, batch_size=1000):
+        """
+            Write a checkpoint for every inventory row as of `as_of` (default: now).
+            Incremental: only ledger rows since the previous checkpoint run are scanned,
+            pairs without new rows carry the previous checkpoint forward.
+            Returns the number of checkpoints written.
+        """
+        as_of = as_of or timezone.now()
+        previous_as_of = (
+            cls.objects.filter(as_of__lt=as_of).order_by('-as_of').values_list('as_of', flat=True).first()
+        )
+
+        written = 0
+        last_pk = 0
+        while True:
+            pairs = list(
+                Inventory.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', 'variant_id', 'warehouse_id')[:batch_size]
+            )
+            if not pairs:
+                break
+            last_pk = pairs[-1][0]
+            variant_ids = {variant_id for _, variant_id, _ in pairs}
+
+            previous = {}
+            if previous_as_of:
+                previous = {
+                    (cp.variant_id, cp.warehouse_id): cp
+                    for cp in cls.objects.filter(as_of=previous_as_of, variant_id__in=variant_ids)
+                }
+
+            txns = InventoryTransaction.objects.filter(variant_id__in=variant_ids, created_at__lte=as_of)
+            if previous_as_of:
+                txns = txns.filter(created_at__gt=previous_as_of)
+            last_ids = txns.values('variant_id', 'warehouse_id').annotate(last_id=models.Max('id')).values_list('last_id', flat=True)
+            latest = {
+                (txn.variant_id, txn.warehouse_id): txn
+                for txn in InventoryTransaction.objects.filter(pk__in=list(last_ids))
+            }
+
+            checkpoints = []
+            for _, variant_id, warehouse_id in pairs:
+                key = (variant_id, warehouse_id)
+                txn, prev = latest.get(key), previous.get(key)
+                if txn:
+                    values = (txn.resulting_on_hand, txn.resulting_reserved, txn.resulting_allocated, txn.pk)
+                elif prev:
+                    values = (prev.on_hand, prev.reserved, prev.allocated, prev.last_transaction_id)
+                else:
+                    values = (0, 0, 0, None)
+                checkpoints.append(cls(
+                    variant_id=variant_id,
+                    warehouse_id=warehouse_id,
+                    as_of=as_of,
+                    on_hand=values[0],
+                    reserved=values[1],
+                    allocated=values[2],
+                    last_transaction_id=values[3],
+                ))
+            cls.objects.bulk_create(checkpoints, ignore_conflicts=True)
+            written += len(checkpoints)
+
+        return written
+
+
+
+def generate_transfer_reference():
+    return f"TR-{uuid4().hex[:10].upper()}"
+
+
+class StockTransfer(TimeStampedModel):
+    """
+    Inter-warehouse stock movement. Shipping takes the lines out of the source
+    warehouse's on_hand and books them as `incoming` at the destination until
+    they are received; each step writes paired transfer_out/transfer_in ledger rows.
+    """
+    STATUS_CHOICES = [
+        ("draft", "Draft"),
+        ("in_transit", "In Transit"),
+        ("received", "Received"),
+        ("cancelled", "Cancelled"),
+    ]
+
+    reference = models.CharField(max_length=64, unique=True, default=generate_transfer_reference)
+    source = models.ForeignKey(Warehouse, on_delete=models.PROTECT, related_name='outgoing_transfers')
+    destination = models.ForeignKey(Warehouse, on_delete=models.PROTECT, related_name='incoming_transfers')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="draft", db_index=True)
+    shipped_at = models.DateTimeField(null=True, blank=True)
+    received_at = models.DateTimeField(null=True, blank=True)
+    notes = models.CharField(max_length=255, blank=True)
+    created_by = models.ForeignKey('accounts.User', null=True, blank=True, on_delete=models.SET_NULL)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.reference} ({self.source.code} → {self.destination.code})"
+
+    def _lock(self, expected_status):
+        transfer = StockTransfer.objects.select_for_update().get(pk=self.pk)
+        if transfer.status != expected_status:
+            raise ValueError(f"Transfer {transfer.reference} is {transfer.status}, expected {expected_status}")
+        lines = list(transfer.lines.order_by('variant_id'))
+        if not lines:
+            raise ValueError(f"Transfer {transfer.reference} has no lines")
+        return transfer, lines
+
+    def _lock_inventories(self, transfer, lines):
+        """
+            Lock the source and destination rows of every line. Rows are always locked
+            in pk order, so transfers running in opposite directions cannot deadlock.
+            Missing destination rows are created first.
+        """
+        variant_ids = [line.variant_id for line in lines]
+        Inventory.objects.bulk_create(
+            [Inventory(variant_id=variant_id, warehouse_id=transfer.destination_id) for variant_id in variant_ids],
+            ignore_conflicts=True,
+            batch_size=1000,
+        )
+        return {
+            (inv.variant_id, inv.warehouse_id): inv
+            for inv in Inventory.objects.select_for_update()
+            .filter(variant_id__in=variant_ids, warehouse_id__in=[transfer.source_id, transfer.destination_id])
+            .order_by('pk')
+        }
+
+    def _ledger_row(self, transaction_type, inv, delta, user):
+        return InventoryTransaction(
+            transaction_type=transaction_type,
+            variant_id=inv.variant_id,
+            warehouse_id=inv.warehouse_id,
+            quantity_delta=delta,
+            resulting_on_hand=inv.on_hand,
+            resulting_reserved=inv.reserved,
+            resulting_allocated=inv.allocated,
+            reference=self.reference,
+            source_document="stock_transfer",
+            metadata={"transfer_id": self.pk},
+            created_by=user,
+        )
+
+    def ship(self, *, user=None):
+        """
+            Move every line out of the source warehouse (on_hand) into transit
+            (destination `incoming`). All-or-nothing: raises ValueError listing the
+            lines the source cannot cover.
+        """
+        from .availability import refresh_availability
+
+        with transaction.atomic():
+            transfer, lines = self._lock('draft')
+            inventories = self._lock_inventories(transfer, lines)
+            now = timezone.now()
+
+            short = []
+            txns = []
+            for line in lines:
+                source = inventories.get((line.variant_id, transfer.source_id))
+                if source is None or source.available() < line.quantity:
+                    short.append(line.variant_id)
+                    continue
+                destination = inventories[(line.variant_id, transfer.destination_id)]
+                source.on_hand -= line.quantity
+                destination.incoming += line.quantity
+                source.updated_at = destination.updated_at = now
+                txns.append(transfer._ledger_row('transfer_out', source, -line.quantity, user))
+            if short:
+                raise ValueError(f"Insufficient stock at {transfer.source.code} for variant(s) {short}")
+
+            Inventory.objects.bulk_update(inventories.values(), ['on_hand', 'incoming', 'updated_at'], batch_size=1000)
+            InventoryTransaction.objects.bulk_create(txns, batch_size=1000)
+            transfer.status = 'in_transit'
+            transfer.shipped_at = now
+            transfer.save(update_fields=['status', 'shipped_at', 'updated_at'])
+            refresh_availability([line.variant_id for line in lines])
+        return transfer
+
+    def receive(self, *, user=None):
+        """Book every in-transit line into the destination's on_hand."""
+        from .availability import refresh_availability
+
+        with transaction.atomic():
+            transfer, lines = self._lock('in_transit')
+            inventories = self._lock_inventories(transfer, lines)
+            now = timezone.now()
+
+            txns = []
+            for line in lines:
+                destination = inventories[(line.variant_id, transfer.destination_id)]
+                destination.incoming = max(0, destination.incoming - line.quantity)
+                destination.on_hand += line.quantity
+                destination.updated_at = now
+                line.quantity_received = line.quantity
+                txns.append(transfer._ledger_row('transfer_in', destination, line.quantity, user))
+
+            Inventory.objects.bulk_update(inventories.values(), ['on_hand', 'incoming', 'updated_at'], batch_size=1000)
+            StockTransferLine.objects.bulk_update(lines, ['quantity_received'], batch_size=1000)
+            InventoryTransaction.objects.bulk_create(txns, batch_size=1000)
+            transfer.status = 'received'
+            transfer.received_at = now
+            transfer.save(update_fields=['status', 'received_at', 'updated_at'])
+            refresh_availability([line.variant_id for line in lines])
+        return transfer
+
+    def cancel(self):
+        """Cancel a transfer that has not shipped yet."""
+        with transaction.atomic():
+            transfer = StockTransfer.objects.select_for_update().get(pk=self.pk)
+            if transfer.status != 'draft':
+                raise ValueError(f"Transfer {transfer.reference} is {transfer.status} and cannot be cancelled")
+            transfer.status = 'cancelled'
+            transfer.save(update_fields=['status', 'updated_at'])
+        return transfer
+
+
+class StockTransferLine(models.Model):
+    transfer = models.ForeignKey(StockTransfer, on_delete=models.CASCADE, related_name='lines')
+    variant = models.ForeignKey('catalog.ProductVariant', on_delete=models.PROTECT)
+    quantity = models.PositiveIntegerField()
+    quantity_received = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = (('transfer', 'variant'),)
+
+    def __str__(self):
+        return f"{self.transfer.reference}: {self.variant_id} x {self.quantity}"
+
+
+class VariantAvailability(models.Model):
+    """
+    Available-to-sell across all warehouses for one variant, maintained by
+    inventory.availability.refresh_availability: in the transaction of bulk stock
+    operations, and from the outbox (inventory.subscribers) for single-row saves.
+    """
+    variant = models.OneToOneField('catalog.ProductVariant', on_delete=models.CASCADE, primary_key=True, related_name='availability')
+    ats = models.BigIntegerField(default=0)
+    on_hand = models.BigIntegerField(default=0)
+    reserved = models.BigIntegerField(default=0)
+    allocated = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Variant availability'
+
+    def __str__(self):
+        return f"{self.variant_id}: {self.ats} available"
+
+
+@receiver(post_save, sender=Inventory)
+def publish_inventory_change(sender, instance, created, **kwargs):
+    """Row-level saves (API/admin edits, reserve/release/allocate); bulk paths are covered by their ledger events."""
+    publish("inventory.updated", {
+        "id": instance.pk,
+        "variant_id": instance.variant_id,
+        "warehouse_id": instance.warehouse_id,
+        "on_hand": instance.on_hand,
+        "reserved": instance.reserved,
+        "allocated": instance.allocated,
+        "incoming": instance.incoming,
+        "status": instance.status,
+        "created": created,
+    }, aggregate=instance)
+
+
+
+@receiver(post_delete, sender=Inventory)
+def publish_inventory_deletion(sender, instance, **kwargs):
+    publish("inventory.deleted", {
+        "id": instance.pk,
+        "variant_id": instance.variant_id,
+        "warehouse_id": instance.warehouse_id,
+    }, aggregate=instance)
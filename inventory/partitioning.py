@@ -0,0 +1,164 @@
+"""
+Monthly range partitioning of the inventory ledger.
+
+Only PostgreSQL gets real partitions; on other databases the ledger stays a
+plain table and every helper here is a no-op that returns False, so callers
+(the `partition_ledger` and `archive_ledger` commands) fall back to batched
+deletes.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+
+from .models import InventoryTransaction
+
+TABLE = InventoryTransaction._meta.db_table
+SEQUENCE = f"{TABLE}_pk_seq"
+DEFAULT_PARTITION = f"{TABLE}_default"
+
+
+def month_start(value):
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def next_month(value):
+    if value.month == 12:
+        return datetime(value.year + 1, 1, 1, tzinfo=dt_timezone.utc)
+    return datetime(value.year, value.month + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(month):
+    return f"{TABLE}_p{month:%Y%m}"
+
+
+def supports_partitioning():
+    return connection.vendor == "postgresql"
+
+
+def is_partitioned():
+    if not supports_partitioning():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = %s",
+            [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def create_default_partition(cursor):
+    """Catch-all for rows outside every monthly partition, so such inserts do not fail."""
+    cursor.execute(f'CREATE TABLE IF NOT EXISTS "{DEFAULT_PARTITION}" PARTITION OF "{TABLE}" DEFAULT')
+
+
+def create_partition(cursor, month):
+    """
+    Create `month`'s partition. Rows of that month that landed in the default
+    partition meanwhile are moved into it (PostgreSQL refuses to create it otherwise).
+    Call inside a transaction.
+    """
+    start = month_start(month)
+    end = next_month(start)
+    name = partition_name(start)
+    cursor.execute("SELECT to_regclass(%s)", [name])
+    if cursor.fetchone()[0] is not None:
+        return
+    cursor.execute(f'CREATE TEMPORARY TABLE "ledger_moved" (LIKE "{TABLE}") ON COMMIT DROP')
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" WHERE created_at >= %s AND created_at < %s RETURNING *) '
+        f'INSERT INTO "ledger_moved" SELECT * FROM moved',
+        [start, end],
+    )
+    cursor.execute(
+        f'CREATE TABLE "{name}" PARTITION OF "{TABLE}" '
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+    cursor.execute(f'INSERT INTO "{TABLE}" SELECT * FROM "ledger_moved"')
+    cursor.execute('DROP TABLE "ledger_moved"')
+
+
+def ensure_partitions(until):
+    """
+    Create monthly partitions from the current month up to and including `until`'s
+    month, and the default partition. Rows for months without a partition go to the
+    default one rather than failing; it is only a fallback (the archiver deletes
+    from it row by row), so `partition_ledger` should still run (e.g. monthly from
+    cron) ahead of time.
+    """
+    if not is_partitioned():
+        return False
+    month = month_start(datetime.now(dt_timezone.utc))
+    with transaction.atomic(), connection.cursor() as cursor:
+        create_default_partition(cursor)
+        while month <= month_start(until):
+            create_partition(cursor, month)
+            month = next_month(month)
+    return True
+
+
+def convert_to_partitioned():
+    """
+    Rebuild the ledger as a table partitioned by month on created_at.
+
+    The primary key becomes (id, created_at) as PostgreSQL requires the
+    partition key in it; ids keep coming from a plain sequence (identity
+    columns are not allowed on partitioned tables before PostgreSQL 17).
+    Runs in one transaction and holds an exclusive lock on the ledger while
+    rows are copied, so do it in a maintenance window on large tables.
+    """
+    if not supports_partitioning() or is_partitioned():
+        return False
+
+    legacy = f"{TABLE}_legacy"
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE "{TABLE}" IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{legacy}"')
+        cursor.execute(
+            f'CREATE TABLE "{TABLE}" (LIKE "{legacy}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f"PARTITION BY RANGE (created_at)"
+        )
+        cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS "{SEQUENCE}" OWNED BY "{TABLE}".id')
+        cursor.execute(f'SELECT setval(%s, COALESCE((SELECT MAX(id) FROM "{legacy}"), 0) + 1, false)', [SEQUENCE])
+        cursor.execute(f'ALTER TABLE "{TABLE}" ALTER COLUMN id SET DEFAULT nextval(\'"{SEQUENCE}"\')')
+        cursor.execute(f'ALTER TABLE "{TABLE}" ADD PRIMARY KEY (id, created_at)')
+
+        # indexes and foreign keys are declared on the parent and cascade to partitions
+        for columns in (("variant_id", "warehouse_id", "created_at"), ("transaction_type",), ("created_at",),
+                        ("order_id",), ("shipment_id",), ("return_record_id",), ("created_by_id",)):
+            cols = ", ".join(f'"{col}"' for col in columns)
+            cursor.execute(f'CREATE INDEX "ledger_{"_".join(columns)}_idx" ON "{TABLE}" ({cols})')
+        for field in InventoryTransaction._meta.concrete_fields:
+            if field.is_relation:
+                target = field.related_model._meta
+                cursor.execute(
+                    f'ALTER TABLE "{TABLE}" ADD FOREIGN KEY ("{field.column}") '
+                    f'REFERENCES "{target.db_table}" ("{target.pk.column}") DEFERRABLE INITIALLY DEFERRED'
+                )
+
+        cursor.execute(f'SELECT MIN(created_at) FROM "{legacy}"')
+        oldest = cursor.fetchone()[0] or datetime.now(dt_timezone.utc)
+        month = month_start(oldest)
+        current = month_start(datetime.now(dt_timezone.utc))
+        create_default_partition(cursor)
+        while month <= current:
+            create_partition(cursor, month)
+            month = next_month(month)
+
+        cursor.execute(f'INSERT INTO "{TABLE}" SELECT * FROM "{legacy}"')
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")  # flush deferred FK checks before the drop
+        cursor.execute(f'DROP TABLE "{legacy}"')
+    return True
+
+
+def drop_partition(month):
+    """Detach and drop the partition holding `month`. Returns False when there is none."""
+    if not is_partitioned():
+        return False
+    name = partition_name(month_start(month))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [name])
+        if cursor.fetchone()[0] is None:
+            return False
+        cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"')
+        cursor.execute(f'DROP TABLE "{name}"')
+    return True
@@ -0,0 +1,206 @@
+"""
+Inventory counters vs. ledger reconciliation.
+
+Expected stock per (variant, warehouse) is derived from the ledger:
+  on_hand            = baseline on_hand + sum(quantity_delta) of stock-moving transactions
+  reserved/allocated = resulting_* of the latest transaction
+where the baseline is the most recent checkpoint run (see InventoryCheckpoint), or
+zero when none exists. Work is done per chunk of variants: one GROUP BY over the
+ledger, one read of the counters, and the comparison itself on NumPy arrays, so
+memory stays bounded by the chunk size regardless of ledger length.
+"""
+from dataclasses import dataclass, field
+
+import numpy as np
+from django.db import models, transaction
+from django.db.models import Case, Max, Sum, When
+
+from .models import Inventory, InventoryCheckpoint, InventoryTransaction
+
+# transaction types whose quantity_delta moves on_hand
+ON_HAND_TYPES = ("receipt", "sale", "adjustment", "transfer_in", "transfer_out", "return")
+
+# variant_id and warehouse_id packed into one sortable int64 key
+WAREHOUSE_BITS = 24
+
+REPORT_COLUMNS = (
+    "inventory_id", "variant_id", "warehouse_id",
+    "expected_on_hand", "on_hand",
+    "expected_reserved", "reserved",
+    "expected_allocated", "allocated",
+)
+
+
+@dataclass
+class ReconciliationResult:
+    checked: int = 0
+    discrepancies: int = 0
+    orphans: int = 0
+    adjustments: int = 0
+    rows: list = field(default_factory=list)
+
+
+def pack_keys(variant_ids, warehouse_ids):
+    return (variant_ids.astype(np.int64) << WAREHOUSE_BITS) | warehouse_ids.astype(np.int64)
+
+
+def reconcile(*, chunk_size=50000, fix=False, user=None, on_discrepancy=None):
+    """
+    Compare counters with the ledger for every inventory row.
+
+    `on_discrepancy(row_tuple)` is called for each mismatch (REPORT_COLUMNS order;
+    inventory_id is 0 for ledger pairs that have no inventory row). With `fix`,
+    an `adjustment` transaction bringing the ledger in line with the counters is
+    written for each mismatching row, in bulk per chunk.
+    """
+    result = ReconciliationResult()
+    baseline_as_of = InventoryCheckpoint.objects.order_by("-as_of").values_list("as_of", flat=True).first()
+
+    last_variant = 0
+    while True:
+        bounds = list(
+            Inventory.objects.filter(variant_id__gt=last_variant).order_by("variant_id")
+            .values_list("variant_id", flat=True)[chunk_size - 1:chunk_size]
+        )
+        upper = bounds[0] if bounds else None
+        variant_range = {"variant_id__gt": last_variant}
+        if upper is not None:
+            variant_range["variant_id__lte"] = upper
+
+        counters = np.array(
+            list(Inventory.objects.filter(**variant_range).values_list(
+                "pk", "variant_id", "warehouse_id", "on_hand", "reserved", "allocated",
+            )),
+            dtype=np.int64,
+        ).reshape(-1, 6)
+
+        ledger = InventoryTransaction.objects.filter(**variant_range)
+        if baseline_as_of:
+            ledger = ledger.filter(created_at__gt=baseline_as_of)
+        aggregates = np.array(
+            list(ledger.values("variant_id", "warehouse_id").annotate(
+                on_hand_delta=Sum(Case(
+                    When(transaction_type__in=ON_HAND_TYPES, then="quantity_delta"),
+                    default=0, output_field=models.BigIntegerField(),
+                )),
+                last_id=Max("id"),
+            ).order_by().values_list("variant_id", "warehouse_id", "on_hand_delta", "last_id")),
+            dtype=np.int64,
+        ).reshape(-1, 4)
+
+        if len(counters) == 0 and len(aggregates) == 0:
+            break
+
+        _compare_chunk(counters, aggregates, variant_range, baseline_as_of, fix, user, result, on_discrepancy)
+
+        if upper is None:
+            break
+        last_variant = upper
+
+    return result
+
+
+def _compare_chunk(counters, aggregates, variant_range, baseline_as_of, fix, user, result, on_discrepancy):
+    counter_keys = pack_keys(counters[:, 1], counters[:, 2])
+    order = np.argsort(counter_keys)
+    counters, counter_keys = counters[order], counter_keys[order]
+    n = len(counters)
+
+    # expected = baseline (checkpoint) ...
+    expected = np.zeros((n, 3), dtype=np.int64)
+    if baseline_as_of:
+        baseline = np.array(
+            list(InventoryCheckpoint.objects.filter(as_of=baseline_as_of, **variant_range).values_list(
+                "variant_id", "warehouse_id", "on_hand", "reserved", "allocated",
+            )),
+            dtype=np.int64,
+        ).reshape(-1, 5)
+        idx, found = _locate(counter_keys, pack_keys(baseline[:, 0], baseline[:, 1]))
+        expected[idx[found]] = baseline[found, 2:5]
+
+    # ... plus stock-moving deltas, with reserved/allocated from the latest ledger row
+    agg_keys = pack_keys(aggregates[:, 0], aggregates[:, 1])
+    idx, found = _locate(counter_keys, agg_keys)
+    expected[idx[found], 0] += aggregates[found, 2]
+
+    last_ids = aggregates[found, 3]
+    if len(last_ids):
+        latest = np.array(
+            list(InventoryTransaction.objects.filter(pk__in=last_ids.tolist()).values_list(
+                "variant_id", "warehouse_id", "resulting_reserved", "resulting_allocated",
+            )),
+            dtype=np.int64,
+        ).reshape(-1, 4)
+        latest_idx, latest_found = _locate(counter_keys, pack_keys(latest[:, 0], latest[:, 1]))
+        expected[latest_idx[latest_found], 1:3] = latest[latest_found, 2:4]
+
+    actual = counters[:, 3:6]
+    mismatched = np.nonzero((expected != actual).any(axis=1))[0]
+
+    result.checked += n
+    result.discrepancies += len(mismatched)
+    if on_discrepancy:
+        for i in mismatched:
+            on_discrepancy((
+                int(counters[i, 0]), int(counters[i, 1]), int(counters[i, 2]),
+                int(expected[i, 0]), int(actual[i, 0]),
+                int(expected[i, 1]), int(actual[i, 1]),
+                int(expected[i, 2]), int(actual[i, 2]),
+            ))
+
+    # ledger activity for pairs that have no inventory row at all
+    orphans = aggregates[~found]
+    result.orphans += len(orphans)
+    if on_discrepancy:
+        for variant_id, warehouse_id, delta, _ in orphans:
+            on_discrepancy((0, int(variant_id), int(warehouse_id), int(delta), 0, 0, 0, 0, 0))
+
+    if fix and len(mismatched):
+        result.adjustments += _write_adjustments(counters[mismatched], expected[mismatched], user)
+
+
+def _locate(sorted_keys, keys):
+    """Positions of `keys` in `sorted_keys` and a mask of which were present."""
+    if len(sorted_keys) == 0:
+        return np.zeros(len(keys), dtype=np.int64), np.zeros(len(keys), dtype=bool)
+    idx = np.searchsorted(sorted_keys, keys)
+    idx = np.minimum(idx, len(sorted_keys) - 1)
+    return idx, sorted_keys[idx] == keys
+
+
+def _write_adjustments(counters, expected, user):
+    """
+    Corrective `adjustment` rows so the ledger agrees with the counters again.
+    The rows are locked and re-read first. One whose counters changed since
+    they were compared (a stock operation ran meanwhile, with its own ledger
+    entry) is skipped: its expected values are out of date, and the next run
+    checks it again.
+    """
+    with transaction.atomic():
+        current = {
+            pk: (on_hand, reserved, allocated)
+            for pk, on_hand, reserved, allocated in Inventory.objects.select_for_update()
+            .filter(pk__in=counters[:, 0].tolist()).order_by("pk")
+            .values_list("pk", "on_hand", "reserved", "allocated")
+        }
+        txns = [
+            InventoryTransaction(
+                transaction_type="adjustment",
+                variant_id=int(row[1]),
+                warehouse_id=int(row[2]),
+                quantity_delta=int(row[3] - exp[0]),
+                resulting_on_hand=int(row[3]),
+                resulting_reserved=int(row[4]),
+                resulting_allocated=int(row[5]),
+                source_document="reconciliation",
+                notes="Ledger/counter reconciliation",
+                metadata={
+                    "expected": {"on_hand": int(exp[0]), "reserved": int(exp[1]), "allocated": int(exp[2])},
+                },
+                created_by=user,
+            )
+            for row, exp in zip(counters, expected)
+            if current.get(int(row[0])) == tuple(int(value) for value in row[3:6])
+        ]
+        InventoryTransaction.objects.bulk_create(txns, batch_size=1000)
+    return len(txns)
@@ -1,8 +1,11 @@
 from rest_framework import serializers
+from django.db import transaction
 from django.utils import timezone
 
 
-from .models import Warehouse, Inventory, InventoryTransaction
+from core.serializers import CompiledSerializer
+from .imports import IMPORT_TYPES
+from .models import Warehouse, Inventory, InventoryTransaction, StockTransfer, StockTransferLine
 from orders.models import Order
 from shipping.models import Shipment
 from catalog.models import ProductVariant
@@ -63,11 +66,71 @@ class InventoryTransactionSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "created_at", "updated_at"]
 
 
+class CompiledInventoryTransactionSerializer(CompiledSerializer):
+    """InventoryTransactionSerializer output from values() rows, for ledger pages."""
+    serializer_class = InventoryTransactionSerializer
+
+
 
 class InventoryActionSerializer(serializers.Serializer):
     qty = serializers.IntegerField(min_value=1)
-    reference = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    reference = serializers.CharField(max_length=255)  # owner of the reservation hold, e.g. "cart:123"
     # optional: link order/shipment by id (only allowed for admin/servers)
     order = serializers.PrimaryKeyRelatedField(queryset=Order.objects.all(), required=False)  # set in view
     shipment = serializers.PrimaryKeyRelatedField(queryset=Shipment.objects.all(), required=False)
     notes = serializers.CharField(max_length=255, required=False, allow_blank=True)
+
+
+class FEFOReserveSerializer(InventoryActionSerializer):
+    variant_id = serializers.PrimaryKeyRelatedField(queryset=ProductVariant.objects.all(), source="variant")
+
+
+class StockImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    transaction_type = serializers.ChoiceField(choices=IMPORT_TYPES, default="receipt")
+    reference = serializers.CharField(max_length=255, required=False, allow_blank=True)
+
+
+class StockTransferLineSerializer(serializers.ModelSerializer):
+    variant_id = serializers.PrimaryKeyRelatedField(queryset=ProductVariant.objects.all(), source="variant")
+
+    class Meta:
+        model = StockTransferLine
+        fields = ["id", "variant_id", "quantity", "quantity_received"]
+        read_only_fields = ["id", "quantity_received"]
+
+    def validate_quantity(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("quantity must be positive")
+        return value
+
+
+class StockTransferSerializer(serializers.ModelSerializer):
+    lines = StockTransferLineSerializer(many=True)
+
+    class Meta:
+        model = StockTransfer
+        fields = [
+            "id", "reference", "source", "destination", "status", "notes",
+            "lines", "shipped_at", "received_at", "created_by", "created_at", "updated_at",
+        ]
+        read_only_fields = ["id", "reference", "status", "shipped_at", "received_at", "created_by", "created_at", "updated_at"]
+
+    def validate(self, attrs):
+        if attrs["source"] == attrs["destination"]:
+            raise serializers.ValidationError("source and destination must differ")
+        variant_ids = [line["variant"].pk for line in attrs["lines"]]
+        if not variant_ids:
+            raise serializers.ValidationError({"lines": "at least one line is required"})
+        if len(variant_ids) != len(set(variant_ids)):
+            raise serializers.ValidationError({"lines": "each variant may appear only once"})
+        return attrs
+
+    def create(self, validated_data):
+        lines = validated_data.pop("lines")
+        with transaction.atomic():
+            transfer = StockTransfer.objects.create(**validated_data)
+            StockTransferLine.objects.bulk_create(
+                [StockTransferLine(transfer=transfer, **line) for line in lines], batch_size=1000
+            )
+        return transfer
@@ -0,0 +1,11 @@
+"""Outbox consumers for inventory events (see core.events)."""
+from core.events import subscribe
+
+from .availability import refresh_availability
+
+
+@subscribe("inventory.updated")
+@subscribe("inventory.deleted")
+def refresh_variant_availability(event):
+    """Recompute ATS after single-row saves; bulk paths refresh it in their own transaction."""
+    refresh_availability([event.payload["variant_id"]])
@@ -1,3 +1,314 @@
+import io
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.db import connection
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from cart.models import Cart, CartItem
+from catalog.models import Product, ProductVariant
+from core.events import autodiscover, dispatch_batch
+from core.models import OutboxEvent
+from . import partitioning
+from .availability import compute
+from .imports import StockImporter
+from .reconciliation import reconcile
+from .models import Inventory, InventoryTransaction, ReservationHold, VariantAvailability, Warehouse
+from .serializers import CompiledInventoryTransactionSerializer, InventoryTransactionSerializer
+
+
+class CompiledInventoryTransactionSerializerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("clerk", "clerk@example.com", "password")
+        product = Product.objects.create(sku="P1", name="Product", price=Decimal("10.00"))
+        variants = [
+            ProductVariant.objects.create(product=product, sku=f"V{i}", name=f"Variant {i}", price=Decimal("10"))
+            for i in range(2)
+        ]
+        warehouse = Warehouse.objects.create(code="W1", name="Main")
+        for i in range(4):
+            InventoryTransaction.objects.create(
+                transaction_type="receipt" if i % 2 else "adjustment", variant=variants[i % 2], warehouse=warehouse,
+                quantity_delta=-i, resulting_on_hand=10 - i, resulting_reserved=i,
+                cost_price=Decimal("2.5") if i else None, reference=f"REF-{i}", metadata={"i": i},
+                created_by=user if i % 2 else None,
+            )
+
+    def test_matches_inventory_transaction_serializer(self):
+        queryset = InventoryTransaction.objects.order_by("-created_at")
+        expected = InventoryTransactionSerializer(queryset, many=True).data
+        with self.assertNumQueries(3):
+            actual = CompiledInventoryTransactionSerializer().serialize(queryset)
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+
+
+class AvailabilityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        product = Product.objects.create(sku="P1", name="Perfume", price=Decimal("10.00"))
+        cls.variant = ProductVariant.objects.create(product=product, sku="V1", name="50ml", price=Decimal("10"))
+        cls.warehouses = [Warehouse.objects.create(code=f"W{i}", name=f"Warehouse {i}") for i in range(3)]
+
+    def test_expiring_soon_lots_stay_sellable(self):
+        today = timezone.localdate()
+        Inventory.objects.create(variant=self.variant, warehouse=self.warehouses[0], lot="L1", on_hand=10,
+                                 expiration_date=today + timedelta(days=10))
+        Inventory.objects.create(variant=self.variant, warehouse=self.warehouses[1], lot="L2", on_hand=5,
+                                 expiration_date=today + timedelta(days=200))
+        Inventory.objects.create(variant=self.variant, warehouse=self.warehouses[2], lot="L3", on_hand=7,
+                                 expiration_date=today - timedelta(days=1))
+
+        counts = Inventory.refresh_expiry_statuses(today=today, warning_days=30)
+
+        self.assertEqual(counts, {"expired": 1, "expiring_soon": 1})
+        self.assertEqual(compute([self.variant.pk])[self.variant.pk]["ats"], 15)
+        self.assertEqual(VariantAvailability.objects.get(variant=self.variant).ats, 15)
+        self.variant.refresh_from_db()
+        self.assertEqual(self.variant.stock_quantity, 15)
+
+    def test_row_saves_refresh_availability_through_the_outbox(self):
+        autodiscover()
+        inventory = Inventory.objects.create(variant=self.variant, warehouse=self.warehouses[0], on_hand=8)
+        self.assertFalse(VariantAvailability.objects.filter(variant=self.variant).exists())
+
+        dispatch_batch()
+        self.assertEqual(VariantAvailability.objects.get(variant=self.variant).ats, 8)
+
+        inventory.delete()
+        dispatch_batch()
+        self.assertEqual(VariantAvailability.objects.get(variant=self.variant).ats, 0)
+
+
+class ReservationHoldTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        product = Product.objects.create(sku="P1", name="Product", price=Decimal("10.00"))
+        cls.variant = ProductVariant.objects.create(product=product, sku="V1", name="Variant", price=Decimal("10"))
+        cls.warehouse = Warehouse.objects.create(code="W1", name="Main")
+
+    def setUp(self):
+        self.inventory = Inventory.objects.create(variant=self.variant, warehouse=self.warehouse, on_hand=10)
+
+    def reserved(self):
+        self.inventory.refresh_from_db()
+        return self.inventory.reserved
+
+    def test_reservations_need_a_reference(self):
+        for reference in (None, ""):
+            with self.assertRaises(ValueError):
+                self.inventory.reserve(2, reference=reference)
+            with self.assertRaises(ValueError):
+                Inventory.reserve_fefo(self.variant, 2, reference=reference)
+        self.assertEqual(self.reserved(), 0)
+        self.assertFalse(ReservationHold.objects.exists())
+
+    def test_expired_holds_are_released_once(self):
+        self.inventory.reserve(3, reference="cart:1", ttl=timedelta(minutes=5))
+        later = timezone.now() + timedelta(minutes=6)
+
+        self.assertEqual(ReservationHold.release_expired(now=timezone.now()), 0)
+        self.assertEqual(ReservationHold.release_expired(now=later), 1)
+        self.assertEqual(ReservationHold.release_expired(now=later), 0)
+
+        self.assertEqual(self.reserved(), 0)
+        release = InventoryTransaction.objects.get(transaction_type="release")
+        self.assertEqual((release.quantity_delta, release.reference), (3, "cart:1"))
+
+    def test_released_and_allocated_stock_is_not_released_again(self):
+        self.inventory.reserve(3, reference="cart:1")
+        self.inventory.reserve(4, reference="order:7")
+        self.inventory.release(2, reference="cart:1")
+        self.inventory.allocate(4, reference="order:7")
+
+        hold = ReservationHold.objects.get()
+        self.assertEqual((hold.owner, hold.quantity), ("cart:1", 1))
+
+        ReservationHold.release_expired(now=timezone.now() + timedelta(days=1))
+        self.inventory.refresh_from_db()
+        self.assertEqual((self.inventory.reserved, self.inventory.allocated), (0, 4))
+        self.assertFalse(ReservationHold.objects.exists())
+
+    def test_new_reservations_extend_the_owners_holds(self):
+        self.inventory.reserve(1, reference="cart:1", ttl=timedelta(minutes=5))
+        self.inventory.reserve(1, reference="cart:2", ttl=timedelta(minutes=5))
+        Inventory.reserve_fefo(self.variant, 1, reference="cart:1", ttl=timedelta(minutes=30))
+
+        released = ReservationHold.release_expired(now=timezone.now() + timedelta(minutes=10))
+
+        self.assertEqual(released, 1)
+        self.assertEqual(set(ReservationHold.objects.values_list("owner", flat=True)), {"cart:1"})
+        self.assertEqual(self.reserved(), 2)
+
+    def test_cart_activity_extends_the_carts_holds(self):
+        cart = Cart.objects.create(session_id="s1")
+        self.inventory.reserve(1, reference=f"cart:{cart.pk}", ttl=timedelta(minutes=5))
+
+        CartItem.objects.create(cart=cart, variant=self.variant, quantity=1)
+
+        self.assertEqual(ReservationHold.release_expired(now=timezone.now() + timedelta(minutes=10)), 0)
+        self.assertEqual(self.reserved(), 1)
+
+    def test_extend(self):
+        self.inventory.reserve(1, reference="cart:1", ttl=timedelta(minutes=5))
+
+        self.assertEqual(ReservationHold.extend("cart:1", ttl=timedelta(hours=1)), 1)
+        self.assertEqual(ReservationHold.extend("cart:2"), 0)
+
+        self.assertEqual(ReservationHold.release_expired(now=timezone.now() + timedelta(minutes=10)), 0)
+        self.assertEqual(self.reserved(), 1)
+
+
+class LedgerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("clerk", "clerk@example.com", "password")
+        product = Product.objects.create(sku="P1", name="Product", price=Decimal("10.00"))
+        cls.variant = ProductVariant.objects.create(product=product, sku="V1", name="Variant", price=Decimal("10"))
+        cls.warehouse = Warehouse.objects.create(code="W1", name="Main")
+        for i in range(25):
+            InventoryTransaction.objects.create(
+                transaction_type="receipt", variant=cls.variant, warehouse=cls.warehouse,
+                quantity_delta=1, resulting_on_hand=i + 1, resulting_reserved=0,
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_page_numbers_keep_working(self):
+        first = self.client.get("/api/inventory/transactions/").json()
+        third = self.client.get("/api/inventory/transactions/?page=3").json()
+
+        self.assertEqual(first["count"], 25)
+        self.assertEqual(len(first["results"]), 10)
+        self.assertEqual([row["resulting_on_hand"] for row in third["results"]], [5, 4, 3, 2, 1])
+
+    def test_cursor_pages_on_request(self):
+        seen = []
+        url = "/api/inventory/transactions/?pagination=cursor"
+        while url:
+            page = self.client.get(url).json()
+            self.assertNotIn("count", page)
+            seen += [row["resulting_on_hand"] for row in page["results"]]
+            url = page["next"]
+        self.assertEqual(seen, list(range(25, 0, -1)))
+
+    def test_rows_outside_monthly_partitions_go_to_the_default_partition(self):
+        if not partitioning.supports_partitioning():
+            self.skipTest("PostgreSQL only")
+        self.assertTrue(partitioning.convert_to_partitioned())
+        far = partitioning.month_start(timezone.now() + timedelta(days=400))
+        txn = InventoryTransaction.objects.create(
+            transaction_type="receipt", variant=self.variant, warehouse=self.warehouse,
+            quantity_delta=1, resulting_on_hand=26, resulting_reserved=0,
+        )
+        InventoryTransaction.objects.filter(pk=txn.pk).update(created_at=far + timedelta(days=3))
+        self.assertEqual(self.partition_of(txn), partitioning.DEFAULT_PARTITION)
+
+        partitioning.ensure_partitions(far)
+
+        self.assertEqual(self.partition_of(txn), partitioning.partition_name(far))
+        self.assertEqual(InventoryTransaction.objects.count(), 26)
+
+    def partition_of(self, txn):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT tableoid::regclass::text FROM "{partitioning.TABLE}" WHERE id = %s', [txn.pk])
+            return cursor.fetchone()[0].strip('"')
+
+
+class ReconciliationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        product = Product.objects.create(sku="P1", name="Product", price=Decimal("10.00"))
+        cls.variant = ProductVariant.objects.create(product=product, sku="V1", name="Variant", price=Decimal("10"))
+        cls.warehouse = Warehouse.objects.create(code="W1", name="Main")
+
+    def test_fix_brings_the_ledger_in_line(self):
+        Inventory.objects.create(variant=self.variant, warehouse=self.warehouse, on_hand=10)
+
+        result = reconcile(fix=True)
+        self.assertEqual((result.discrepancies, result.adjustments), (1, 1))
+        self.assertEqual(InventoryTransaction.objects.get(transaction_type="adjustment").quantity_delta, 10)
+        self.assertEqual(reconcile().discrepancies, 0)
+
+    def test_rows_changed_after_the_comparison_are_left_for_the_next_run(self):
+        inventory = Inventory.objects.create(variant=self.variant, warehouse=self.warehouse, on_hand=10)
+
+        # a stock operation lands between the comparison and the write
+        result = reconcile(fix=True, on_discrepancy=lambda row: inventory.reserve(2, reference="cart:1"))
+
+        self.assertEqual((result.discrepancies, result.adjustments), (1, 0))
+        self.assertFalse(InventoryTransaction.objects.filter(transaction_type="adjustment").exists())
+        self.assertEqual(reconcile(fix=True).adjustments, 1)
+        self.assertEqual(reconcile().discrepancies, 0)
+
+
+class StockImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        product = Product.objects.create(sku="P1", name="Product", price=Decimal("10.00"))
+        cls.variant = ProductVariant.objects.create(product=product, sku="V1", name="Variant", price=Decimal("10"))
+        cls.warehouse = Warehouse.objects.create(code="W1", name="Main")
+
+    def run_import(self, transaction_type, *rows):
+        csv_file = io.StringIO("sku,warehouse,quantity\n" + "".join(f"V1,W1,{qty}\n" for qty in rows))
+        return StockImporter(transaction_type).run(csv_file)
+
+    def test_lines_for_the_same_row_are_applied_in_order(self):
+        Inventory.objects.create(variant=self.variant, warehouse=self.warehouse, on_hand=5)
+
+        result = self.run_import("receipt", 3, 4)
+
+        self.assertEqual((result.applied, result.rejected), (2, 0))
+        self.assertEqual(Inventory.objects.get().on_hand, 12)
+        self.assertEqual(
+            list(InventoryTransaction.objects.order_by("pk").values_list("quantity_delta", "resulting_on_hand")),
+            [(3, 8), (4, 12)],
+        )
+
+    def test_lines_cannot_take_on_hand_below_committed_stock(self):
+        inventory = Inventory.objects.create(variant=self.variant, warehouse=self.warehouse, on_hand=10)
+        inventory.reserve(3, reference="cart:1")
+        Inventory.objects.filter(pk=inventory.pk).update(allocated=2)
+
+        result = self.run_import("adjustment", -6, -5)
+        self.assertEqual((result.applied, result.rejected), (1, 1))
+        self.assertEqual(result.errors[0][0], 2)
+        self.assertEqual(Inventory.objects.get().on_hand, 5)
+
+        result = self.run_import("count", 4, 7)
+        self.assertEqual((result.applied, result.rejected), (1, 1))
+        self.assertEqual(Inventory.objects.get().on_hand, 7)
+
+
+class LedgerEventTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        product = Product.objects.create(sku="P1", name="Product", price=Decimal("10.00"))
+        cls.variant = ProductVariant.objects.create(product=product, sku="V1", name="Variant", price=Decimal("10"))
+        cls.warehouse = Warehouse.objects.create(code="W1", name="Main")
+
+    def test_bulk_events_carry_row_ids_without_returned_pks(self):
+        now = timezone.now()
+        rows = [
+            InventoryTransaction(
+                transaction_type="receipt", variant=self.variant, warehouse=self.warehouse, quantity_delta=1,
+                resulting_on_hand=on_hand, resulting_reserved=0, created_at=now,
+            )
+            for on_hand in (1, 2, 2)
+        ]
+        # as on MySQL
+        with mock.patch.object(type(connection.features), "can_return_rows_from_bulk_insert", False):
+            InventoryTransaction.objects.bulk_create(rows)
 
-# Create your tests here.
+        ids = list(InventoryTransaction.objects.order_by("pk").values_list("pk", flat=True))
+        self.assertEqual([txn.pk for txn in rows], ids)
+        events = OutboxEvent.objects.filter(topic="inventory.transaction").order_by("pk")
+        self.assertEqual([event.payload["id"] for event in events], ids)
+        self.assertEqual([event.aggregate_id for event in events], [str(pk) for pk in ids])
@@ -1,12 +1,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import WarehouseViewSet, InventoryViewSet, InventoryTransactionViewSet
+from .views import AvailabilityView, WarehouseViewSet, InventoryViewSet, InventoryTransactionViewSet, StockTransferViewSet
 
 router = DefaultRouter()
 router.register(r"warehouses", WarehouseViewSet, basename="warehouse")
 router.register(r"inventories", InventoryViewSet, basename="inventory")
 router.register(r"transactions", InventoryTransactionViewSet, basename="inventorytransaction")
+router.register(r"transfers", StockTransferViewSet, basename="stocktransfer")
 
 urlpatterns = [
+    path("availability/", AvailabilityView.as_view(), name="inventory-availability"),
     path("", include(router.urls)),
 ]
@@ -1,17 +1,31 @@
+import io
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
-from .models import Warehouse, Inventory, InventoryTransaction
+from .models import Warehouse, Inventory, InventoryTransaction, InventoryCheckpoint, StockTransfer
 from .serializers import (
     WarehouseSerializer,
     InventorySerializer,
     InventoryTransactionSerializer,
+    CompiledInventoryTransactionSerializer,
     InventoryActionSerializer,
+    FEFOReserveSerializer,
+    StockImportSerializer,
+    StockTransferSerializer,
 )
+from core.idempotency import idempotent
 from core.utils.response_utils import api_response
+from .availability import get_availability
+from .imports import ERROR_COLUMNS, StockImporter
 
 
 class WarehouseViewSet(viewsets.ModelViewSet):
@@ -20,6 +34,34 @@ class WarehouseViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAdminUser]  # manage warehouses only by admin
 
 
+class AvailabilityView(APIView):
+    """
+    Available-to-sell across all warehouses for many variants at once.
+    GET /api/inventory/availability/?variants=1,2,3
+    """
+    permission_classes = [AllowAny]
+    MAX_VARIANTS = 500
+
+    def get(self, request):
+        raw = request.query_params.get("variants", "")
+        try:
+            variant_ids = [int(v) for v in raw.split(",") if v.strip()]
+        except ValueError:
+            return api_response(False, status=400, message="variants must be a comma-separated list of ids")
+        if not variant_ids:
+            return api_response(False, status=400, message="variants is required")
+        if len(variant_ids) > self.MAX_VARIANTS:
+            return api_response(False, status=400, message=f"At most {self.MAX_VARIANTS} variants per request")
+
+        availability = get_availability(variant_ids)
+        data = [
+            {"variant_id": variant_id, "available": availability[variant_id]["ats"],
+             "in_stock": availability[variant_id]["ats"] > 0}
+            for variant_id in dict.fromkeys(variant_ids)
+        ]
+        return api_response(True, data=data)
+
+
 class InventoryViewSet(viewsets.ModelViewSet):
     """
     Manage inventory records (one per variant+warehouse).
@@ -36,6 +78,7 @@ class InventoryViewSet(viewsets.ModelViewSet):
         return [IsAdminUser()]
 
     @action(detail=True, methods=["post"], url_path="reserve", permission_classes=[IsAuthenticated])
+    @idempotent
     def reserve_action(self, request, pk=None):
         """
         Reserve stock temporarily for a cart/order.
@@ -64,6 +107,7 @@ class InventoryViewSet(viewsets.ModelViewSet):
         return api_response(True, status=200, message="Reserved", data={"inventory": inv_ser.data, "transaction": txn_ser.data if txn_ser else None})
 
     @action(detail=True, methods=["post"], url_path="release", permission_classes=[IsAuthenticated])
+    @idempotent
     def release_action(self, request, pk=None):
         """
         Release previously reserved stock (e.g., cart abandoned).
@@ -87,6 +131,7 @@ class InventoryViewSet(viewsets.ModelViewSet):
         return api_response(True, status=200, message="Released", data={"inventory": InventorySerializer(inv).data, "transaction": InventoryTransactionSerializer(txn).data if txn else None})
 
     @action(detail=True, methods=["post"], url_path="allocate", permission_classes=[IsAuthenticated])
+    @idempotent
     def allocate_action(self, request, pk=None):
         """
         Convert reserved -> allocated (order confirmed).
@@ -109,6 +154,93 @@ class InventoryViewSet(viewsets.ModelViewSet):
         txn = InventoryTransaction.objects.filter(variant=inv.variant, warehouse=inv.warehouse).order_by("-created_at").first()
         return api_response(True, status=200, message="Allocated", data={"inventory": InventorySerializer(inv).data, "transaction": InventoryTransactionSerializer(txn).data if txn else None})
 
+    @action(detail=False, methods=["post"], url_path="reserve-fefo", permission_classes=[IsAuthenticated])
+    @idempotent
+    def reserve_fefo_action(self, request):
+        """
+        Reserve a variant first-expired-first-out across all sellable lots/warehouses.
+        POST body: {"variant_id": 5, "qty": 2, "reference": "cart:123"}
+        """
+        serializer = FEFOReserveSerializer(data=request.data)
+        if not serializer.is_valid():
+            return api_response(False, status=400, message="Invalid input", errors=serializer.errors)
+
+        user = request.user if request.user.is_authenticated else None
+        try:
+            picks = Inventory.reserve_fefo(
+                serializer.validated_data["variant"],
+                serializer.validated_data["qty"],
+                reference=serializer.validated_data.get("reference", None),
+                user=user,
+            )
+        except Exception as exc:
+            return api_response(False, status=400, message=str(exc))
+
+        data = [
+            {"inventory_id": inv.pk, "warehouse_id": inv.warehouse_id, "lot": inv.lot,
+             "expiration_date": inv.expiration_date, "qty": qty}
+            for inv, qty in picks
+        ]
+        return api_response(True, status=200, message="Reserved", data={"picks": data})
+
+    @action(detail=False, methods=["post"], url_path="import", parser_classes=[MultiPartParser])
+    def import_action(self, request):
+        """
+        Bulk receipts / adjustments / cycle counts from a CSV upload (admin only).
+        multipart: file=<csv with sku,warehouse,quantity[,cost_price,currency,reference,notes]>, transaction_type=receipt|adjustment|count
+        """
+        serializer = StockImportSerializer(data=request.data)
+        if not serializer.is_valid():
+            return api_response(False, status=400, message="Invalid input", errors=serializer.errors)
+
+        upload = serializer.validated_data["file"]
+        importer = StockImporter(
+            serializer.validated_data["transaction_type"],
+            user=request.user,
+            reference=serializer.validated_data.get("reference") or None,
+            source_document=upload.name,
+        )
+        try:
+            result = importer.run(io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline=""))
+        except (UnicodeDecodeError, ValueError) as exc:
+            return api_response(False, status=400, message=str(exc))
+
+        data = {
+            "lines": result.lines,
+            "applied": result.applied,
+            "rejected": result.rejected,
+            "elapsed": round(result.elapsed, 3),
+            "errors": [dict(zip(ERROR_COLUMNS, error)) for error in sorted(result.errors)],
+        }
+        return api_response(True, status=200, message="Imported", data=data)
+
+
+class LedgerCursorPagination(CursorPagination):
+    """Keyset pages on created_at: no COUNT(*) or OFFSET, so recent pages stay fast as history grows."""
+    ordering = "-created_at"
+
+
+class LedgerPagination(PageNumberPagination):
+    """
+    `?page=` pages of PAGE_SIZE rows like every other list. Clients can opt into
+    keyset pages with `?pagination=cursor` and then follow `next`/`previous`
+    (no `count`), which stay fast however deep into history they go.
+    """
+
+    def use_cursor(self, request):
+        return request.query_params.get("pagination") == "cursor" or "cursor" in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = LedgerCursorPagination() if self.use_cursor(request) else None
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
 
 class InventoryTransactionViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -118,6 +250,7 @@ class InventoryTransactionViewSet(viewsets.ReadOnlyModelViewSet):
     """
     queryset = InventoryTransaction.objects.select_related("variant", "warehouse", "created_by").all().order_by("-created_at")
     serializer_class = InventoryTransactionSerializer
+    pagination_class = LedgerPagination
 
     def get_permissions(self):
         # Read-only endpoints accessible to authenticated users, full access for admins
@@ -125,6 +258,71 @@ class InventoryTransactionViewSet(viewsets.ReadOnlyModelViewSet):
             return [IsAuthenticated()]
         return [IsAdminUser()]
 
+    def list(self, request, *args, **kwargs):
+        serializer = CompiledInventoryTransactionSerializer(context=self.get_serializer_context())
+        # cursor pages read created_at from the values() rows
+        page = self.paginate_queryset(serializer.values(self.filter_queryset(self.get_queryset())))
+        return self.get_paginated_response(serializer.to_representation(page))
+
+    @action(detail=False, methods=["get"], url_path="balance")
+    def balance(self, request):
+        """
+        Stock of a variant in a warehouse as of a point in time.
+        GET ?variant=5&warehouse=2&at=2025-01-31T23:59:59Z  (at defaults to now)
+        """
+        variant = request.query_params.get("variant")
+        warehouse = request.query_params.get("warehouse")
+        if not (variant and variant.isdigit() and warehouse and warehouse.isdigit()):
+            return api_response(False, status=400, message="variant and warehouse ids are required")
+
+        at = None
+        if request.query_params.get("at"):
+            at = parse_datetime(request.query_params["at"])
+            if at is None:
+                return api_response(False, status=400, message="Invalid 'at' datetime")
+            if timezone.is_naive(at):
+                at = timezone.make_aware(at)
+
+        data = InventoryCheckpoint.balance_as_of(int(variant), int(warehouse), at)
+        return api_response(True, data=data)
+
     # Optional: an admin-only create endpoint can be added if you want:
     # def create(self, request, *args, **kwargs):
     #     ...
+
+
+class StockTransferViewSet(viewsets.ModelViewSet):
+    """
+    Inter-warehouse transfers (admin only).
+    POST {"source": 1, "destination": 2, "lines": [{"variant_id": 5, "quantity": 10}, ...]} creates a draft;
+    ship/receive/cancel move it through its states.
+    """
+    queryset = StockTransfer.objects.select_related("source", "destination").prefetch_related("lines")
+    serializer_class = StockTransferSerializer
+    permission_classes = [IsAdminUser]
+    http_method_names = ["get", "post", "head", "options"]
+    filterset_fields = ["status", "source", "destination"]
+
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)
+
+    def _transition(self, request, method, message):
+        transfer = self.get_object()
+        try:
+            transfer = method(transfer)
+        except ValueError as exc:
+            return api_response(False, status=400, message=str(exc))
+        transfer = self.get_queryset().get(pk=transfer.pk)
+        return api_response(True, status=200, message=message, data=StockTransferSerializer(transfer).data)
+
+    @action(detail=True, methods=["post"], url_path="ship")
+    def ship(self, request, pk=None):
+        return self._transition(request, lambda transfer: transfer.ship(user=request.user), "Shipped")
+
+    @action(detail=True, methods=["post"], url_path="receive")
+    def receive(self, request, pk=None):
+        return self._transition(request, lambda transfer: transfer.receive(user=request.user), "Received")
+
+    @action(detail=True, methods=["post"], url_path="cancel")
+    def cancel(self, request, pk=None):
+        return self._transition(request, lambda transfer: transfer.cancel(), "Cancelled")
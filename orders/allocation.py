@@ -0,0 +1,170 @@
+"""
+Order allocation engine.
+
+Plans where each order line ships from. A line may be split across several
+warehouses; the order in which warehouses are tried is decided by a pluggable
+strategy. Planning is pure Python over inventory rows fetched once for the
+whole order, so it does no queries of its own (apart from what a strategy
+loads in `prepare`, e.g. the region table).
+"""
+from collections import defaultdict
+
+from django.conf import settings
+
+
+class InsufficientStock(Exception):
+    pass
+
+
+class AllocationStrategy:
+    """
+    Base strategy. Subclasses return candidate inventory rows for a line in
+    the order they should be drawn from.
+    """
+    name = None
+
+    def prepare(self, order, lines, candidates):
+        """Hook to precompute order-wide data before lines are ranked."""
+
+    def rank(self, line, candidates, available):
+        raise NotImplementedError
+
+
+STRATEGIES = {}
+
+
+def register_strategy(cls):
+    STRATEGIES[cls.name] = cls
+    return cls
+
+
+def get_strategy(name=None):
+    name = name or getattr(settings, "ORDER_ALLOCATION_STRATEGY", "fewest_shipments")
+    try:
+        return STRATEGIES[name]()
+    except KeyError:
+        raise ValueError(f"Unknown allocation strategy: {name}")
+
+
+@register_strategy
+class FewestShipmentsStrategy(AllocationStrategy):
+    """
+    Prefer warehouses that can fully cover the most lines of the order, so the
+    order ships in as few parcels as possible. Splits fall back to the largest
+    stock first.
+    """
+    name = "fewest_shipments"
+
+    def prepare(self, order, lines, candidates):
+        self.coverage = defaultdict(int)
+        for line in lines:
+            for inv in candidates.get(line.variant_id, ()):
+                if inv.available() >= line.quantity:
+                    self.coverage[inv.warehouse_id] += 1
+
+    def rank(self, line, candidates, available):
+        qty = line.quantity
+        return sorted(
+            candidates,
+            key=lambda inv: (
+                available[inv.pk] < qty,
+                -self.coverage[inv.warehouse_id],
+                -available[inv.pk],
+            ),
+        )
+
+
+@register_strategy
+class NearestWarehouseStrategy(AllocationStrategy):
+    """
+    Prefer warehouses serving the order's shipping address, using the
+    `inventory.WarehouseRegion` table (postal prefix > state > country match,
+    then region priority).
+    """
+    name = "nearest"
+
+    NO_MATCH = (3, 0)
+
+    def prepare(self, order, lines, candidates):
+        from inventory.models import WarehouseRegion
+
+        self.distance = {}
+        address = order.shipping_address
+        if address is None:
+            return
+
+        state = (address.state or "").lower()
+        postal_code = address.postal_code or ""
+        for region in WarehouseRegion.objects.filter(country__iexact=address.country):
+            if region.postal_prefix:
+                if not postal_code.startswith(region.postal_prefix):
+                    continue
+                match = 0
+            elif region.state:
+                if region.state.lower() != state:
+                    continue
+                match = 1
+            else:
+                match = 2
+            key = (match, region.priority)
+            if key < self.distance.get(region.warehouse_id, self.NO_MATCH):
+                self.distance[region.warehouse_id] = key
+
+    def rank(self, line, candidates, available):
+        return sorted(
+            candidates,
+            key=lambda inv: (self.distance.get(inv.warehouse_id, self.NO_MATCH), -available[inv.pk]),
+        )
+
+
+@register_strategy
+class FEFOStrategy(AllocationStrategy):
+    """First-expired-first-out: consume stock with the earliest expiration_date first."""
+    name = "fefo"
+
+    def rank(self, line, candidates, available):
+        return sorted(
+            candidates,
+            key=lambda inv: (inv.expiration_date is None, inv.expiration_date, -available[inv.pk]),
+        )
+
+
+class AllocationPlanner:
+    """
+    Computes an allocation plan for a whole order in one pass.
+
+    `inventories` are all candidate rows for the order's variants (already
+    locked by the caller). Stock claimed by earlier lines is tracked so two
+    lines of the same variant never over-draw a row.
+    """
+
+    def __init__(self, strategy=None):
+        if strategy is None or isinstance(strategy, str):
+            strategy = get_strategy(strategy)
+        self.strategy = strategy
+
+    def plan(self, order, lines, inventories):
+        """Return a list of (line, inventory, qty). Raises InsufficientStock."""
+        candidates = defaultdict(list)
+        available = {}
+        for inv in inventories:
+            candidates[inv.variant_id].append(inv)
+            available[inv.pk] = inv.available()
+
+        self.strategy.prepare(order, lines, candidates)
+
+        plan = []
+        for line in lines:
+            need = line.quantity
+            for inv in self.strategy.rank(line, candidates.get(line.variant_id, []), available):
+                if need <= 0:
+                    break
+                take = min(need, available[inv.pk])
+                if take <= 0:
+                    continue
+                available[inv.pk] -= take
+                need -= take
+                plan.append((line, inv, take))
+            if need > 0:
+                raise InsufficientStock(f"Insufficient stock for {line.sku or line.variant_id}")
+        return plan
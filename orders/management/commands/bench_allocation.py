@@ -0,0 +1,38 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventory.models import Inventory
+from orders.allocation import AllocationPlanner, STRATEGIES
+from orders.models import Order, OrderItem
+
+
+class Command(BaseCommand):
+    help = "Benchmark allocation planning on synthetic in-memory orders (no database access)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lines", type=int, default=50)
+        parser.add_argument("--warehouses", type=int, default=20)
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        lines_count, warehouses = options["lines"], options["warehouses"]
+
+        order = Order(reference="bench")
+        lines = [OrderItem(pk=i, variant_id=i, sku=f"SKU{i}", quantity=rng.randint(1, 20)) for i in range(lines_count)]
+        inventories = [
+            Inventory(pk=v * warehouses + w, variant_id=v, warehouse_id=w, on_hand=rng.randint(0, 15))
+            for v in range(lines_count)
+            for w in range(warehouses)
+        ]
+
+        for name in STRATEGIES:
+            planner = AllocationPlanner(name)
+            start = time.perf_counter()
+            for _ in range(options["iterations"]):
+                planner.plan(order, lines, inventories)
+            per_plan = (time.perf_counter() - start) / options["iterations"] * 1000
+            self.stdout.write(f"{name:>18}: {per_plan:.3f} ms/plan ({lines_count} lines x {warehouses} warehouses)")
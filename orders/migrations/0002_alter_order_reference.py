@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:59
+
+import orders.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='reference',
+            field=models.CharField(db_index=True, default=orders.models.generate_order_reference, max_length=64, unique=True),
+        ),
+    ]
@@ -1,7 +1,9 @@
 from django.db import models
 from django.utils import timezone
 from django.db import transaction
+from uuid import uuid4
 
+from core.events import publish
 from core.utils.common import TimeStampedModel
 
 ORDER_STATUS = [
@@ -16,9 +18,13 @@ ORDER_STATUS = [
     ('refunded','Refunded')
 ]
 
+def generate_order_reference():
+    return f"ORD-{uuid4().hex[:12].upper()}"
+
+
 class Order(TimeStampedModel):
     user = models.ForeignKey('accounts.User', null=True, blank=True, on_delete=models.SET_NULL)
-    reference = models.CharField(max_length=64, unique=True, db_index=True)
+    reference = models.CharField(max_length=64, unique=True, db_index=True, default=generate_order_reference)
     status = models.CharField(max_length=32, choices=ORDER_STATUS, default='draft', db_index=True)
     currency = models.CharField(max_length=8, default='INR')
 
@@ -54,57 +60,106 @@ class Order(TimeStampedModel):
         indexes = [models.Index(fields=['user','status','placed_at'])]
         ordering = ['-placed_at', '-created_at']
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Status changes are published to the outbox in the same transaction."""
+        previous = getattr(self, '_loaded_status', None)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if self.status != previous:
+                publish("order.status_changed", {
+                    "order_id": self.pk,
+                    "reference": self.reference,
+                    "user_id": self.user_id,
+                    "from": previous,
+                    "to": self.status,
+                }, aggregate=self)
+        self._loaded_status = self.status
+
     def save_address_snapshots(self):
         """Copy current Address objects into snapshots."""
         if self.billing_address:
-            self.billing_address_snapshot = {
-                "first_name": self.billing_address.first_name,
-                "last_name": self.billing_address.last_name,
-                "street_address": self.billing_address.street_address,
-                "city": self.billing_address.city,
-                "state": self.billing_address.state,
-                "postal_code": self.billing_address.postal_code,
-                "country": self.billing_address.country,
-                "phone": self.billing_address.phone,
-            }
-
+            self.billing_address_snapshot = self.address_snapshot(self.billing_address)
         if self.shipping_address:
-            self.shipping_address_snapshot = {
-                "first_name": self.shipping_address.first_name,
-                "last_name": self.shipping_address.last_name,
-                "street_address": self.shipping_address.street_address,
-                "city": self.shipping_address.city,
-                "state": self.shipping_address.state,
-                "postal_code": self.shipping_address.postal_code,
-                "country": self.shipping_address.country,
-                "phone": self.shipping_address.phone,
-            }
-            
-    def place_order(self, *, do_allocate=True, user=None):
-        from inventory.models import Inventory, InventoryTransaction
+            self.shipping_address_snapshot = self.address_snapshot(self.shipping_address)
+
+    @staticmethod
+    def address_snapshot(address):
+        return {
+            "address_line1": address.address_line1,
+            "address_line2": address.address_line2,
+            "city": address.city,
+            "state": address.state,
+            "postal_code": address.postal_code,
+            "country": address.country,
+            "phone_number": address.phone_number,
+        }
+
+    def place_order(self, *, do_allocate=True, user=None, strategy=None):
+        """
+            Place a draft order. With `do_allocate`, stock for every line is reserved
+            according to an allocation plan (see orders.allocation); a line may be
+            split across warehouses. Plan results are stored as Allocation rows, and
+            a ReservationHold owned by the order reference is created per inventory
+            row, so the stock goes back if the order is never allocated.
+        """
+        from inventory.availability import refresh_availability
+        from inventory.models import Inventory, InventoryTransaction, ReservationHold, get_reservation_ttl
+        from .allocation import AllocationPlanner
 
         if self.status != 'draft':
             raise Exception('Only draft orders can be placed')
 
         if do_allocate:
             with transaction.atomic():
-                for item in self.items.select_for_update():
-                    qty = item.quantity
-                    inv = Inventory.objects.filter(variant=item.variant).select_for_update().order_by('-on_hand').first()
-                    if not inv or inv.available() < qty:
-                        raise Exception(f'Insufficient stock for {item.variant.sku}')
+                lines = list(self.items.select_for_update().order_by('pk'))
+                inventories = list(
+                    Inventory.objects.select_for_update()
+                    .sellable()
+                    .filter(variant_id__in={line.variant_id for line in lines})
+                    .order_by('pk')
+                )
+                plan = AllocationPlanner(strategy).plan(self, lines, inventories)
+
+                now = timezone.now()
+                allocations = []
+                txns = []
+                held = {}
+                for line, inv, qty in plan:
                     inv.reserved += qty
-                    inv.save()
-                    InventoryTransaction.objects.create(
+                    inv.updated_at = now
+                    held[inv] = held.get(inv, 0) + qty
+                    allocations.append(Allocation(order_item=line, inventory=inv, quantity=qty))
+                    txns.append(InventoryTransaction(
                         transaction_type='allocation',
-                        variant=item.variant,
-                        warehouse=inv.warehouse,
+                        variant_id=inv.variant_id,
+                        warehouse_id=inv.warehouse_id,
                         quantity_delta=-qty,
                         resulting_on_hand=inv.on_hand,
                         resulting_reserved=inv.reserved,
+                        resulting_allocated=inv.allocated,
+                        order=self,
                         reference=self.reference,
-                        created_by=user
+                        created_by=user,
+                    ))
+
+                Inventory.objects.bulk_update({inv for _, inv, _ in plan}, ['reserved', 'updated_at'])
+                Allocation.objects.bulk_create(allocations)
+                InventoryTransaction.objects.bulk_create(txns)
+                expires_at = now + get_reservation_ttl()
+                ReservationHold.objects.bulk_create([
+                    ReservationHold(
+                        inventory=inv, variant_id=inv.variant_id, warehouse_id=inv.warehouse_id,
+                        quantity=qty, owner=self.reference, expires_at=expires_at,
                     )
+                    for inv, qty in held.items()
+                ])
+                refresh_availability([line.variant_id for line in lines])
 
         self.status = 'placed'
         self.placed_at = timezone.now()
@@ -141,6 +196,19 @@ class OrderEvent(TimeStampedModel):
     data = models.JSONField(default=dict, blank=True)
     created_by = models.ForeignKey('accounts.User', null=True, blank=True, on_delete=models.SET_NULL)
 
+    def save(self, *args, **kwargs):
+        created = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if created:
+                publish("order.event", {
+                    "id": self.pk,
+                    "order_id": self.order_id,
+                    "event_type": self.event_type,
+                    "data": self.data,
+                    "created_by": self.created_by_id,
+                }, aggregate=self.order)
+
     def __str__(self):
         return f"{self.event_type} - Order {self.order.id}"
 
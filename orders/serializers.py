@@ -3,6 +3,7 @@ from django.db import transaction
 from .models import Order, OrderItem
 from accounts.models import Address
 from catalog.models import ProductVariant
+from core.serializers import CompiledSerializer
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
@@ -79,10 +80,11 @@ class OrderSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         items_data = validated_data.pop("items", [])
         request = self.context.get("request")
-        user = request.user if request and request.user.is_authenticated else None
+        if "user" not in validated_data:
+            validated_data["user"] = request.user if request and request.user.is_authenticated else None
 
         with transaction.atomic():
-            order = Order.objects.create(user=user, **validated_data)
+            order = Order.objects.create(**validated_data)
 
             subtotal = 0
             for item_data in items_data:
@@ -170,3 +172,8 @@ class OrderSerializer(serializers.ModelSerializer):
             instance.save()
 
         return instance
+
+
+class CompiledOrderSerializer(CompiledSerializer):
+    """OrderSerializer output from values() rows, for order lists."""
+    serializer_class = OrderSerializer
@@ -1,3 +1,78 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from catalog.models import Product, ProductVariant
+from inventory.models import Inventory, ReservationHold, Warehouse
+from .models import Order, OrderItem
+from .serializers import CompiledOrderSerializer, OrderSerializer
+
+
+class CompiledOrderSerializerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("buyer", "buyer@example.com", "password")
+        product = Product.objects.create(sku="P1", name="Product", price=Decimal("10.00"))
+        variant = ProductVariant.objects.create(product=product, sku="V1", name="Variant", price=Decimal("10"))
+        for i in range(3):
+            order = Order.objects.create(
+                user=cls.user, reference=f"ORD-{i}", status="pending" if i else "draft",
+                subtotal=Decimal("20"), total=Decimal("20.5"),
+                shipping_address_snapshot={"city": "Pune", "postal_code": "411001"},
+            )
+            for j in range(i):
+                OrderItem.objects.create(
+                    order=order, variant=variant, sku="V1", name="Variant", quantity=j + 1,
+                    unit_price=Decimal("10"), line_total=0, tax_amount=Decimal("0.5"),
+                )
+
+    def test_matches_order_serializer(self):
+        queryset = Order.objects.all()
+        expected = OrderSerializer(queryset, many=True).data
+        with self.assertNumQueries(2):
+            actual = CompiledOrderSerializer().serialize(queryset)
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+
+    def test_list_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get("/api/orders/")
+        self.assertEqual(response.status_code, 200, response.content)
+        expected = OrderSerializer(Order.objects.filter(user=self.user).order_by("-placed_at"), many=True).data
+        self.assertEqual(response.json()["results"], json.loads(JSONRenderer().render(expected)))
+
+
+class PlaceOrderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        product = Product.objects.create(sku="P1", name="Product", price=Decimal("10.00"))
+        cls.variant = ProductVariant.objects.create(product=product, sku="V1", name="Variant", price=Decimal("10"))
+        cls.warehouse = Warehouse.objects.create(code="W1", name="Main")
+
+    def setUp(self):
+        self.inventory = Inventory.objects.create(variant=self.variant, warehouse=self.warehouse, on_hand=10)
+        self.order = Order.objects.create(reference="ORD-1")
+        OrderItem.objects.create(order=self.order, variant=self.variant, sku="V1", name="Variant", quantity=3,
+                                 unit_price=Decimal("10"), line_total=0)
+
+    def test_placed_stock_is_held_for_the_order(self):
+        self.order.place_order()
+
+        hold = ReservationHold.objects.get()
+        self.assertEqual((hold.owner, hold.inventory_id, hold.quantity), ("ORD-1", self.inventory.pk, 3))
+
+        self.inventory.allocate(3, reference="ORD-1")
+        self.assertFalse(ReservationHold.objects.exists())
+
+    def test_unallocated_orders_give_their_stock_back(self):
+        self.order.place_order()
 
-# Create your tests here.
+        self.assertEqual(ReservationHold.release_expired(now=timezone.now() + timedelta(days=1)), 1)
+        self.inventory.refresh_from_db()
+        self.assertEqual(self.inventory.reserved, 0)
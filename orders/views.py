@@ -3,10 +3,13 @@ from rest_framework import mixins
 from rest_framework.viewsets import GenericViewSet
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework import status
+from rest_framework.response import Response
+from django.db import transaction
 from django.shortcuts import get_object_or_404
+from core.idempotency import idempotent
 from core.utils.response_utils import api_response
-from .models import Order
-from .serializers import OrderSerializer
+from .models import Order, OrderEvent
+from .serializers import OrderSerializer, CompiledOrderSerializer
 
 class OrderViewSet(
         mixins.CreateModelMixin, 
@@ -20,6 +23,15 @@ class OrderViewSet(
     def get_queryset(self):
         return Order.objects.filter(user=self.request.user).order_by('-placed_at')
 
+    def list(self, request, *args, **kwargs):
+        serializer = CompiledOrderSerializer(context=self.get_serializer_context())
+        queryset = serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.to_representation(page))
+        return Response(serializer.to_representation(queryset))
+
+    @idempotent
     def create(self, request, *args, **kwargs):
         payload = request.data.copy()
 
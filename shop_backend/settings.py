@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     "django_filters",
 
     # local apps
+    'core',
     'accounts',
     'catalog',
     'inventory',
@@ -50,9 +51,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',  # outermost, so its wall time covers the other middleware
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.APISessionMiddleware',  # no sessions under SESSIONLESS_PATH_PREFIXES
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -88,13 +90,26 @@ CORS_ALLOW_ALL_ORIGINS = True
 
 
 
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# Cached user principals, profiles, token revocations and login rate limits must
+# be visible to every worker: set REDIS_URL in production. Without it each process
+# gets its own LocMemCache, and those features fall back to per-process behaviour
+# (see core.utils.local_cache.is_process_local).
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+# Sessions are only used by the admin (the API uses JWT and skips them, see
+# core.middleware). Reads come from the cache; `manage.py purge_sessions` removes expired rows.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSIONLESS_PATH_PREFIXES = ('/api/',)
 # SESSION_COOKIE_SAMESITE = 'None'  # This allows the cookie to be sent with cross-origin requests
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SECURE = True  # Set to True in production with HTTPS
 
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False  # Set False to keep the session alive
-SESSION_SAVE_EVERY_REQUEST = True
+SESSION_SAVE_EVERY_REQUEST = False  # only write sessions that changed
 
 CSRF_COOKIE_SECURE = True
 CSRF_COOKIE_HTTPONLY = True
@@ -106,11 +121,21 @@ CSRF_COOKIE_SAMESITE = 'Lax'  # or 'Strict' if possible
 # REST_FRAMEWORK_JWT
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',
     ),
+    # orjson-backed, same output as DRF's JSON classes; stdlib json when orjson is missing
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     # 'DEFAULT_SCHEMA_CLASS': 'rest_framework.schemas.coreapi.AutoSchema',
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
@@ -132,8 +157,26 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'UPDATE_LAST_LOGIN': True,
+    # rotated and logged-out refresh tokens are blacklisted by accounts.revocation
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.BlacklistTokenRefreshSerializer',
+    'TOKEN_VERIFY_SERIALIZER': 'accounts.serializers.BlacklistTokenVerifySerializer',
 }
 
+# Authenticated users are resolved from a cached principal (accounts.authentication):
+# seconds in the shared cache, and in each process's local LRU in front of it. Without
+# a shared cache only the local LRU is used, so a change takes up to
+# AUTH_USER_LOCAL_CACHE_TTL seconds to reach the other workers.
+AUTH_USER_CACHE_TTL = 60
+AUTH_USER_LOCAL_CACHE_TTL = 5
+AUTH_USER_LOCAL_CACHE_SIZE = 10000
+# Seconds the serialized /api/auth/user/ profile is cached for (dropped on every change).
+AUTH_PROFILE_CACHE_TTL = 300
+# Seconds between rebuilds of each process's Bloom filter of revoked refresh tokens;
+# `manage.py purge_revoked_tokens` removes entries for tokens that have expired.
+AUTH_REVOCATION_FILTER_REFRESH = 300
+# Seconds between picking up revocations made by other workers since the last rebuild.
+AUTH_REVOCATION_FILTER_SYNC = 5
+
 
 ROOT_URLCONF = 'shop_backend.urls'
 
@@ -173,6 +216,19 @@ DATABASES = {
 }
 
 # Password validation
+# Argon2 is first so existing PBKDF2 hashes are upgraded on the next successful login.
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# Login attempts allowed per (count, seconds), a sliding window counted in the shared cache.
+LOGIN_RATE_LIMIT_PER_ACCOUNT = (5, 60)
+LOGIN_RATE_LIMIT_PER_IP = (30, 60)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -217,13 +273,78 @@ MEDIA_URL = "/media/"
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
-EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
-EMAIL_HOST = "smtp.gmail.com"
-EMAIL_PORT = 587
-EMAIL_USE_TLS = True
+# Use django.core.mail.backends.console.EmailBackend (or locmem) locally.
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', "django.core.mail.backends.smtp.EmailBackend")
+EMAIL_HOST = os.environ.get('EMAIL_HOST', "smtp.gmail.com")
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 587))
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'True') == 'True'
+EMAIL_TIMEOUT = 10
 EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD')
-
-
-
-
+DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+
+# Mail is queued (core.mail.queue_mail) and sent by the `core.mail.send_email`
+# task (`manage.py runworker`), retried with exponential backoff from MAIL_QUEUE_RETRY_BACKOFF.
+MAIL_QUEUE_MAX_ATTEMPTS = 5
+MAIL_QUEUE_RETRY_BACKOFF = timedelta(seconds=30)
+# After this many consecutive connection failures, stop sending for MAIL_CIRCUIT_COOLDOWN seconds.
+MAIL_CIRCUIT_THRESHOLD = 5
+MAIL_CIRCUIT_COOLDOWN = 60
+
+# Email verification codes (accounts.otp); expired ones are removed by `manage.py purge_otps`.
+OTP_TTL = timedelta(minutes=5)
+OTP_MAX_ATTEMPTS = 5
+OTP_RESEND_INTERVAL = timedelta(minutes=1)
+
+
+# Responses to requests carrying an Idempotency-Key are replayed for retries
+# within this window; `manage.py purge_idempotency_keys` removes older keys.
+IDEMPOTENCY_KEY_TTL = timedelta(hours=int(os.environ.get('IDEMPOTENCY_KEY_TTL_HOURS', 24)))
+# Seconds a duplicate request waits for the in-flight original before a 409.
+IDEMPOTENCY_WAIT_TIMEOUT = 10
+# The original refreshes its key while it runs; a key not refreshed for this long
+# belongs to a worker that died, and the next request with it runs again.
+IDEMPOTENCY_LOCK_TIMEOUT = timedelta(minutes=1)
+
+# Outbox delivery (`manage.py run_outbox_dispatcher --loop`, required: the variant
+# availability read model is refreshed by its subscribers). Failed events are retried
+# with exponential backoff starting at OUTBOX_RETRY_BACKOFF, then marked failed;
+# events a dispatcher claimed but never finished are redelivered after OUTBOX_CLAIM_TIMEOUT.
+OUTBOX_MAX_ATTEMPTS = 10
+OUTBOX_RETRY_BACKOFF = timedelta(seconds=5)
+OUTBOX_CLAIM_TIMEOUT = timedelta(minutes=5)
+
+# Background tasks (`manage.py runworker`). With TASKS_ALWAYS_EAGER, .delay()
+# runs the task inline (handy for local development without a worker).
+TASKS_ALWAYS_EAGER = os.environ.get('TASKS_ALWAYS_EAGER', 'False') == 'True'
+TASKS_RETRY_BACKOFF = timedelta(seconds=10)
+# Workers refresh the heartbeat of the tasks they are running every third of
+# this; a running task without a heartbeat for this long (worker killed) is
+# put back in the queue.
+TASKS_VISIBILITY_TIMEOUT = timedelta(minutes=15)
+
+# Inventory
+# Reservations not converted to allocations within this window are released
+# by `manage.py release_expired_holds`.
+INVENTORY_RESERVATION_TTL = timedelta(minutes=int(os.environ.get('INVENTORY_RESERVATION_TTL_MINUTES', 30)))
+
+# Lots expiring within this many days are flagged EXPIRING_SOON by
+# `manage.py refresh_expiry_statuses` (run nightly).
+INVENTORY_EXPIRY_WARNING_DAYS = int(os.environ.get('INVENTORY_EXPIRY_WARNING_DAYS', 30))
+
+# Seconds per-variant available-to-sell figures are cached for.
+INVENTORY_ATS_CACHE_TTL = int(os.environ.get('INVENTORY_ATS_CACHE_TTL', 30))
+
+# Where `manage.py archive_ledger` writes closed ledger months (gzipped JSONL).
+LEDGER_ARCHIVE_DIR = os.environ.get('LEDGER_ARCHIVE_DIR', os.path.join(BASE_DIR, 'archive', 'ledger'))
+
+# Warehouse selection used by Order.place_order: fewest_shipments | nearest | fefo
+ORDER_ALLOCATION_STRATEGY = os.environ.get('ORDER_ALLOCATION_STRATEGY', 'fewest_shipments')
+
+# Request instrumentation (core.middleware.PerformanceMiddleware): fraction of
+# requests that get DB/cache/N+1 figures (X-Debug-Performance: 1 forces it),
+# and the wall time above which a request is logged as slow.
+PERFORMANCE_SAMPLE_RATE = float(os.environ.get('PERFORMANCE_SAMPLE_RATE', 0))
+PERFORMANCE_SLOW_REQUEST_MS = int(os.environ.get('PERFORMANCE_SLOW_REQUEST_MS', 1000))
+# A query fingerprint seen this many times in one request is logged as a likely N+1.
+PERFORMANCE_N_PLUS_ONE_THRESHOLD = 5